@@ -3,74 +3,365 @@ Pipeline de Datos COVID-19 - Ecuador vs Perú
 Assets de Dagster para procesamiento automatizado
 """
 
-import pandas as pd
-import requests
-import numpy as np
-from datetime import datetime, date
-from dagster import asset, AssetCheckResult, asset_check
-from typing import Dict, Any
+import logging
+from dagster import (
+    asset, multi_asset, AssetCheckResult, AssetCheckSpec, multi_asset_check, AssetExecutionContext, AssetIn,
+    AssetOut, Config, DataVersion, MaterializeResult, Output
+)
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
 import os
 
+# Solo módulos livianos al importar: definitions.py carga este archivo; pandas, numpy, pyarrow y requests se
+# importan dentro de los assets y funciones que los usan
+from pipeline_covid.recursos import MotorCalculo, PaisesObjetivo, PAISES_POR_DEFECTO
+from pipeline_covid.instrumentacion import instrumentar
+from pipeline_covid.metricas import REGISTRO_METRICAS, COLUMNAS_REGISTRO, nombre_asset
+from pipeline_covid.descarga import URL_OWID
+from pipeline_covid.tipos import DataFrame
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
 # =============================================================================
-# PASO 2: LECTURA DE DATOS (SIN TRANSFORMAR)
+# CONFIGURACIÓN COMÚN
 # =============================================================================
 
+RUTAS_POSIBLES = [
+    "pipeline_covid/data/covid.csv",
+]
+
+# Países por defecto (configurables con el recurso PaisesObjetivo)
+PAISES_OBJETIVO = PAISES_POR_DEFECTO
+
+# Columnas requeridas (flexibles por nombre)
+COLUMNAS_REQUERIDAS = {
+    'pais': ['location', 'country'],
+    'fecha': ['date'],
+    'casos': ['new_cases'],
+    'vacunas': ['people_vaccinated'],
+    'poblacion': ['population']
+}
+
+# Tipos compactos para el modo optimizado.
+# population y people_vaccinated superan 2**24, por eso se quedan en float64.
+# new_cases en float32 es exacto hasta 2**24 (16,7 millones): las filas
+# agregadas o semanales de World y continentes que lo superan se redondean
+# (error relativo < 6e-8); el modo "completo" conserva float64
+TIPOS_COMPACTOS = {
+    'casos': 'float32',
+    'vacunas': 'float64',
+    'poblacion': 'float64'
+}
+
+# Proyección de columnas al cargar entradas con el IO manager columnar
+# (las columnas que no existan en el archivo se ignoran)
+COLUMNAS_PROCESAMIENTO = [col for columnas in COLUMNAS_REQUERIDAS.values() for col in columnas]
+COLUMNAS_METRICAS = ['location', 'date', 'new_cases', 'population']
+
+# Los chequeos de entrada reciben leer_datos como tabla Arrow con memory-map
+# (input manager "lector_arrow") y solo leen las columnas que inspeccionan
+ENTRADA_PEREZOSA = {"leer_datos": AssetIn(input_manager_key="lector_arrow")}
+
+
+def registrar_por_pais(valores: "pd.Series", formato: str, maximo: int = 10) -> None:
+    """Registrar un valor por país (solo los primeros 'maximo' si hay muchos países)"""
+    for pais, valor in valores.head(maximo).items():
+        log.info(f"{pais}: {formato.format(valor)}")
+    if len(valores) > maximo:
+        log.info(f"... y {len(valores) - maximo} países más")
+
+
+def registrar_alcance(datos: "pd.DataFrame") -> None:
+    """
+    Países y última fecha de datos_procesados en la metadata de la materialización
+    (de la fecha sale el rango del sensor de métricas diarias); sin contexto
+    de Dagster (invocación directa) no hace nada
+    """
+    from dagster import MetadataValue
+
+    try:
+        contexto = AssetExecutionContext.get()
+    except Exception:
+        return
+    paises = sorted(str(pais) for pais in datos['location'].unique())
+    contexto.add_output_metadata({
+        "paises": MetadataValue.json(paises),
+        "fecha_max": str(datos['date'].max().date()),
+    })
+
+
+def localizar_archivo() -> str:
+    """Primera ruta existente de RUTAS_POSIBLES"""
+    for ruta in RUTAS_POSIBLES:
+        if os.path.exists(ruta):
+            return ruta
+    raise FileNotFoundError("No se encontró el archivo de datos COVID-19 en ninguna ubicación esperada")
+
+
+def resolver_columnas(columnas_disponibles) -> Dict[str, Optional[str]]:
+    """Mapear cada categoría requerida al nombre real de la columna (o None)"""
+    return {
+        categoria: next((col for col in posibles_nombres if col in columnas_disponibles), None)
+        for categoria, posibles_nombres in COLUMNAS_REQUERIDAS.items()
+    }
+
+
+def leer_csv_optimizado(ruta: str, paises: Optional[List[str]], tamano_bloque: int = 250_000) -> "pd.DataFrame":
+    """
+    Lectura por bloques del CSV de OWID
+
+    - Solo lee las columnas que usa el pipeline (resueltas con resolver_columnas)
+    - Fija tipos compactos (category, datetime, float32)
+    - Filtra los países objetivo bloque a bloque (paises=None conserva todos)
+    """
+    import pandas as pd
+
+    encabezado = pd.read_csv(ruta, nrows=0).columns
+    mapa = resolver_columnas(encabezado)
+    col_pais = mapa['pais']
+    columnas = [col for col in mapa.values() if col is not None]
+    tipos = {mapa[cat]: tipo for cat, tipo in TIPOS_COMPACTOS.items() if mapa[cat] is not None}
+    if col_pais is not None:
+        tipos[col_pais] = str
+    if mapa['fecha'] is not None:
+        tipos[mapa['fecha']] = str
+
+    bloques = []
+    for bloque in pd.read_csv(ruta, usecols=columnas, dtype=tipos, chunksize=tamano_bloque):
+        if col_pais is not None and paises is not None:
+            bloque = bloque[bloque[col_pais].isin(paises)]
+        bloques.append(bloque)
+
+    return compactar_tipos(pd.concat(bloques, ignore_index=True), mapa)
+
+
+def leer_desde_cache(ruta: str, modo: str, paises: Optional[List[str]]) -> "pd.DataFrame":
+    """
+    Lectura a través del caché Parquet (ver cache_parquet.py)
+
+    - Modo "optimizado": solo columnas esenciales y particiones de los países objetivo
+    - Modo "completo": todas las columnas y países
+    """
+    from pipeline_covid.cache_parquet import asegurar_cache, leer_cache
+
+    manifiesto = asegurar_cache(ruta)
+    if modo == "completo":
+        return leer_cache(manifiesto)
+
+    mapa = resolver_columnas(manifiesto["columnas"])
+    columnas = [col for col in mapa.values() if col is not None]
+    df = leer_cache(manifiesto, columnas, paises)
+    for cat, tipo in TIPOS_COMPACTOS.items():
+        if mapa[cat] is not None:
+            df[mapa[cat]] = df[mapa[cat]].astype(tipo)
+    return compactar_tipos(df, mapa)
+
+
+def leer_desde_snapshots(origen: str, modo: str, paises: Optional[List[str]], hilos: int) -> "pd.DataFrame":
+    """
+    Lectura de varios snapshots con ingesta.py (Arrow multihilo, varios archivos a la vez)
+
+    Para cada (país, fecha) queda la fila del snapshot más reciente
+    - Modo "optimizado": solo columnas esenciales y países objetivo, con tipos compactos
+    - Modo "completo": todas las columnas y países
+    """
+    from pipeline_covid.ingesta import listar_snapshots, columnas_snapshots, leer_snapshots
+
+    rutas = listar_snapshots(origen)
+    mapa = resolver_columnas(columnas_snapshots(rutas))
+    if mapa['pais'] is None or mapa['fecha'] is None:
+        raise ValueError(f"❌ Los snapshots de {origen} no tienen columnas de país y fecha")
+    if modo == "completo":
+        return leer_snapshots(rutas, mapa['pais'], mapa['fecha'], hilos=hilos).to_pandas()
+
+    columnas = [col for col in mapa.values() if col is not None]
+    df = leer_snapshots(rutas, mapa['pais'], mapa['fecha'], columnas, paises, hilos).to_pandas()
+    for cat, tipo in TIPOS_COMPACTOS.items():
+        if mapa[cat] is not None:
+            df[mapa[cat]] = df[mapa[cat]].astype(tipo)
+    return compactar_tipos(df, mapa)
+
+
+def ordenar_por_pais_fecha(datos: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Ordenar por (location, date) solo si hace falta
+
+    El CSV de OWID y datos_procesados ya vienen ordenados; comprobarlo cuesta
+    una pasada sobre dos columnas en lugar de copiar el DataFrame completo
+    """
+    import pandas as pd
+
+    pais = datos['location']
+    if isinstance(pais.dtype, pd.CategoricalDtype):
+        codigos = pais.cat.codes.to_numpy()
+    else:
+        codigos = pd.factorize(pais, sort=True)[0]
+    fechas = datos['date'].to_numpy()
+    mismo_pais = codigos[1:] == codigos[:-1]
+    ordenado = (codigos[1:] > codigos[:-1]) | (mismo_pais & (fechas[1:] >= fechas[:-1]))
+    if ordenado.all() and (codigos >= 0).all():
+        return datos
+    return datos.sort_values(['location', 'date'])
+
+
+def compactar_tipos(df: "pd.DataFrame", mapa: Dict[str, Optional[str]]) -> "pd.DataFrame":
+    """Convertir fecha a datetime y país a category (sobre filas ya filtradas)"""
+    import pandas as pd
+
+    if mapa['fecha'] is not None:
+        df[mapa['fecha']] = pd.to_datetime(df[mapa['fecha']], errors='coerce')
+    if mapa['pais'] is not None:
+        df[mapa['pais']] = df[mapa['pais']].astype('category')
+    return df
+
+# =============================================================================
+# PASO 1: DESCARGA DE LA FUENTE
+# =============================================================================
+
+class ConfigDescarga(Config):
+    """Origen y destino del CSV de OWID"""
+    url: str = URL_OWID
+    ruta: str = RUTAS_POSIBLES[0]
+    timeout_s: float = 60.0
+
+
 @asset
-def leer_datos() -> pd.DataFrame:
+@instrumentar
+def fuente_owid(config: ConfigDescarga) -> MaterializeResult:
     """
-     PASO 2: Carga datos completos de COVID-19 desde archivo local
+     PASO 1: Actualizar el CSV local desde OWID
+
+    FINALIDAD:
+    - Traer solo lo que cambió: petición condicional con ETag / Last-Modified
+      (un archivo sin cambios no transfiere nada)
+    - Continuar una descarga interrumpida con Range en lugar de empezar de cero
+    - Transferencia comprimida (gzip/zstd) escrita a disco por bloques
+
+    No forma parte de pipeline_completo (que trabaja sin red): se materializa
+    aparte, por ejemplo antes de cada ejecución programada. La versión de datos
+    es el ETag (o Last-Modified) del servidor
+
+    RETORNA:
+    - Resumen de la transferencia como metadata
+    """
+    from pipeline_covid.descarga import descargar_condicional
+
+    resumen = descargar_condicional(config.url, config.ruta, timeout_s=config.timeout_s)
+    version = resumen.get("etag") or resumen.get("last_modified")
+    return MaterializeResult(
+        metadata={"ruta": config.ruta, "url": config.url, **{
+            clave: valor for clave, valor in resumen.items() if valor is not None
+        }},
+        data_version=DataVersion(version) if version else None,
+    )
+
+# =============================================================================
+# PASO 2: LECTURA DE DATOS (SIN TRANSFORMAR)
+# =============================================================================
+
+class ConfigLectura(Config):
+    """Opciones de lectura del CSV de OWID"""
+    # "optimizado": solo columnas necesarias, tipos compactos y filtro por país
+    # "completo": todas las columnas y todos los países (comportamiento original)
+    modo: str = "optimizado"
+    tamano_bloque: int = 250_000
+    # Reutilizar la conversión Parquet del CSV mientras el archivo no cambie
+    usar_cache: bool = True
+    # Carpeta o patrón glob de snapshots .csv/.csv.gz: si se indica, se leen todos
+    # en lugar de RUTAS_POSIBLES y en cada (país, fecha) gana el más reciente
+    snapshots: Optional[str] = None
+    # Snapshots leídos a la vez (cada uno con el lector multihilo de Arrow)
+    hilos_lectura: int = 4
+
+
+@asset(deps=[fuente_owid])
+@instrumentar
+def leer_datos(config: ConfigLectura, paises: PaisesObjetivo, motor: MotorCalculo) -> DataFrame:
+    """
+     PASO 2: Carga datos de COVID-19 desde archivo local
     
     FINALIDAD:
-    - Obtener dataset completo desde archivo CSV local
-    - No aplicar filtros ni transformaciones todavía
+    - Obtener el dataset desde archivo CSV local (o su caché Parquet)
     - Establecer punto de entrada único para todo el pipeline
+    - Las transformaciones (limpieza, métricas) quedan para los pasos siguientes
+    
+    MODOS (config.modo):
+    - "optimizado" (por defecto): ya en la lectura proyecta las columnas
+      esenciales, filtra los países objetivo (recurso paises) y reduce los
+      tipos (país como category, casos en float32 según TIPOS_COMPACTOS)
+    - "completo": todas las columnas y países tal como vienen en el CSV
+    
+    Con config.usar_cache el CSV se convierte una vez a Parquet y las
+    ejecuciones siguientes leen el caché mientras el archivo no cambie
+    
+    Con config.snapshots se leen todos los snapshots de una carpeta o patrón
+    glob (ver ingesta.py); para cada (país, fecha) gana el más reciente
     
     RETORNA:
-    - DataFrame con todos los países y fechas disponibles
+    - DataFrame con las fechas disponibles de los países objetivo ("optimizado")
+      o de todos los países ("completo")
     """
-    print("🔄 Cargando datos desde archivo local...")
+    import pandas as pd
+
+    log.info("Cargando datos desde archivo local...")
     
-   
-    rutas_posibles = [
-        "pipeline_covid/data/covid.csv", 
-    ]
+    if config.modo not in ("optimizado", "completo"):
+        raise ValueError(f"❌ Modo de lectura no soportado: {config.modo}")
+    # El motor duckdb no procesa este DataFrame: vuelve a leer el archivo de
+    # RUTAS_POSIBLES a través del caché Parquet
+    if motor.validar() == "duckdb" and (config.snapshots is not None or not config.usar_cache):
+        raise ValueError("❌ El motor duckdb lee el archivo de RUTAS_POSIBLES con el caché Parquet: "
+                         "no admite config.snapshots ni usar_cache=False (usa motor='pandas')")
     
     df = None
     ruta_usada = None
     
-    for ruta in rutas_posibles:
+    if config.snapshots is not None:
+        df = leer_desde_snapshots(config.snapshots, config.modo, paises.filtro(), config.hilos_lectura)
+        ruta_usada = config.snapshots
+    
+    for ruta in RUTAS_POSIBLES if df is None else []:
         try:
-            df = pd.read_csv(ruta)
+            if config.usar_cache:
+                try:
+                    df = leer_desde_cache(ruta, config.modo, paises.filtro())
+                except FileNotFoundError:
+                    raise
+                except Exception as e:
+                    log.warning(f"Caché Parquet no disponible ({e}), leyendo CSV directamente")
+            if df is None and config.modo == "optimizado":
+                df = leer_csv_optimizado(ruta, paises.filtro(), config.tamano_bloque)
+            elif df is None:
+                df = pd.read_csv(ruta)
             ruta_usada = ruta
-            print(f" Archivo encontrado en: {ruta}")
+            log.info(f"Archivo encontrado en: {ruta} (modo {config.modo})")
             break
         except FileNotFoundError:
-            print(f" No encontrado en: {ruta}")
+            log.debug(f"No encontrado en: {ruta}")
             continue
         except Exception as e:
-            print(f" Error leyendo {ruta}: {e}")
+            log.warning(f"Error leyendo {ruta}: {e}")
             continue
     
     if df is None:
-        print(" ARCHIVO NO ENCONTRADO EN NINGUNA UBICACIÓN")
-        print(" SOLUCIONES:")
-        print("   1. Coloca el archivo CSV en alguna de estas rutas:")
-        for ruta in rutas_posibles:
-            print(f"      - {ruta}")
-        print("   2. O descarga desde: https://covid.ourworldindata.org/data/owid-covid-data.csv")
+        log.error("Archivo no encontrado en ninguna ubicación. Coloca el CSV en alguna de estas rutas: %s, "
+                  "o materializa el asset fuente_owid para descargarlo desde %s",
+                  ", ".join(RUTAS_POSIBLES), URL_OWID)
         raise FileNotFoundError("No se encontró el archivo de datos COVID-19 en ninguna ubicación esperada")
     
     # Información básica
-    print(f" Datos cargados desde {ruta_usada}: {len(df):,} filas, {len(df.columns)} columnas")
-    print(f" Rango de fechas: {df['date'].min()} a {df['date'].max()}")
+    log.info(f"Datos cargados desde {ruta_usada}: {len(df):,} filas, {len(df.columns)} columnas")
+    log.info(f"Rango de fechas: {df['date'].min()} a {df['date'].max()}")
     
     # Verificar que tenemos las columnas mínimas
     if 'location' in df.columns:
-        print(f" Países únicos: {df['location'].nunique():,}")
+        log.info(f"Países únicos: {df['location'].nunique():,}")
     else:
-        print(" No se encontró columna 'location', verificando 'country'...")
+        log.warning("No se encontró columna 'location', verificando 'country'...")
         if 'country' in df.columns:
-            print(f" Países únicos (country): {df['country'].nunique():,}")
+            log.info(f"Países únicos (country): {df['country'].nunique():,}")
         
     return df
 
@@ -78,300 +369,390 @@ def leer_datos() -> pd.DataFrame:
 # PASO 2: CHEQUEOS DE ENTRADA (VALIDACIONES INICIALES)
 # =============================================================================
 
-@asset_check(asset=leer_datos)
-def check_fechas_futuras(leer_datos: pd.DataFrame) -> AssetCheckResult:
-    """ CHEQUEO 1: Verificar fechas futuras (solo informativo)"""
-    print(" Verificando fechas futuras...")
-    
-    df_fechas = leer_datos.copy()
-    # Convertir fechas con coerción de errores
-    df_fechas['date'] = pd.to_datetime(df_fechas['date'], errors='coerce')
-    fecha_max = df_fechas['date'].max()
-    hoy = pd.Timestamp(date.today())
-    
-    # Contar fechas futuras, ignorando NaT
-    fechas_futuras = ((df_fechas['date'] > hoy) & (df_fechas['date'].notna())).sum()
-    # Siempre pasa, pero reporta el problema
-    passed = True
-    
-    if fechas_futuras == 0:
-        description = f" Sin fechas futuras. Máxima: {fecha_max.strftime('%Y-%m-%d') if pd.notnull(fecha_max) else 'N/A'}"
-    else:
-        description = f" {fechas_futuras} fechas futuras detectadas"
-    
-    return AssetCheckResult(
-        passed=passed,
-        description=description,
-        metadata={
-            "fecha_maxima": fecha_max.strftime('%Y-%m-%d') if pd.notnull(fecha_max) else "N/A",
-            "registros_futuros": int(fechas_futuras)
-        }
-    )
-
+@multi_asset_check(
+    specs=[
+        AssetCheckSpec("check_fechas_futuras", asset="leer_datos"),
+        AssetCheckSpec("check_columnas_esenciales", asset="leer_datos"),
+        AssetCheckSpec("check_paises_objetivo", asset="leer_datos"),
+    ],
+    ins=ENTRADA_PEREZOSA,
+)
+@instrumentar
+def chequeos_entrada(leer_datos, paises: PaisesObjetivo):
+    """
+     CHEQUEOS 1-3: fechas futuras, columnas esenciales y países objetivo
 
-@asset_check(asset=leer_datos)
-def check_columnas_esenciales(leer_datos: pd.DataFrame) -> AssetCheckResult:
-    """ CHEQUEO 2: Verificar columnas esenciales del proyecto"""
-    print("🔍 Verificando columnas esenciales...")
-    
-    # Definir columnas requeridas (flexibles por nombre)
-    columnas_requeridas = {
-        'pais': ['location', 'country'],
-        'fecha': ['date'],
-        'casos': ['new_cases'],
-        'vacunas': ['people_vaccinated'],
-        'poblacion': ['population']
-    }
-    
-    # Verificar cada categoría
-    resultados = {}
-    for categoria, posibles_nombres in columnas_requeridas.items():
-        encontrada = any(col in leer_datos.columns for col in posibles_nombres)
-        if encontrada:
-            nombre_real = next(col for col in posibles_nombres if col in leer_datos.columns)
-            resultados[categoria] = {'encontrada': True, 'nombre': nombre_real}
-        else:
-            resultados[categoria] = {'encontrada': False, 'nombre': None}
-    
-    # Evaluar resultado - CONVERTIR A BOOLEANO NATIVO
-    todas_encontradas = bool(all(r['encontrada'] for r in resultados.values()))
-    
-    if todas_encontradas:
-        columnas_mapa = {cat: res['nombre'] for cat, res in resultados.items()}
-        description = f" Todas las columnas encontradas: {columnas_mapa}"
-    else:
-        faltantes = [cat for cat, res in resultados.items() if not res['encontrada']]
-        description = f" Faltan columnas: {faltantes}"
-    
-    return AssetCheckResult(
-        passed=todas_encontradas,  
-        description=description,
-        metadata={
-            "columnas_encontradas": {cat: res['nombre'] for cat, res in resultados.items() if res['encontrada']},
-            "columnas_faltantes": [cat for cat, res in resultados.items() if not res['encontrada']]
-        }
+    Las estadísticas se calculan una sola vez (ver validacion_entrada.py) y
+    cada chequeo solo lee el resultado: el costo no crece con el número de chequeos
+    """
+    from pipeline_covid.validacion_entrada import (
+        calcular_estadisticas_entrada,
+        evaluar_fechas_futuras,
+        evaluar_columnas_esenciales,
+        evaluar_paises_objetivo,
     )
 
-@asset_check(asset=leer_datos)
-def check_paises_objetivo(leer_datos: pd.DataFrame) -> AssetCheckResult:
-    """ CHEQUEO 3: Verificar que Ecuador y Perú están disponibles"""
-    print(" Verificando países objetivo...")
-    
-    # Detectar nombre de columna país (flexibilidad)
-    col_pais = 'location' if 'location' in leer_datos.columns else 'country'
+    log.info("Calculando estadísticas de validación de entrada...")
+    estadisticas = calcular_estadisticas_entrada(leer_datos, COLUMNAS_REQUERIDAS)
     
-    paises_objetivo = ['Ecuador', 'Peru']
-    paises_disponibles = leer_datos[col_pais].unique()
-    paises_encontrados = [p for p in paises_objetivo if p in paises_disponibles]
-    
-    passed = len(paises_encontrados) == len(paises_objetivo)
-    
-    conteos = {}
-    for pais in paises_encontrados:
-        conteos[pais] = len(leer_datos[leer_datos[col_pais] == pais])
-    
-    if passed:
-        description = f" Ambos países encontrados: {conteos}"
-    else:
-        faltantes = [p for p in paises_objetivo if p not in paises_encontrados]
-        description = f"❌ Países faltantes: {faltantes}"
-    
-    return AssetCheckResult(
-        passed=bool(passed), 
-        description=description,
-        metadata={
-            "paises_encontrados": paises_encontrados,
-            "conteo_registros": conteos
-        }
-    )
+    yield evaluar_fechas_futuras(estadisticas)
+    yield evaluar_columnas_esenciales(estadisticas)
+    yield evaluar_paises_objetivo(estadisticas, paises.filtro())
 
 # =============================================================================
 # PASO 3: PROCESAMIENTO DE DATOS
 # =============================================================================
 
-@asset
-def datos_procesados(leer_datos: pd.DataFrame) -> pd.DataFrame:
+@asset(ins={"leer_datos": AssetIn(metadata={"columnas": COLUMNAS_PROCESAMIENTO})})
+@instrumentar
+def datos_procesados(leer_datos: DataFrame, motor: MotorCalculo, paises: PaisesObjetivo) -> DataFrame:
     """
      PASO 3: Procesar y limpiar datos para análisis
     
     FINALIDAD:
-    - Filtrar solo Ecuador y Perú
+    - Filtrar los países objetivo (recurso paises; por defecto Ecuador y Perú)
     - Eliminar registros con datos faltantes críticos
     - Preparar dataset limpio para cálculo de métricas
     - Eliminar duplicados si existen
     
+    MOTOR (recurso motor):
+    - "pandas": procesa el DataFrame de leer_datos
+    - "duckdb": consulta SQL directa sobre el CSV/Parquet en caché
+    
     RETORNA:
     - DataFrame limpio con columnas: location, date, new_cases, people_vaccinated, population
+      ordenado por (location, date)
     """
-    print(" Procesando datos...")
+    import pandas as pd
+
+    log.info("Procesando datos...")
     
-    df = leer_datos.copy()
-    print(f" Datos originales: {len(df):,} filas")
+    if motor.validar() == "duckdb":
+        df_final = procesar_con_duckdb(leer_datos, motor, paises.filtro())
+        registrar_alcance(df_final)
+        return df_final
+    
+    df = leer_datos
+    log.info(f"Datos originales: {len(df):,} filas")
     
     # 1. Detectar nombre de columna país (flexibilidad)
     col_pais = 'location' if 'location' in df.columns else 'country'
-    print(f"📍 Usando columna de país: '{col_pais}'")
-    
-    # 2. Filtrar países objetivo
-    paises_objetivo = ['Ecuador', 'Peru']
-    df_filtrado = df[df[col_pais].isin(paises_objetivo)].copy()
-    print(f" Después filtrar países: {len(df_filtrado):,} filas")
+    log.info(f"Usando columna de país: '{col_pais}'")
     
-    # 3. Eliminar duplicados
-    duplicados_antes = len(df_filtrado)
-    df_filtrado = df_filtrado.drop_duplicates(subset=[col_pais, 'date'])
-    duplicados_eliminados = duplicados_antes - len(df_filtrado)
+    # 2-6. Filtro de países, duplicados y registros sin datos críticos como
+    #    máscaras; las filas se toman una sola vez al final, columna por
+    #    columna. Sin copy-on-write (pandas < 3), loc[], rename/assign y la
+    #    selección booleana copiarían el DataFrame completo en cada paso
+    import numpy as np
+
+    # 2. Filtrar países objetivo (None = todos): posiciones de las filas candidatas
+    paises_objetivo = paises.filtro()
+    candidatas = None
+    if paises_objetivo is not None:
+        candidatas = np.flatnonzero(df[col_pais].isin(paises_objetivo).to_numpy())
+        log.info(f"Después filtrar países: {len(candidatas):,} filas")
+
+    def en_candidatas(columna: str) -> "pd.Series":
+        serie = df[columna]
+        return serie if candidatas is None else pd.Series(serie.array.take(candidatas), name=columna)
+    
+    # 3. Duplicados: solo una máscara
+    claves = df if candidatas is None else pd.DataFrame({col_pais: en_candidatas(col_pais),
+                                                         'date': en_candidatas('date')})
+    unicos = ~claves.duplicated(subset=[col_pais, 'date']).to_numpy()
+    duplicados_eliminados = int((~unicos).sum())
     if duplicados_eliminados > 0:
-        print(f" Duplicados eliminados: {duplicados_eliminados}")
+        log.info(f"Duplicados eliminados: {duplicados_eliminados}")
     
-    # 4. Convertir tipos de datos
-    df_filtrado['date'] = pd.to_datetime(df_filtrado['date'])
-    df_filtrado['new_cases'] = pd.to_numeric(df_filtrado['new_cases'], errors='coerce')
-    df_filtrado['people_vaccinated'] = pd.to_numeric(df_filtrado['people_vaccinated'], errors='coerce')
-    df_filtrado['population'] = pd.to_numeric(df_filtrado['population'], errors='coerce')
+    # 4. Tipos de las columnas numéricas (sin copia si ya lo son)
+    numericas = {col: pd.to_numeric(en_candidatas(col), errors='coerce')
+                 for col in ('new_cases', 'people_vaccinated', 'population')}
     
     # 5. Eliminar registros sin datos críticos
     # IMPORTANTE: No eliminar por vacunas faltantes (empezaron en 2021)
-    antes_limpieza = len(df_filtrado)
-    df_limpio = df_filtrado.dropna(subset=['new_cases', 'population'])
-    eliminados = antes_limpieza - len(df_limpio)
-    print(f"🧹 Registros con casos/población faltantes eliminados: {eliminados}")
-    
-    # 6. Seleccionar columnas esenciales
-    columnas_finales = [col_pais, 'date', 'new_cases', 'people_vaccinated', 'population']
-    df_final = df_limpio[columnas_finales].copy()
-    
-    # 7. Estandarizar nombre de columna país a 'location'
-    df_final = df_final.rename(columns={col_pais: 'location'})
-    
-    # 6. Estadísticas finales
-    print(f"📊 Datos procesados finales: {len(df_final):,} filas")
-    for pais in paises_objetivo:
-        count = len(df_final[df_final['location'] == pais])
-        print(f"  📍 {pais}: {count:,} registros")
-    
-    # 7. Validaciones básicas
+    validos = unicos & numericas['new_cases'].notna().to_numpy() & numericas['population'].notna().to_numpy()
+    eliminados = int((unicos & ~validos).sum())
+    log.info(f"Registros con casos/población faltantes eliminados: {eliminados}")
+    
+    # 6. Una sola selección de filas, país estandarizado a 'location' y orden
+    #    por (location, date) solo si hace falta
+    seleccion = np.flatnonzero(validos)
+    filas = seleccion if candidatas is None else candidatas[seleccion]
+    df_final = pd.DataFrame({
+        'location': df[col_pais].array.take(filas),
+        'date': pd.to_datetime(df['date'].array.take(filas)),
+        **{col: serie.array.take(seleccion) for col, serie in numericas.items()},
+    }, copy=False)
+    ordenado = ordenar_por_pais_fecha(df_final)
+    if ordenado is not df_final:
+        df_final = ordenado.reset_index(drop=True)
+    
+    # 7. Estadísticas finales
+    log.info(f"Datos procesados finales: {len(df_final):,} filas")
+    registrar_por_pais(df_final['location'].value_counts(sort=False), "{:,} registros")
+    
+    # 8. Validaciones básicas
     if len(df_final) == 0:
         raise ValueError("❌ No quedan datos después del procesamiento")
     
-    print(" Procesamiento completado exitosamente")
+    log.info("Procesamiento completado exitosamente")
+    registrar_alcance(df_final)
+    return df_final
+
+def procesar_con_duckdb(leer_datos: "pd.DataFrame", motor: MotorCalculo,
+                        paises_objetivo: Optional[List[str]]) -> "pd.DataFrame":
+    """datos_procesados con el motor DuckDB (lee el archivo, no el DataFrame)"""
+    from pipeline_covid.motor_duckdb import conectar, registrar_fuente, procesar_duckdb
+    
+    ruta = localizar_archivo()
+    con = conectar(motor)
+    col_pais = resolver_columnas(registrar_fuente(con, ruta))['pais']
+    # Mismo tipo de casos que entregó leer_datos (float32 en modo optimizado)
+    tipo_casos = "FLOAT" if leer_datos['new_cases'].dtype == 'float32' else "DOUBLE"
+    df_final = procesar_duckdb(con, col_pais, paises_objetivo, tipo_casos)
+    con.close()
+    
+    log.info(f"Datos procesados finales (duckdb): {len(df_final):,} filas")
+    if len(df_final) == 0:
+        raise ValueError("❌ No quedan datos después del procesamiento")
     return df_final
 
 # =============================================================================
 # PASO 4: CÁLCULO DE MÉTRICAS
 # =============================================================================
 
-@asset
-def metrica_incidencia_7d(datos_procesados: pd.DataFrame) -> pd.DataFrame:
-    """
-     PASO 4A: Incidencia acumulada a 7 días por 100 mil habitantes
-    """
-    print(" Calculando incidencia acumulada 7 días...")
-    
-    df = datos_procesados.copy()
-    
-    # 1. Calcular incidencia diaria por 100k habitantes
-    df['incidencia_diaria'] = (df['new_cases'] / df['population']) * 100000
+def calcular_incidencia_7d_pandas(datos: "pd.DataFrame") -> "pd.DataFrame":
+    """Incidencia 7d con pandas (implementación de referencia): fecha, pais, incidencia_7d"""
+    import pandas as pd
+
+    # 1. Ordenar por país y fecha (sin copia si ya viene ordenado)
+    df = ordenar_por_pais_fecha(datos)
     
-    # 2. Ordenar por país y fecha
-    df = df.sort_values(['location', 'date'])
+    # 2. Suma y conteo de los registros de los últimos 7 días por país
+    #    (con on='date' el resultado sale en el orden de df, indexado por país y fecha)
+    ventana = df.groupby('location', observed=True).rolling('7D', on='date', min_periods=1)['new_cases']
+    suma_7d = pd.Series(ventana.sum().to_numpy(), index=df.index)
+    conteo_7d = pd.Series(ventana.count().to_numpy(), index=df.index)
     
-    # 3. Aplicar promedio móvil de 7 días por país
-    df['incidencia_7d'] = df.groupby('location')['incidencia_diaria'].rolling(
-        window=7, 
-        min_periods=1
-    ).mean().reset_index(0, drop=True)
+    # 3. Promedio móvil por 100k habitantes
+    incidencia_7d = suma_7d / conteo_7d / df['population'] * 100000
     
     # 4. Seleccionar columnas finales
-    resultado = df[['date', 'location', 'incidencia_7d']].copy()
-    resultado.columns = ['fecha', 'pais', 'incidencia_7d']
-    
-    # 5. Estadísticas
-    print(f" Registros procesados: {len(resultado):,}")
-    for pais in resultado['pais'].unique():
-        pais_data = resultado[resultado['pais'] == pais]
-        max_incidencia = pais_data['incidencia_7d'].max()
-        print(f"  📍 {pais}: Máxima incidencia 7d = {max_incidencia:.2f}")
+    return pd.DataFrame({
+        'fecha': df['date'],
+        'pais': df['location'],
+        'incidencia_7d': incidencia_7d
+    }).reset_index(drop=True)
+
+
+def calcular_factor_crec_7d_pandas(datos: "pd.DataFrame") -> "pd.DataFrame":
+    """Factor de crecimiento semanal con pandas (referencia): semana_fin, pais, casos_semana, factor_crec_7d"""
+    import pandas as pd
+
+    df = ordenar_por_pais_fecha(datos)
+    
+    # 1. Casos de los últimos 7 días, solo si están los 7 días
+    por_fecha = df.groupby('location', observed=True).rolling(
+        '7D', on='date', min_periods=7
+    )['new_cases'].sum()
+    casos_semana_actual = pd.Series(por_fecha.to_numpy(), index=df.index)
+    
+    # 2. Casos de la semana previa: la suma del mismo país 7 días antes (por fecha, no por fila)
+    previa = por_fecha.reindex(pd.MultiIndex.from_arrays([df['location'], df['date'] - pd.Timedelta(days=7)]))
+    casos_semana_prev = pd.Series(previa.to_numpy(), index=df.index)
+    
+    # 3. Factor de crecimiento (división vectorizada)
+    factor_crec_7d = casos_semana_actual / casos_semana_prev
+    
+    # 4. Filtrar solo registros con datos completos
+    completos = casos_semana_actual.notna() & casos_semana_prev.notna() & factor_crec_7d.notna()
+    
+    return pd.DataFrame({
+        'semana_fin': df['date'][completos],
+        'pais': df['location'][completos],
+        'casos_semana': casos_semana_actual[completos].astype('int64'),
+        'factor_crec_7d': factor_crec_7d[completos].round(3)
+    }).reset_index(drop=True)
+
+
+def calcular_incidencia_7d_nucleos(datos: "pd.DataFrame") -> "pd.DataFrame":
+    """Incidencia 7d con los núcleos NumPy agrupados (ventanas.py): mismo resultado que la versión pandas"""
+    import numpy as np
+    import pandas as pd
+    from pipeline_covid.ventanas import dias_desde_inicio, inicios_grupos, media_movil
+
+    df = ordenar_por_pais_fecha(datos)
+    inicios = inicios_grupos(df['location'])
+    dias = dias_desde_inicio(df['date'].to_numpy())
+    promedio = media_movil(df['new_cases'].to_numpy(dtype='float64', na_value=np.nan), dias, inicios, 7)
+    return pd.DataFrame({
+        'fecha': df['date'],
+        'pais': df['location'],
+        'incidencia_7d': promedio / df['population'].to_numpy(dtype='float64', na_value=np.nan) * 100000
+    }).reset_index(drop=True)
+
+
+def calcular_factor_crec_7d_nucleos(datos: "pd.DataFrame") -> "pd.DataFrame":
+    """Factor de crecimiento semanal con los núcleos NumPy agrupados: mismo resultado que la versión pandas"""
+    import numpy as np
+    import pandas as pd
+    from pipeline_covid.ventanas import desfase, dias_desde_inicio, inicios_grupos, razon, suma_movil
+
+    df = ordenar_por_pais_fecha(datos)
+    inicios = inicios_grupos(df['location'])
+    dias = dias_desde_inicio(df['date'].to_numpy())
+    actual = suma_movil(df['new_cases'].to_numpy(dtype='float64', na_value=np.nan), dias, inicios, 7, min_periodos=7)
+    factor = razon(actual, desfase(actual, dias, inicios, 7))
+    completos = ~np.isnan(factor)
+    return pd.DataFrame({
+        'semana_fin': df['date'][completos],
+        'pais': df['location'][completos],
+        'casos_semana': actual[completos].astype('int64'),
+        'factor_crec_7d': np.round(factor[completos], 3)
+    }).reset_index(drop=True)
+
+
+def calcular_incidencia_7d(datos: "pd.DataFrame") -> "pd.DataFrame":
+    """Incidencia 7d del registro de métricas (mismo resultado que la versión pandas)"""
+    from pipeline_covid.metricas import calcular_metricas
+
+    return calcular_metricas(datos, ["incidencia_7d"])["incidencia_7d"]
+
+
+def calcular_factor_crec_7d(datos: "pd.DataFrame") -> "pd.DataFrame":
+    """Factor de crecimiento semanal del registro de métricas (mismo resultado que la versión pandas)"""
+    from pipeline_covid.metricas import calcular_metricas
+
+    return calcular_metricas(datos, ["factor_crec_7d"])["factor_crec_7d"]
+
+
+# Métricas que los motores duckdb, incremental y nucleos calculan por su
+# cuenta (una pasada cada una); las demás siempre salen del registro
+CALCULO_POR_METRICA = {
+    "incidencia_7d": calcular_incidencia_7d,
+    "factor_crec_7d": calcular_factor_crec_7d,
+}
+
+CALCULO_NUCLEOS = {
+    "incidencia_7d": calcular_incidencia_7d_nucleos,
+    "factor_crec_7d": calcular_factor_crec_7d_nucleos,
+}
+
+
+def calcular_incremental(nombre: str, datos: "pd.DataFrame", motor: MotorCalculo,
+                         calcular_completo) -> "pd.DataFrame":
+    """
+    Métrica con el motor incremental (ver incremental.py)
+    La actualización solo procesa y escribe las filas nuevas; la salida del
+    asset es la vista completa, que se arma aquí al leer los segmentos
+    """
+    from pipeline_covid.incremental import actualizar_metrica, leer_resultado
     
-    print("✅ Métrica incidencia 7d completada")
-    return resultado
+    filas, resumen = actualizar_metrica(
+        nombre, datos, motor.directorio_estado, calcular_completo, motor.verificar_incremental
+    )
+    log.info(f"Actualización {resumen['modo']}: {resumen['filas_nuevas']:,} filas nuevas, "
+             f"{resumen['filas_verificadas']:,} verificadas, {resumen['filas_escritas']:,} escritas")
+    if 'verificado' in resumen:
+        log.warning(f"Verificación contra recálculo completo: {'OK' if resumen['verificado'] else 'DIFERENCIAS'}")
+    if resumen["modo"] == "completo":
+        return filas
+    return leer_resultado(motor.directorio_estado, nombre, calcular_completo(datos.iloc[:0]))
 
-@asset 
-def metrica_factor_crec_7d(datos_procesados: pd.DataFrame) -> pd.DataFrame:
+
+def calcular_con_motor(nombres: List[str], datos: "pd.DataFrame", motor: MotorCalculo) -> Dict[str, "pd.DataFrame"]:
     """
-     PASO 4B: Factor de crecimiento semanal
+    Métricas del registro (metricas.py) con el motor elegido
+
+    - "pandas": todas juntas en una sola ordenación y una sola matriz
+    - "duckdb", "incremental", "nucleos": calculan cada métrica de
+      CALCULO_POR_METRICA por separado; el resto sale del registro en una pasada
+    """
+    from pipeline_covid.metricas import calcular_metricas
+    
+    motor_elegido = motor.validar()
+    propias = [nombre for nombre in nombres if nombre in CALCULO_POR_METRICA] if motor_elegido != "pandas" else []
+    resultados = {}
+    if motor_elegido == "duckdb" and propias:
+        from pipeline_covid.motor_duckdb import conectar, incidencia_duckdb, factor_crec_duckdb
+        funciones_sql = {"incidencia_7d": incidencia_duckdb, "factor_crec_7d": factor_crec_duckdb}
+        con = conectar(motor)
+        for nombre in propias:
+            resultados[nombre] = funciones_sql[nombre](con, datos)
+        con.close()
+    elif motor_elegido == "incremental":
+        for nombre in propias:
+            resultados[nombre] = calcular_incremental(nombre, datos, motor, CALCULO_POR_METRICA[nombre])
+    elif motor_elegido == "nucleos":
+        for nombre in propias:
+            resultados[nombre] = CALCULO_NUCLEOS[nombre](datos)
+    
+    pendientes = [nombre for nombre in nombres if nombre not in resultados]
+    if pendientes:
+        resultados.update(calcular_metricas(datos, pendientes))
+    return {nombre: resultados[nombre] for nombre in nombres}
+
+
+@multi_asset(
+    outs={
+        nombre_asset(nombre): AssetOut(dagster_type=DataFrame, description=especificacion["descripcion"],
+                                       is_required=False)
+        for nombre, especificacion in REGISTRO_METRICAS.items()
+    },
+    ins={"datos_procesados": AssetIn(metadata={"columnas": COLUMNAS_REGISTRO})},
+    can_subset=True,
+)
+@instrumentar
+def metricas(context: AssetExecutionContext, datos_procesados: DataFrame, motor: MotorCalculo):
     """
-    print(" Calculando factor crecimiento semanal...")
+     PASO 4: Métricas del registro (metricas.py), un asset por métrica
     
-    df = datos_procesados.copy()
-    df = df.sort_values(['location', 'date'])
+    - metrica_incidencia_7d / metrica_incidencia_14d: promedio de casos en 7 / 14 días por 100k habitantes
+    - metrica_factor_crec_7d: casos de la semana / casos de la semana previa
+    - metrica_vacunacion_100: personas vacunadas por cada 100 habitantes
+    - metrica_tiempo_duplicacion: días para duplicar los casos acumulados
     
-    resultados = []
+    Se calculan juntas (una ordenación, una matriz fecha x país); al
+    materializar solo algunas se calculan solo esas
+    """
+    seleccionados = context.op_execution_context.selected_output_names
+    nombres = [nombre for nombre in REGISTRO_METRICAS if nombre_asset(nombre) in seleccionados]
+    log.info(f"Calculando métricas: {', '.join(nombres)}...")
     
-    for pais in df['location'].unique():
-        pais_data = df[df['location'] == pais].copy()
-        pais_data = pais_data.set_index('date')
-        
-        # Calcular suma móvil de 7 días
-        pais_data['casos_semana_actual'] = pais_data['new_cases'].rolling(
-            window=7, 
-            min_periods=7
-        ).sum()
-        
-        # Casos de semana previa (desplazar 7 días)
-        pais_data['casos_semana_prev'] = pais_data['casos_semana_actual'].shift(7)
-        
-        # Calcular factor de crecimiento
-        pais_data['factor_crec_7d'] = (
-            pais_data['casos_semana_actual'] / pais_data['casos_semana_prev']
+    resultados = calcular_con_motor(nombres, datos_procesados, motor)
+    
+    for nombre, resultado in resultados.items():
+        # Estadísticas
+        log.info(f"{nombre}: {len(resultado):,} registros")
+        registrar_por_pais(
+            resultado.groupby('pais', observed=True)[nombre].max(), f"Máximo {nombre} = {{:.2f}}"
         )
-        
-        # Filtrar solo registros con datos completos
-        pais_data_completo = pais_data.dropna(subset=[
-            'casos_semana_actual', 
-            'casos_semana_prev', 
-            'factor_crec_7d'
-        ])
-        
-        # Agregar a resultados
-        for fecha, row in pais_data_completo.iterrows():
-            resultados.append({
-                'semana_fin': fecha,
-                'pais': pais,
-                'casos_semana': int(row['casos_semana_actual']),
-                'factor_crec_7d': round(row['factor_crec_7d'], 3)
-            })
-    
-    resultado = pd.DataFrame(resultados)
-    
-    print(f" Registros procesados: {len(resultado):,}")
-    for pais in resultado['pais'].unique():
-        pais_data = resultado[resultado['pais'] == pais]
-        factor_promedio = pais_data['factor_crec_7d'].mean()
-        print(f"  📍 {pais}: Factor promedio = {factor_promedio:.3f}")
-    
-    print(" Métrica factor crecimiento 7d completada")
-    return resultado
+        yield Output(resultado, output_name=nombre_asset(nombre))
+    
+    log.info("Métricas completadas")
 
 # =============================================================================
 # PASO 5: CHEQUEOS DE SALIDA (sobre las métricas)
 # =============================================================================
 
-@asset_check(asset=metrica_incidencia_7d)
-def check_valores_incidencia(metrica_incidencia_7d: pd.DataFrame) -> AssetCheckResult:
+@multi_asset_check(specs=[AssetCheckSpec("check_valores_incidencia", asset="metrica_incidencia_7d")],
+                   ins={"metrica_incidencia_7d": AssetIn(input_manager_key="lector_arrow")})
+@instrumentar
+def check_valores_incidencia(metrica_incidencia_7d) -> AssetCheckResult:
     """ CHEQUEO SALIDA 1: Validar rangos de incidencia"""
-    print("🔍 Validando rangos de incidencia...")
+    from pipeline_covid.io_parquet import leer_columna
+
+    log.info("Validando rangos de incidencia...")
+    
+    incidencia = leer_columna(metrica_incidencia_7d, 'incidencia_7d')
     
     # Validar rango: 0 ≤ incidencia_7d ≤ 2000
-    valores_fuera_rango = (
-        (metrica_incidencia_7d['incidencia_7d'] < 0) | 
-        (metrica_incidencia_7d['incidencia_7d'] > 2000)
-    ).sum()
+    valores_fuera_rango = ((incidencia < 0) | (incidencia > 2000)).sum()
     
     passed = bool(valores_fuera_rango == 0)
     
     if passed:
-        max_val = metrica_incidencia_7d['incidencia_7d'].max()
+        max_val = incidencia.max()
         description = f" Todos los valores en rango válido [0-2000]. Máximo: {max_val:.2f}"
     else:
         description = f" {valores_fuera_rango} valores fuera del rango [0-2000]"
@@ -381,39 +762,42 @@ def check_valores_incidencia(metrica_incidencia_7d: pd.DataFrame) -> AssetCheckR
         description=description,
         metadata={
             "valores_fuera_rango": int(valores_fuera_rango),
-            "total_registros": len(metrica_incidencia_7d),
-            "valor_maximo": float(metrica_incidencia_7d['incidencia_7d'].max()),
-            "valor_minimo": float(metrica_incidencia_7d['incidencia_7d'].min())
+            "total_registros": len(incidencia),
+            "valor_maximo": float(incidencia.max()),
+            "valor_minimo": float(incidencia.min())
         }
     )
 
-@asset_check(asset=metrica_factor_crec_7d)
-def check_factor_crecimiento(metrica_factor_crec_7d: pd.DataFrame) -> AssetCheckResult:
+@multi_asset_check(specs=[AssetCheckSpec("check_factor_crecimiento", asset="metrica_factor_crec_7d")],
+                   ins={"metrica_factor_crec_7d": AssetIn(input_manager_key="lector_arrow")})
+@instrumentar
+def check_factor_crecimiento(metrica_factor_crec_7d) -> AssetCheckResult:
     """ CHEQUEO SALIDA 2: Validar factor de crecimiento"""
-    print("🔍 Validando factor de crecimiento...")
+    from pipeline_covid.io_parquet import leer_columna
+
+    log.info("Validando factor de crecimiento...")
+    
+    factor = leer_columna(metrica_factor_crec_7d, 'factor_crec_7d')
     
     # Validar que no hay valores extremos (< 0.1 o > 10)
-    valores_extremos = (
-        (metrica_factor_crec_7d['factor_crec_7d'] < 0.1) | 
-        (metrica_factor_crec_7d['factor_crec_7d'] > 10)
-    ).sum()
+    valores_extremos = ((factor < 0.1) | (factor > 10)).sum()
     
     # Este check es warning, no crítico
-    passed = bool(valores_extremos < len(metrica_factor_crec_7d) * 0.05)  # Convertir a bool nativo
+    passed = bool(valores_extremos < len(factor) * 0.05)  # Convertir a bool nativo
     
     if passed:
         description = f" Factor de crecimiento en rangos normales. Extremos: {valores_extremos}"
     else:
         description = f" {valores_extremos} valores extremos de factor de crecimiento"
     
+    promedio_por_pais = factor.groupby(leer_columna(metrica_factor_crec_7d, 'pais'), observed=True).mean()
     return AssetCheckResult(
         passed=passed,  # Ahora es un bool nativo
         description=description,
         metadata={
             "valores_extremos": int(valores_extremos),
-            "total_registros": len(metrica_factor_crec_7d),
-            "factor_promedio_ecuador": float(metrica_factor_crec_7d[metrica_factor_crec_7d['pais'] == 'Ecuador']['factor_crec_7d'].mean()) if 'Ecuador' in metrica_factor_crec_7d['pais'].values else 0,
-            "factor_promedio_peru": float(metrica_factor_crec_7d[metrica_factor_crec_7d['pais'] == 'Peru']['factor_crec_7d'].mean()) if 'Peru' in metrica_factor_crec_7d['pais'].values else 0
+            "total_registros": len(factor),
+            "factor_promedio_por_pais": {str(pais): float(valor) for pais, valor in promedio_por_pais.items()}
         }
     )
 
@@ -421,85 +805,182 @@ def check_factor_crecimiento(metrica_factor_crec_7d: pd.DataFrame) -> AssetCheck
 # PASO 6: EXPORTACIÓN DE RESULTADOS (REPORTE FINAL)
 # =============================================================================
 
+class ConfigReporte(Config):
+    """Opciones del reporte final"""
+    # "xlsx" (streaming), "parquet" o "csv.gz" (ver reporte.py)
+    formato: str = "xlsx"
+    # Retención en pipeline_covid/output (None = sin límite)
+    max_reportes: Optional[int] = 20
+    max_megabytes: Optional[float] = None
+
+
 @asset
+@instrumentar
 def reporte_excel_covid(
-    datos_procesados: pd.DataFrame,
-    metrica_incidencia_7d: pd.DataFrame, 
-    metrica_factor_crec_7d: pd.DataFrame
+    config: ConfigReporte,
+    datos_procesados: DataFrame,
+    metrica_incidencia_7d: DataFrame, 
+    metrica_factor_crec_7d: DataFrame,
+    paises: PaisesObjetivo
 ) -> str:
     """
-     PASO 6: Exportar resultados finales a Excel
+     PASO 6: Exportar resultados finales
     
     FINALIDAD:
-    - Combinar todos los resultados en un archivo Excel
+    - Combinar todos los resultados en un reporte
     - Crear hojas separadas para cada métrica
     - Generar archivo que se puede commitear al repo
     - Establecer punto final del pipeline
     
+    FORMATOS (config.formato):
+    - "xlsx": Excel escrito en streaming (memoria constante por bloque de filas)
+    - "parquet" / "csv.gz": una carpeta con un archivo por hoja
+    
+    El nombre lleva una huella del contenido de las entradas: si ya existe un
+    reporte para los mismos datos se devuelve sin volver a escribirlo. Después
+    se aplica la retención (config.max_reportes / config.max_megabytes)
+    
     RETORNA:
-    - String con ruta del archivo generado
+    - String con ruta del archivo (o carpeta) generado
     """
-    import os  
+    from pipeline_covid.reporte import (
+        escribir_reporte, validar_formato, huella_contenido, reporte_existente, aplicar_retencion, tamano_en_disco
+    )
     
-    print("📋 Generando reporte Excel COVID-19...")
+    log.info(f"Generando reporte COVID-19 ({config.formato})...")
+    validar_formato(config.formato)
     
     # Crear directorio de salida si no existe
     output_dir = "pipeline_covid/output"
     os.makedirs(output_dir, exist_ok=True)
     
-    # Nombre del archivo con timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    archivo_excel = f"{output_dir}/reporte_covid_ecuador_peru_{timestamp}.xlsx"
-    
-    # Crear archivo Excel con múltiples hojas
-    with pd.ExcelWriter(archivo_excel, engine='openpyxl') as writer:
-        # Hoja 1: Datos procesados
-        datos_procesados.to_excel(writer, sheet_name='Datos_Procesados', index=False)
-        
-        # Hoja 2: Incidencia 7 días
-        metrica_incidencia_7d.to_excel(writer, sheet_name='Incidencia_7d', index=False)
-        
-        # Hoja 3: Factor crecimiento
-        metrica_factor_crec_7d.to_excel(writer, sheet_name='Factor_Crec_7d', index=False)
-        
-        # Hoja 4: Resumen estadístico
-        resumen_stats = generar_resumen_estadistico(datos_procesados, metrica_incidencia_7d, metrica_factor_crec_7d)
-        resumen_stats.to_excel(writer, sheet_name='Resumen_Estadistico', index=False)
+    # Nombre según el contenido: mismos datos, países y formato -> mismo reporte
+    entradas = {
+        'Datos_Procesados': datos_procesados,
+        'Incidencia_7d': metrica_incidencia_7d,
+        'Factor_Crec_7d': metrica_factor_crec_7d,
+    }
+    huella = huella_contenido(entradas, config.formato, repr(paises.filtro()))
+    prefijo = "reporte_covid_"
+    ruta_base = f"{output_dir}/{prefijo}{paises.etiqueta()}_{huella}"
     
-    print(f"✅ Reporte Excel generado: {archivo_excel}")
+    ruta_reporte = reporte_existente(ruta_base, config.formato)
+    if ruta_reporte is not None:
+        log.info(f"Reporte sin cambios, se reutiliza: {ruta_reporte}")
+    else:
+        hojas = {
+            **entradas,
+            'Resumen_Estadistico': generar_resumen_estadistico(
+                datos_procesados, metrica_incidencia_7d, metrica_factor_crec_7d, paises.filtro()
+            ),
+        }
+        ruta_reporte = escribir_reporte(hojas, ruta_base, config.formato)
+        log.info(f"Reporte generado: {ruta_reporte}")
     
     # Estadísticas del archivo generado
-    import os
-    tamaño_mb = os.path.getsize(archivo_excel) / (1024 * 1024)
-    print(f" Archivo generado: {tamaño_mb:.2f} MB")
+    tamaño_mb = tamano_en_disco(ruta_reporte) / (1024 * 1024)
+    log.info(f"Archivo generado: {tamaño_mb:.2f} MB")
+    
+    # Retención: los reportes más antiguos se eliminan
+    max_bytes = int(config.max_megabytes * 1024 * 1024) if config.max_megabytes is not None else None
+    eliminados = aplicar_retencion(output_dir, prefijo, config.max_reportes, max_bytes, conservar=ruta_reporte)
+    if eliminados:
+        log.info(f"Reportes antiguos eliminados: {len(eliminados)}")
     
-    return archivo_excel
+    return ruta_reporte
 
-def generar_resumen_estadistico(datos_procesados: pd.DataFrame, incidencia: pd.DataFrame, factor_crec: pd.DataFrame) -> pd.DataFrame:
-    """Generar tabla de resumen estadístico"""
+def generar_resumen_estadistico(datos_procesados: "pd.DataFrame", incidencia: "pd.DataFrame",
+                                factor_crec: "pd.DataFrame", paises: Optional[List[str]] = None) -> "pd.DataFrame":
+    """
+    Generar tabla de resumen estadístico
     
-    resumen = []
+    Una agregación agrupada por tabla (sin bucles por país). Si se pasa
+    'paises', el resumen incluye esos países aunque no tengan datos.
+    De la misma agrupación de incidencia (agregaciones nombradas de
+    groupby().agg() más groupby().quantile()) salen los percentiles p50/p95
+    y la semana pico (fin de la ventana de 7 días con mayor incidencia).
+    """
+    base = datos_procesados.groupby('location', observed=True).agg(
+        registros_totales=('date', 'size'),
+        fecha_inicio=('date', 'min'),
+        fecha_fin=('date', 'max'),
+        casos_promedio_diario=('new_cases', 'mean'),
+        casos_maximo_diario=('new_cases', 'max'),
+        poblacion=('population', 'first')
+    )
     
-    for pais in ['Ecuador', 'Peru']:
-        # Datos base
-        datos_pais = datos_procesados[datos_procesados['location'] == pais]
-        inc_pais = incidencia[incidencia['pais'] == pais]
-        crec_pais = factor_crec[factor_crec['pais'] == pais]
-        
-        resumen.append({
-            'pais': pais,
-            'registros_totales': len(datos_pais),
-            'fecha_inicio': datos_pais['date'].min().strftime('%Y-%m-%d') if len(datos_pais) > 0 else 'N/A',
-            'fecha_fin': datos_pais['date'].max().strftime('%Y-%m-%d') if len(datos_pais) > 0 else 'N/A',
-            'casos_promedio_diario': datos_pais['new_cases'].mean() if len(datos_pais) > 0 else 0,
-            'casos_maximo_diario': datos_pais['new_cases'].max() if len(datos_pais) > 0 else 0,
-            'incidencia_7d_promedio': inc_pais['incidencia_7d'].mean() if len(inc_pais) > 0 else 0,
-            'incidencia_7d_maxima': inc_pais['incidencia_7d'].max() if len(inc_pais) > 0 else 0,
-            'factor_crec_promedio': crec_pais['factor_crec_7d'].mean() if len(crec_pais) > 0 else 0,
-            'poblacion': datos_pais['population'].iloc[0] if len(datos_pais) > 0 else 0
-        })
-    
-    return pd.DataFrame(resumen)
+    # Sin las filas NaN (no cuentan en ninguna estadística) la semana pico es
+    # la fila de idxmax; un país sin ninguna incidencia queda fuera y recibe
+    # los valores por defecto. Todo son agregaciones nativas de groupby sobre
+    # la misma agrupación (el p95 con quantile, que agg no acepta con
+    # parámetro), sin funciones Python por país
+    validas = incidencia.dropna(subset=['incidencia_7d'])
+    por_pais = validas.groupby('pais', observed=True)['incidencia_7d']
+    inc = por_pais.agg(
+        incidencia_7d_promedio='mean',
+        incidencia_7d_maxima='max',
+        incidencia_7d_p50='median',
+        semana_pico='idxmax'
+    )
+    inc['incidencia_7d_p95'] = por_pais.quantile(0.95)
+    inc['semana_pico'] = validas['fecha'].loc[inc['semana_pico']].to_numpy()
+    
+    crec = factor_crec.groupby('pais', observed=True)['factor_crec_7d'].agg(factor_crec_promedio='mean')
+    
+    for tabla in (base, inc, crec):
+        tabla.index = tabla.index.astype(str)
+    resumen = base.join(inc).join(crec)
+    if paises is not None:
+        resumen = resumen.reindex(paises)
+    
+    # Valores por defecto para países sin datos
+    for col in ['fecha_inicio', 'fecha_fin', 'semana_pico']:
+        resumen[col] = resumen[col].dt.strftime('%Y-%m-%d').fillna('N/A')
+    resumen['registros_totales'] = resumen['registros_totales'].fillna(0).astype(int)
+    resumen = resumen.fillna(0)
+    
+    return resumen.rename_axis('pais').reset_index()[[
+        'pais', 'registros_totales', 'fecha_inicio', 'fecha_fin',
+        'casos_promedio_diario', 'casos_maximo_diario',
+        'incidencia_7d_promedio', 'incidencia_7d_maxima',
+        'incidencia_7d_p50', 'incidencia_7d_p95', 'semana_pico',
+        'factor_crec_promedio', 'poblacion'
+    ]]
+
+# =============================================================================
+# PASO 7: ÍNDICE DE CONSULTAS
+# =============================================================================
+
+class ConfigIndice(Config):
+    """Carpeta de los índices que sirve consultas.py"""
+    directorio: str = "pipeline_covid/output/indice"
+
+
+@asset
+@instrumentar
+def indice_metricas(
+    config: ConfigIndice,
+    metrica_incidencia_7d: DataFrame,
+    metrica_factor_crec_7d: DataFrame,
+) -> str:
+    """
+     PASO 7: Índice (país, fecha) de las métricas para consultas rápidas
+
+    Un archivo Arrow IPC por métrica, ordenado por país y fecha, que
+    consultas.py abre con memory-map para responder consultas puntuales, por
+    rango y del último valor de cada país sin leer el reporte
+
+    RETORNA:
+    - Carpeta con los índices
+    """
+    from pipeline_covid.consultas import escribir_indice, METRICAS_INDEXADAS, EXTENSION
+
+    salidas = {"incidencia_7d": metrica_incidencia_7d, "factor_crec_7d": metrica_factor_crec_7d}
+    for nombre, (columna_fecha, columnas) in METRICAS_INDEXADAS.items():
+        ruta = os.path.join(config.directorio, nombre + EXTENSION)
+        filas = escribir_indice(salidas[nombre], columna_fecha, columnas, ruta)
+        log.info(f"Índice {nombre}: {filas:,} filas en {ruta}")
+    return config.directorio
 
 # =============================================================================
 # METADATOS Y DOCUMENTACIÓN
@@ -510,16 +991,18 @@ def get_asset_metadata() -> Dict[str, Any]:
     return {
         "descripcion": "Pipeline de análisis COVID-19 para Ecuador vs Perú",
         "fuente_datos": "Our World in Data (OWID)",
-        "url_datos": "https://covid.ourworldindata.org/data/owid-covid-data.csv",
-        "paises_analizados": ["Ecuador", "Peru"],
+        "url_datos": URL_OWID,
+        "paises_analizados": PAISES_OBJETIVO,
+        "paises_configurables": "recurso 'paises' (PaisesObjetivo); ['todos'] = todas las ubicaciones",
         "columnas_clave": ["location", "date", "new_cases", "people_vaccinated", "population"],
-        "metricas_calculadas": ["incidencia_7d", "factor_crec_7d"],
+        "metricas_calculadas": list(REGISTRO_METRICAS),
         "pasos_pipeline": [
-            "1. Lectura datos OWID",
-            "2. Chequeos entrada",
+            "1. Descarga de la fuente OWID",
+            "2. Lectura datos OWID y chequeos entrada",
             "3. Procesamiento y limpieza", 
             "4. Cálculo métricas",
             "5. Chequeos salida",
-            "6. Exportación Excel"
+            "6. Exportación Excel",
+            "7. Índice de consultas"
         ]
     }
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""
+Caché columnar (Parquet) del CSV de OWID
+Convierte el CSV una sola vez a un dataset Parquet particionado por país
+y lo reutiliza mientras el archivo original no cambie
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+from typing import Dict, Any, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+log = logging.getLogger(__name__)
+
+# Columnas de texto conocidas del CSV de OWID (el resto se lee como float64)
+COLUMNAS_TEXTO = ['iso_code', 'continent', 'location', 'country', 'date', 'tests_units']
+
+NOMBRE_MANIFIESTO = "manifiesto.json"
+
+
+def directorio_cache(ruta_csv: str) -> str:
+    """Directorio de caché asociado a un CSV: <carpeta_csv>/cache_parquet/<nombre_csv>"""
+    nombre = os.path.splitext(os.path.basename(ruta_csv))[0]
+    return os.path.join(os.path.dirname(ruta_csv), "cache_parquet", nombre)
+
+
+def calcular_sha256(ruta: str, tamano_bloque: int = 8 * 1024 * 1024) -> str:
+    """SHA-256 del archivo leído por bloques (mismo hash que el oid de Git LFS)"""
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _leer_manifiesto(dir_cache: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(dir_cache, NOMBRE_MANIFIESTO)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _escribir_manifiesto(dir_cache: str, manifiesto: Dict[str, Any]) -> None:
+    ruta_tmp = os.path.join(dir_cache, NOMBRE_MANIFIESTO + ".tmp")
+    with open(ruta_tmp, "w") as f:
+        json.dump(manifiesto, f, indent=2)
+    os.replace(ruta_tmp, os.path.join(dir_cache, NOMBRE_MANIFIESTO))
+
+
+def _convertir_a_parquet(ruta_csv: str, destino: str) -> Dict[str, Any]:
+    """Convertir el CSV en streaming a un dataset Parquet particionado por país (hive)"""
+    columnas = list(pd.read_csv(ruta_csv, nrows=0).columns)
+    col_pais = 'location' if 'location' in columnas else ('country' if 'country' in columnas else None)
+    if col_pais is None:
+        raise ValueError("El CSV no tiene columna 'location' ni 'country' para particionar")
+
+    # Tipos explícitos: la inferencia por bloque falla con columnas vacías al inicio del archivo
+    tipos = {col: (pa.string() if col in COLUMNAS_TEXTO else pa.float64()) for col in columnas}
+    lector = pacsv.open_csv(
+        ruta_csv,
+        convert_options=pacsv.ConvertOptions(column_types=tipos, strings_can_be_null=True)
+    )
+
+    ds.write_dataset(
+        lector,
+        destino,
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([(col_pais, pa.string())]), flavor="hive"),
+        max_partitions=4096,
+        existing_data_behavior="delete_matching",
+        preserve_order=True,
+    )
+    return {"columnas": columnas, "col_pais": col_pais}
+
+
+def asegurar_cache(ruta_csv: str) -> Dict[str, Any]:
+    """
+    Devolver el manifiesto de un caché válido para ruta_csv, creándolo si hace falta
+
+    Invalidación por huella del archivo:
+    - tamaño y mtime iguales -> caché válido sin leer el CSV
+    - si cambian, se calcula el SHA-256; si coincide solo se actualiza el mtime
+    - si el contenido cambió, se regenera el dataset Parquet
+    """
+    info = os.stat(ruta_csv)
+    dir_cache = directorio_cache(ruta_csv)
+    manifiesto = _leer_manifiesto(dir_cache)
+
+    def dataset_existe(m):
+        return m is not None and os.path.isdir(os.path.join(dir_cache, m["sha256"]))
+
+    if dataset_existe(manifiesto) and manifiesto["tamano"] == info.st_size and manifiesto["mtime_ns"] == info.st_mtime_ns:
+        return dict(manifiesto, dataset=os.path.join(dir_cache, manifiesto["sha256"]))
+
+    sha256 = calcular_sha256(ruta_csv)
+    if dataset_existe(manifiesto) and manifiesto["sha256"] == sha256:
+        manifiesto.update(tamano=info.st_size, mtime_ns=info.st_mtime_ns)
+        _escribir_manifiesto(dir_cache, manifiesto)
+        return dict(manifiesto, dataset=os.path.join(dir_cache, sha256))
+
+    log.info(f"Generando caché Parquet de {ruta_csv}...")
+    os.makedirs(dir_cache, exist_ok=True)
+    destino_tmp = os.path.join(dir_cache, sha256 + ".tmp")
+    shutil.rmtree(destino_tmp, ignore_errors=True)
+    esquema = _convertir_a_parquet(ruta_csv, destino_tmp)
+    shutil.rmtree(os.path.join(dir_cache, sha256), ignore_errors=True)
+    os.replace(destino_tmp, os.path.join(dir_cache, sha256))
+
+    # Eliminar datasets de versiones anteriores del CSV
+    if manifiesto is not None and manifiesto.get("sha256") != sha256:
+        shutil.rmtree(os.path.join(dir_cache, manifiesto["sha256"]), ignore_errors=True)
+
+    manifiesto = {"tamano": info.st_size, "mtime_ns": info.st_mtime_ns, "sha256": sha256, **esquema}
+    _escribir_manifiesto(dir_cache, manifiesto)
+    return dict(manifiesto, dataset=os.path.join(dir_cache, sha256))
+
+
+def leer_cache(manifiesto: Dict[str, Any], columnas: Optional[List[str]] = None,
+               paises: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Leer el dataset Parquet con memory-map, proyectando columnas y
+    leyendo solo las particiones de los países pedidos
+    """
+    col_pais = manifiesto["col_pais"]
+    columnas = columnas if columnas is not None else manifiesto["columnas"]
+    filtros = [(col_pais, "in", list(paises))] if paises is not None else None
+
+    tabla = pq.read_table(
+        manifiesto["dataset"],
+        columns=columnas,
+        filters=filtros,
+        memory_map=True,
+        partitioning=ds.partitioning(pa.schema([(col_pais, pa.string())]), flavor="hive"),
+    )
+    # La columna de partición vuelve al final: restaurar el orden original
+    return tabla.select(columnas).to_pandas()
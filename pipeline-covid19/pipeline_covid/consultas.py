@@ -0,0 +1,309 @@
+"""
+Índice de consultas sobre las métricas calculadas
+Cada métrica se guarda ordenada por (país, fecha) en un archivo Arrow IPC:
+una columna int32 con el día (días desde 1970-01-01) y una por valor, más en
+los metadatos del esquema la lista de países y dónde empieza cada uno.
+
+Al abrirlo con memory-map las columnas son vistas NumPy sin copia; una
+consulta busca el tramo del país en un dict y la fecha con búsqueda binaria
+dentro del tramo, sin pandas en el camino:
+- punto(pais, fecha): valor de un día
+- rango(pais, desde, hasta): serie de un intervalo de fechas
+- ultimos(paises): último valor de cada país
+
+crear_servidor() expone las consultas como JSON en un servidor HTTP local:
+    GET /metricas
+    GET /metricas/<metrica>/ultimos?paises=Ecuador,Peru
+    GET /metricas/<metrica>/<pais>?fecha=2021-05-01
+    GET /metricas/<metrica>/<pais>?desde=2021-05-01&hasta=2021-05-31
+
+Uso (desde pipeline-covid19):
+    python -m pipeline_covid.consultas --directorio pipeline_covid/output/indice --puerto 8765
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+log = logging.getLogger(__name__)
+
+# Métrica -> (columna de fecha, columnas de valores) en la salida del asset
+METRICAS_INDEXADAS = {
+    "incidencia_7d": ("fecha", ["incidencia_7d"]),
+    "factor_crec_7d": ("semana_fin", ["casos_semana", "factor_crec_7d"]),
+}
+
+EXTENSION = ".arrow"
+PUERTO_POR_DEFECTO = 8765
+ORDINAL_1970 = date(1970, 1, 1).toordinal()
+
+
+def _dia(fecha: Any) -> np.int32:
+    """Días desde 1970-01-01 de una fecha ISO, date, Timestamp o datetime64 (int32, como la columna)"""
+    try:
+        if isinstance(fecha, str):
+            # fromisoformat es varias veces más rápido que np.datetime64 para el caso habitual
+            return np.int32(date.fromisoformat(fecha).toordinal() - ORDINAL_1970)
+        return np.int32(np.datetime64(fecha, 'D').astype(np.int64))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"❌ Fecha no válida: {fecha!r}") from e
+
+
+def _valor(valor: Any) -> Any:
+    """Escalar NumPy a tipo de Python (NaN -> None, para JSON)"""
+    valor = valor.item()
+    return None if isinstance(valor, float) and valor != valor else valor
+
+
+def _lista(valores: np.ndarray) -> list:
+    """Array NumPy a lista de Python en una sola conversión (NaN -> None, para JSON)"""
+    if valores.dtype.kind == 'f':
+        return np.where(np.isnan(valores), None, valores).tolist()
+    return valores.tolist()
+
+
+def _fechas(dias: np.ndarray) -> List[str]:
+    return np.datetime_as_string(dias.astype('datetime64[D]')).tolist()
+
+
+# =============================================================================
+# CONSTRUCCIÓN DEL ÍNDICE
+# =============================================================================
+
+def escribir_indice(datos: pd.DataFrame, columna_fecha: str, columnas: List[str], ruta: str) -> int:
+    """Guardar `datos` ordenados por (pais, fecha) como índice Arrow IPC; devuelve el número de filas"""
+    # factorize usa los códigos si la columna es categórica (sin comparar cadenas fila a fila);
+    # después se renumeran los países en orden alfabético
+    codigos, unicos = pd.factorize(datos['pais'])
+    nombres = np.asarray(unicos.astype(str), dtype=object)
+    orden_paises = np.argsort(nombres, kind='stable')
+    posicion = np.empty(len(nombres), dtype=np.int64)
+    posicion[orden_paises] = np.arange(len(nombres))
+    paises, codigos = nombres[orden_paises], posicion[codigos]
+    dias = datos[columna_fecha].to_numpy().astype('datetime64[D]').astype(np.int32)
+    orden = np.lexsort((dias, codigos))
+    codigos, dias = codigos[orden], dias[orden]
+    if ((codigos[1:] == codigos[:-1]) & (dias[1:] == dias[:-1])).any():
+        raise ValueError(f"❌ Índice: fechas repetidas para un mismo país en {os.path.basename(ruta)}")
+
+    inicios = np.searchsorted(codigos, np.arange(len(paises) + 1))
+    arrays = {"dia": pa.array(dias)}
+    for columna in columnas:
+        # Desde NumPy: NaN se queda como NaN (sin máscara de nulos), así la lectura es zero-copy
+        arrays[columna] = pa.array(datos[columna].to_numpy()[orden])
+    tabla = pa.table(arrays).replace_schema_metadata({
+        "paises": json.dumps(paises.tolist()),
+        "inicios": json.dumps(inicios.tolist()),
+    })
+
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    ruta_tmp = ruta + ".tmp"
+    with pa.OSFile(ruta_tmp, "wb") as destino:
+        with pa.ipc.new_file(destino, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    # Reemplazo atómico: un servidor con el índice anterior mapeado sigue viéndolo entero
+    os.replace(ruta_tmp, ruta)
+    return tabla.num_rows
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+class IndiceMetrica:
+    """Índice (país, fecha) de una métrica sobre un archivo Arrow IPC con memory-map"""
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self.modificado = os.stat(ruta).st_mtime_ns
+        with pa.memory_map(ruta, "r") as origen:
+            tabla = pa.ipc.open_file(origen).read_all()
+        metadatos = tabla.schema.metadata
+        paises = json.loads(metadatos[b"paises"])
+        inicios = json.loads(metadatos[b"inicios"])
+        self.tramos = {pais: (inicios[i], inicios[i + 1]) for i, pais in enumerate(paises)}
+        self.dias = tabla.column("dia").to_numpy()
+        self.columnas = [nombre for nombre in tabla.schema.names if nombre != "dia"]
+        self.valores = {nombre: tabla.column(nombre).to_numpy() for nombre in self.columnas}
+        self.filas = tabla.num_rows
+
+    @property
+    def paises(self) -> List[str]:
+        return list(self.tramos)
+
+    def _fila(self, pais: str, i: int) -> Dict[str, Any]:
+        fila = {"pais": pais, "fecha": str(np.datetime64(int(self.dias[i]), 'D'))}
+        for nombre, valores in self.valores.items():
+            fila[nombre] = _valor(valores[i])
+        return fila
+
+    def _tramo(self, pais: str) -> Tuple[int, int]:
+        try:
+            return self.tramos[pais]
+        except KeyError:
+            raise KeyError(f"País sin datos: {pais}") from None
+
+    def punto(self, pais: str, fecha: Any) -> Optional[Dict[str, Any]]:
+        """Fila de `pais` en `fecha`, o None si ese día no tiene valor"""
+        inicio, fin = self._tramo(pais)
+        dia = _dia(fecha)
+        i = inicio + int(self.dias[inicio:fin].searchsorted(dia))
+        return self._fila(pais, i) if i < fin and self.dias[i] == dia else None
+
+    def posiciones(self, pais: str, desde: Any = None, hasta: Any = None) -> Tuple[int, int]:
+        """Filas [i, j) de `pais` con desde <= fecha <= hasta (extremos opcionales)"""
+        inicio, fin = self._tramo(pais)
+        dias = self.dias[inicio:fin]
+        i = inicio + int(dias.searchsorted(_dia(desde), side='left')) if desde is not None else inicio
+        j = inicio + int(dias.searchsorted(_dia(hasta), side='right')) if hasta is not None else fin
+        return i, max(i, j)
+
+    def rango(self, pais: str, desde: Any = None, hasta: Any = None) -> Dict[str, list]:
+        """Serie de `pais` entre dos fechas (incluidas) en formato columnar"""
+        i, j = self.posiciones(pais, desde, hasta)
+        serie = {"fecha": _fechas(self.dias[i:j])}
+        for nombre, valores in self.valores.items():
+            serie[nombre] = _lista(valores[i:j])
+        return serie
+
+    def ultimos(self, paises: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Última fila de cada país (de todos si paises es None)"""
+        paises = self.paises if paises is None else paises
+        # Los tramos nunca están vacíos (solo se indexan países con filas): la última fila es fin - 1
+        filas = np.array([self._tramo(pais)[1] - 1 for pais in paises], dtype=np.int64)
+        columnas = {"pais": paises, "fecha": _fechas(self.dias[filas])}
+        for nombre, valores in self.valores.items():
+            columnas[nombre] = _lista(valores[filas])
+        return [dict(zip(columnas, fila)) for fila in zip(*columnas.values())]
+
+
+class ConsultasMetricas:
+    """
+    Índices de un directorio (<metrica>.arrow); se recargan si el archivo cambia
+
+    actualizar() arma un dict nuevo y lo publica en una sola asignación: los
+    hilos del servidor que leen `indices` ven el anterior o el nuevo completo,
+    nunca uno a medio cambiar
+    """
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        self.indices: Dict[str, IndiceMetrica] = {}
+        self.actualizar()
+
+    def actualizar(self) -> None:
+        anteriores = self.indices
+        nuevos: Dict[str, IndiceMetrica] = {}
+        for ruta in sorted(glob.glob(os.path.join(self.directorio, "*" + EXTENSION))):
+            nombre = os.path.basename(ruta)[:-len(EXTENSION)]
+            actual = anteriores.get(nombre)
+            if actual is None or os.stat(ruta).st_mtime_ns != actual.modificado:
+                actual = IndiceMetrica(ruta)
+                log.info(f"Índice cargado: {nombre} ({actual.filas:,} filas)")
+            nuevos[nombre] = actual
+        self.indices = nuevos
+
+    def __getitem__(self, metrica: str) -> IndiceMetrica:
+        try:
+            return self.indices[metrica]
+        except KeyError:
+            raise KeyError(f"Métrica sin índice: {metrica}") from None
+
+
+# =============================================================================
+# SERVIDOR HTTP/JSON
+# =============================================================================
+
+class ManejadorConsultas(BaseHTTPRequestHandler):
+    consultas: ConsultasMetricas = None
+
+    def log_message(self, formato, *args):
+        log.debug(formato, *args)
+
+    def _responder(self, estado: int, datos: bytes) -> None:
+        self.send_response(estado)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _resolver(self) -> Any:
+        url = urlparse(self.path)
+        partes = [unquote(parte) for parte in url.path.strip("/").split("/")]
+        parametros = {clave: valores[-1] for clave, valores in parse_qs(url.query).items()}
+        if partes[0] != "metricas" or len(partes) > 3:
+            raise KeyError(f"Ruta desconocida: {url.path}")
+
+        self.consultas.actualizar()
+        if len(partes) == 1:
+            indices = self.consultas.indices
+            return {nombre: {"filas": indice.filas, "columnas": indice.columnas, "paises": indice.paises}
+                    for nombre, indice in indices.items()}
+        indice = self.consultas[partes[1]]
+        if len(partes) == 2:
+            raise KeyError("Falta el país (o 'ultimos')")
+        if partes[2] == "ultimos":
+            paises = parametros["paises"].split(",") if "paises" in parametros else None
+            return indice.ultimos(paises)
+        if "fecha" in parametros:
+            fila = indice.punto(partes[2], parametros["fecha"])
+            if fila is None:
+                raise KeyError(f"Sin valor para {partes[2]} el {parametros['fecha']}")
+            return fila
+        return {"pais": partes[2], **indice.rango(partes[2], parametros.get("desde"), parametros.get("hasta"))}
+
+    def do_GET(self):
+        # La respuesta se serializa antes de enviar nada: cualquier error sale como JSON
+        try:
+            estado, cuerpo = 200, _json(self._resolver())
+        except KeyError as e:
+            estado, cuerpo = 404, _json({"error": e.args[0]})
+        except ValueError as e:
+            estado, cuerpo = 400, _json({"error": str(e)})
+        except Exception:
+            log.exception(f"Error interno al consultar {self.path}")
+            estado, cuerpo = 500, _json({"error": "Error interno del servidor"})
+        self._responder(estado, cuerpo)
+
+
+def _json(cuerpo: Any) -> bytes:
+    return json.dumps(cuerpo, ensure_ascii=False).encode()
+
+
+def crear_servidor(directorio: str, host: str = "127.0.0.1", puerto: int = PUERTO_POR_DEFECTO) -> ThreadingHTTPServer:
+    """Servidor (sin arrancar) sobre los índices de `directorio`; puerto=0 elige uno libre"""
+    manejador = type("Manejador", (ManejadorConsultas,), {"consultas": ConsultasMetricas(directorio)})
+    return ThreadingHTTPServer((host, puerto), manejador)
+
+
+def main(argumentos: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="API HTTP/JSON de consultas sobre las métricas")
+    parser.add_argument("--directorio", default="pipeline_covid/output/indice")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO)
+    opciones = parser.parse_args(argumentos)
+
+    servidor = crear_servidor(opciones.directorio, opciones.host, opciones.puerto)
+    log.info(f"Consultas en http://{opciones.host}:{servidor.server_address[1]}/metricas")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+
+if __name__ == "__main__":
+    from pipeline_covid.instrumentacion import configurar_logging
+    configurar_logging()
+    main()
@@ -1,32 +1,78 @@
-from dagster import Definitions
+from dagster import (
+    Definitions,
+    AssetSelection,
+    define_asset_job,
+    in_process_executor,
+)
 
 # Import ABSOLUTO (no relativo)
 from pipeline_covid.assets import (
+    fuente_owid,
     leer_datos,
     datos_procesados,
-    metrica_incidencia_7d,
-    metrica_factor_crec_7d,
+    metricas,
     reporte_excel_covid,
-    check_fechas_futuras,
-    check_columnas_esenciales,
-    check_paises_objetivo,
+    indice_metricas,
+    chequeos_entrada,
     check_valores_incidencia,
     check_factor_crecimiento
 )
+from pipeline_covid.particiones import (
+    incidencia_7d_diaria,
+    factor_crec_7d_diario,
+    sensor_metricas_diarias,
+    JOB_METRICAS_DIARIAS,
+)
+from pipeline_covid.recursos import MotorCalculo, PaisesObjetivo
+from pipeline_covid.io_parquet import ArrowIOManagerFactory, LectorArrowFactory
+from pipeline_covid.instrumentacion import configurar_logging
+
+# Logging del paquete al cargar las definiciones (dagster dev, dagster job execute)
+configurar_logging()
+
+# Job incremental: particiones diarias con todos los países. No tiene schedule:
+# lo lanza sensor_metricas_diarias tras cada materialización de datos_procesados,
+# una sola ejecución con el rango de los últimos días (las particiones salen de
+# los assets seleccionados)
+metricas_diarias_job = define_asset_job(
+    JOB_METRICAS_DIARIAS,
+    selection=[incidencia_7d_diaria, factor_crec_7d_diario],
+)
+
+# Pipeline completo, en secuencia dentro del proceso: las métricas son un solo
+# paso (multi_asset del registro) y no hay pasos independientes que repartir
+pipeline_completo_job = define_asset_job(
+    "pipeline_completo",
+    selection=AssetSelection.assets(
+        leer_datos, datos_procesados, metricas, reporte_excel_covid, indice_metricas,
+    ),
+    executor_def=in_process_executor,
+)
 
 defs = Definitions(
     assets=[
+        fuente_owid,
         leer_datos,
         datos_procesados,
-        metrica_incidencia_7d,
-        metrica_factor_crec_7d,
+        metricas,
         reporte_excel_covid,
+        indice_metricas,
+        incidencia_7d_diaria,
+        factor_crec_7d_diario,
     ],
     asset_checks=[
-        check_fechas_futuras,
-        check_columnas_esenciales,
-        check_paises_objetivo,
+        chequeos_entrada,
         check_valores_incidencia,
         check_factor_crecimiento
     ],
+    jobs=[pipeline_completo_job, metricas_diarias_job],
+    sensors=[sensor_metricas_diarias],
+    resources={
+        "motor": MotorCalculo(),
+        "paises": PaisesObjetivo(),
+        # DataFrames en Arrow IPC: carga con memory-map y solo las columnas pedidas
+        "io_manager": ArrowIOManagerFactory(),
+        # Tablas Arrow sin convertir para los chequeos que solo leen algunas columnas
+        "lector_arrow": LectorArrowFactory(),
+    },
 )
\ No newline at end of file
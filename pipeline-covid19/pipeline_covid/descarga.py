@@ -0,0 +1,215 @@
+"""
+Descarga incremental del CSV de OWID
+- Peticiones condicionales (ETag / Last-Modified): si el archivo no cambió el
+  servidor responde 304 y no se transfiere nada
+- Reanudación con Range / If-Range: una transferencia interrumpida continúa
+  desde el último byte guardado en <destino>.parcial
+- Transferencia comprimida (gzip, y zstd si está instalado zstandard): se
+  guardan los bytes tal como llegan y se descomprimen al terminar, de modo que
+  los rangos se refieren siempre a la misma representación
+- Escritura por bloques: la memoria no depende del tamaño del archivo
+
+El estado (validadores del archivo completo y de la descarga parcial) se guarda
+en <destino>.descarga.json
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import re
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+# requests se importa al descargar: assets.py solo necesita URL_OWID al cargar
+if TYPE_CHECKING:
+    import requests
+
+log = logging.getLogger(__name__)
+
+URL_OWID = "https://covid.ourworldindata.org/data/owid-covid-data.csv"
+
+TAMANO_BLOQUE = 1024 * 1024
+TIMEOUT_S = 60.0
+
+SUFIJO_PARCIAL = ".parcial"
+SUFIJO_ESTADO = ".descarga.json"
+
+
+def _soporta_zstd() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def codificaciones_aceptadas() -> str:
+    return "zstd, gzip" if _soporta_zstd() else "gzip"
+
+
+# =============================================================================
+# ESTADO DE LA DESCARGA
+# =============================================================================
+
+def leer_estado(destino: str) -> Dict[str, Any]:
+    try:
+        with open(destino + SUFIJO_ESTADO) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _escribir_estado(destino: str, estado: Dict[str, Any]) -> None:
+    ruta_tmp = destino + SUFIJO_ESTADO + ".tmp"
+    with open(ruta_tmp, "w") as f:
+        json.dump(estado, f, indent=2)
+    os.replace(ruta_tmp, destino + SUFIJO_ESTADO)
+
+
+def _validadores(respuesta: requests.Response) -> Dict[str, Optional[str]]:
+    return {
+        "etag": respuesta.headers.get("ETag"),
+        "last_modified": respuesta.headers.get("Last-Modified"),
+        "codificacion": respuesta.headers.get("Content-Encoding", "identity").lower(),
+    }
+
+
+def _validador_if_range(parcial: Dict[str, Any]) -> Optional[str]:
+    """If-Range exige un validador fuerte: ETag no débil o, si no hay ETag, Last-Modified"""
+    etag = parcial.get("etag")
+    if etag:
+        return None if etag.startswith("W/") else etag
+    return parcial.get("last_modified")
+
+
+def _inicio_content_range(respuesta: requests.Response) -> Optional[int]:
+    coincidencia = re.match(r"bytes (\d+)-\d+/(\d+|\*)", respuesta.headers.get("Content-Range", ""))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+# =============================================================================
+# DESCOMPRESIÓN POR BLOQUES
+# =============================================================================
+
+def _descomprimir(origen: str, destino: str, codificacion: str, tamano_bloque: int) -> None:
+    """Escribir `destino` a partir de los bytes transferidos en `origen` (memoria acotada por bloque)"""
+    if codificacion == "identity":
+        os.replace(origen, destino)
+        return
+    ruta_tmp = destino + ".tmp"
+    with open(origen, "rb") as entrada, open(ruta_tmp, "wb") as salida:
+        if codificacion in ("gzip", "x-gzip"):
+            descompresor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            for bloque in iter(lambda: entrada.read(tamano_bloque), b""):
+                salida.write(descompresor.decompress(bloque))
+            salida.write(descompresor.flush())
+        elif codificacion == "zstd":
+            import zstandard
+            with zstandard.ZstdDecompressor().stream_reader(entrada) as lector:
+                for bloque in iter(lambda: lector.read(tamano_bloque), b""):
+                    salida.write(bloque)
+        else:
+            raise ValueError(f"❌ Content-Encoding no soportado: {codificacion}")
+    os.replace(ruta_tmp, destino)
+    os.remove(origen)
+
+
+# =============================================================================
+# DESCARGA
+# =============================================================================
+
+def descargar_condicional(url: str, destino: str, sesion: Optional[requests.Session] = None,
+                          tamano_bloque: int = TAMANO_BLOQUE, timeout_s: float = TIMEOUT_S) -> Dict[str, Any]:
+    """
+    Actualizar `destino` desde `url` transfiriendo solo lo necesario
+
+    RETORNA: resumen con estado ("sin_cambios", "descargado" o "reanudado"),
+    bytes_transferidos, bytes_archivo, codificacion, etag y last_modified
+    """
+    return _descargar(url, destino, sesion, tamano_bloque, timeout_s, reintentar=True)
+
+
+def _descargar(url: str, destino: str, sesion: Optional[requests.Session], tamano_bloque: int,
+               timeout_s: float, reintentar: bool) -> Dict[str, Any]:
+    """descargar_condicional; tras un 416 reintenta una sola vez, sin la parte guardada"""
+    import requests
+
+    sesion = sesion or requests.Session()
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+    ruta_parcial = destino + SUFIJO_PARCIAL
+    estado = leer_estado(destino)
+    if estado.get("url") != url:
+        # Otra fuente: ni el archivo completo ni la descarga parcial sirven como validadores
+        estado = {"url": url}
+
+    cabeceras = {"Accept-Encoding": codificaciones_aceptadas()}
+    parcial = estado.get("parcial")
+    desplazamiento = os.path.getsize(ruta_parcial) if parcial and os.path.exists(ruta_parcial) else 0
+    validador = _validador_if_range(parcial) if parcial else None
+    if desplazamiento and validador:
+        cabeceras["Range"] = f"bytes={desplazamiento}-"
+        cabeceras["If-Range"] = validador
+    else:
+        desplazamiento = 0
+    completo = estado.get("completo")
+    if completo and os.path.exists(destino):
+        if completo.get("etag"):
+            cabeceras["If-None-Match"] = completo["etag"]
+        if completo.get("last_modified"):
+            cabeceras["If-Modified-Since"] = completo["last_modified"]
+
+    with sesion.get(url, headers=cabeceras, stream=True, timeout=timeout_s) as respuesta:
+        if respuesta.status_code == 304:
+            log.info(f"Fuente sin cambios: {url}")
+            return {"estado": "sin_cambios", "bytes_transferidos": 0, "bytes_archivo": os.path.getsize(destino),
+                    **{clave: completo.get(clave) for clave in ("codificacion", "etag", "last_modified")}}
+        if respuesta.status_code == 416:
+            # El rango ya no existe en el servidor: se descarta la parte guardada (si sigue ahí)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(ruta_parcial)
+            estado.pop("parcial", None)
+            _escribir_estado(destino, estado)
+            if not reintentar:
+                raise requests.HTTPError(f"❌ El servidor respondió 416 también sin rango: {url}")
+            return _descargar(url, destino, sesion, tamano_bloque, timeout_s, reintentar=False)
+        respuesta.raise_for_status()
+
+        reanudado = respuesta.status_code == 206
+        if reanudado and _inicio_content_range(respuesta) != desplazamiento:
+            raise requests.HTTPError(f"❌ Content-Range inesperado: {respuesta.headers.get('Content-Range')}")
+        if reanudado:
+            validadores = parcial
+            log.info(f"Reanudando descarga de {url} desde el byte {desplazamiento:,}")
+        else:
+            # 200: archivo nuevo, o cambió desde la descarga parcial (If-Range no coincide)
+            validadores = _validadores(respuesta)
+            desplazamiento = 0
+            log.info(f"Descargando {url} ({validadores['codificacion']})")
+        estado["parcial"] = validadores
+        _escribir_estado(destino, estado)
+
+        transferidos = 0
+        with open(ruta_parcial, "ab" if reanudado else "wb") as salida:
+            # raw: los bytes tal como llegan (sin descomprimir), para que Range siga siendo válido
+            for bloque in respuesta.raw.stream(tamano_bloque, decode_content=False):
+                salida.write(bloque)
+                transferidos += len(bloque)
+
+        esperado = respuesta.headers.get("Content-Length")
+        if esperado is not None and transferidos != int(esperado):
+            raise requests.ConnectionError(
+                f"❌ Descarga incompleta: {transferidos:,} de {int(esperado):,} bytes (se reanudará)"
+            )
+
+    _descomprimir(ruta_parcial, destino, validadores["codificacion"], tamano_bloque)
+    estado.pop("parcial", None)
+    estado["completo"] = validadores
+    _escribir_estado(destino, estado)
+    bytes_archivo = os.path.getsize(destino)
+    log.info(f"Fuente actualizada: {destino} ({bytes_archivo / 1024 ** 2:.1f} MB, "
+             f"{transferidos / 1024 ** 2:.1f} MB transferidos)")
+    return {"estado": "reanudado" if reanudado else "descargado", "bytes_transferidos": transferidos,
+            "bytes_archivo": bytes_archivo, **validadores}
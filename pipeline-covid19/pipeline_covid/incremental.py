@@ -0,0 +1,372 @@
+"""
+Motor incremental para incidencia_7d y factor_crec_7d
+Guarda por país los últimos 14 días del calendario (NaN en los días sin
+registro), de modo que una actualización cuesta O(filas nuevas) y las
+ventanas son de 7 días, no de 7 filas, igual que en el cálculo completo
+
+Cada país guarda además el hash de cada día de esa cola (fecha, casos y
+población) y cuántos registros tenía hasta su última fecha procesada. Al
+actualizar solo se vuelve a calcular el hash de las filas de la cola: si OWID
+revisa un valor de los últimos 14 días, o agrega o quita registros antiguos,
+se recalcula todo. Un valor revisado más atrás no cambia ninguna ventana nueva
+y no se detecta (el recálculo completo, o verificar=True, lo corrige)
+
+El resultado se guarda en segmentos Parquet de solo agregar: cada
+actualización escribe y devuelve únicamente sus filas nuevas, sin leer los
+segmentos anteriores. La vista completa la arma quien la lee
+(leer_resultado): intercala los segmentos por país, porque cada uno ya
+viene ordenado por país y fecha
+"""
+
+import json
+import logging
+import math
+import os
+from collections import deque
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger(__name__)
+
+# Suma de 7 días + semana previa (desplazamiento de 7 días)
+TAMANO_VENTANA = 7
+TAMANO_BUFFER = 2 * TAMANO_VENTANA
+
+# Columnas de la huella, con tipos fijos (el hash depende del dtype)
+COLUMNAS_HUELLA = {'date': 'datetime64[ns]', 'new_cases': 'float64', 'population': 'float64'}
+MODULO_HUELLA = 2 ** 64
+
+
+def _dias_entre(desde: str, hasta: str) -> int:
+    return (pd.Timestamp(hasta) - pd.Timestamp(desde)).days
+
+
+class EstadoPais:
+    """
+    Últimos 14 días del calendario de un país: casos diarios (NaN si el día no
+    tiene registro) y hash de cada día (0 si no tiene registro)
+    """
+
+    def __init__(self, ultima_fecha: Optional[str] = None, casos: Optional[List[float]] = None,
+                 huellas: Optional[List[int]] = None, registros: int = 0):
+        self.ultima_fecha = ultima_fecha
+        self.casos = deque(casos or [], maxlen=TAMANO_BUFFER)
+        self.huellas = deque(huellas or [0] * len(self.casos), maxlen=TAMANO_BUFFER)
+        self.registros = registros
+
+    def agregar(self, fecha: str, casos: float, huella: int = 0) -> None:
+        """Añadir un día (huella: hash del registro); los días sin registro desde el anterior entran como NaN (como mucho 14)"""
+        if self.ultima_fecha is not None:
+            hueco = min(max(_dias_entre(self.ultima_fecha, fecha) - 1, 0), TAMANO_BUFFER)
+            self.casos.extend([math.nan] * hueco)
+            self.huellas.extend([0] * hueco)
+        self.casos.append(casos)
+        self.huellas.append(huella)
+        self.registros += 1
+        self.ultima_fecha = fecha
+
+    @property
+    def huella_cola(self) -> int:
+        """Suma módulo 2**64 de los hashes de los registros de la cola"""
+        return sum(self.huellas) % MODULO_HUELLA
+
+    def inicio_cola(self) -> pd.Timestamp:
+        """Primer día que cubre la cola (los anteriores ya no influyen en ninguna ventana nueva)"""
+        return pd.Timestamp(self.ultima_fecha) - pd.Timedelta(days=TAMANO_BUFFER - 1)
+
+    def incidencia(self, poblacion: float) -> float:
+        """Promedio de los casos registrados en los últimos 7 días por 100k habitantes"""
+        registrados = [v for v in list(self.casos)[-TAMANO_VENTANA:] if not math.isnan(v)]
+        return sum(registrados) / len(registrados) / poblacion * 100000
+
+    def semanas(self) -> Tuple[Optional[float], Optional[float]]:
+        """(casos semana actual, casos semana previa); None si a la semana le falta algún día"""
+        dias = list(self.casos)
+
+        def completa(semana: List[float]) -> Optional[float]:
+            if len(semana) < TAMANO_VENTANA or any(math.isnan(v) for v in semana):
+                return None
+            return sum(semana)
+
+        return completa(dias[-TAMANO_VENTANA:]), completa(dias[-TAMANO_BUFFER:-TAMANO_VENTANA])
+
+    def a_dict(self) -> Dict[str, Any]:
+        return {"ultima_fecha": self.ultima_fecha, "casos": list(self.casos), "huellas": list(self.huellas),
+                "registros": self.registros}
+
+
+def huellas_registros(datos: pd.DataFrame) -> pd.Series:
+    """Hash uint64 de (fecha, casos, población) de cada registro, independiente del dtype de entrada"""
+    columnas = pd.DataFrame({col: datos[col].astype(tipo) for col, tipo in COLUMNAS_HUELLA.items()})
+    return pd.util.hash_pandas_object(columnas, index=False)
+
+
+def _por_fila(paises: pd.Series, valores: Dict[str, Any], tipo: str) -> np.ndarray:
+    """Valor de cada fila según su país; con países categóricos se busca una vez por categoría"""
+    if isinstance(paises.dtype, pd.CategoricalDtype):
+        por_categoria = pd.Series(paises.cat.categories.astype(str)).map(valores).to_numpy(dtype=tipo)
+        codigos = paises.cat.codes.to_numpy()
+        return np.where(codigos >= 0, por_categoria[codigos], por_categoria.dtype.type('NaT'))
+    return paises.astype(str).map(valores).to_numpy(dtype=tipo)
+
+
+def ultimas_fechas(datos: pd.DataFrame, estado: Dict[str, "EstadoPais"]) -> np.ndarray:
+    """Última fecha procesada del país de cada fila (NaT si el país no tiene estado)"""
+    return _por_fila(datos['location'], {p: np.datetime64(e.ultima_fecha) for p, e in estado.items()},
+                     'datetime64[ns]')
+
+# =============================================================================
+# PERSISTENCIA DEL ESTADO Y DE LOS SEGMENTOS DEL RESULTADO
+# =============================================================================
+
+# Versión del formato del estado: un estado de otra versión se descarta y se recalcula todo
+FORMATO_ESTADO = 2
+
+# Con más segmentos que estos, el resultado se reescribe en uno solo (costo amortizado)
+MAX_SEGMENTOS = 64
+
+
+def _rutas(directorio: str, nombre: str) -> Tuple[str, str]:
+    """Archivo del estado y carpeta de los segmentos del resultado"""
+    return os.path.join(directorio, f"{nombre}.json"), os.path.join(directorio, nombre)
+
+
+def cargar_estado(directorio: str, nombre: str) -> Tuple[Optional[Dict[str, EstadoPais]], List[str]]:
+    """Estado por país y segmentos que cubre (None si no hay estado o es de otro formato)"""
+    ruta_estado, carpeta = _rutas(directorio, nombre)
+    if not os.path.exists(ruta_estado):
+        return None, []
+    with open(ruta_estado) as f:
+        guardado = json.load(f)
+    if guardado.get("formato") != FORMATO_ESTADO or \
+            not all(os.path.exists(os.path.join(carpeta, s)) for s in guardado["segmentos"]):
+        return None, []
+    estado = {pais: EstadoPais(**valores) for pais, valores in guardado["paises"].items()}
+    return estado, guardado["segmentos"]
+
+
+def leer_segmentos(directorio: str, nombre: str, segmentos: List[str]) -> pd.DataFrame:
+    """Segmentos guardados concatenados en orden de escritura"""
+    _, carpeta = _rutas(directorio, nombre)
+    partes = [pd.read_parquet(os.path.join(carpeta, segmento)) for segmento in segmentos]
+    return pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+
+
+def intercalar_por_pais(resultado: pd.DataFrame) -> pd.DataFrame:
+    """
+    Orden (país, fecha) a partir de segmentos concatenados
+    Dentro de un país los segmentos siguen el orden del tiempo: basta una
+    ordenación estable por país (timsort recorre cada segmento como un tramo
+    ya ordenado), sin ordenar por fecha
+    """
+    codigos = pd.factorize(resultado['pais'], sort=True)[0]
+    return resultado.take(np.argsort(codigos, kind='stable')).reset_index(drop=True)
+
+
+def leer_resultado(directorio: str, nombre: str, plantilla: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Resultado completo de una métrica, ordenado por (país, fecha), a partir de sus segmentos
+
+    plantilla: DataFrame (puede no tener filas) cuyos dtypes se aplican al
+    resultado, p. ej. la salida del cálculo completo para conservar el país
+    categórico; sin plantilla el país queda como texto, como en los segmentos
+    """
+    estado, segmentos = cargar_estado(directorio, nombre)
+    if estado is None:
+        raise ValueError(f"❌ No hay resultado incremental guardado para {nombre} en {directorio}")
+    resultado = leer_segmentos(directorio, nombre, segmentos) if segmentos else \
+        pd.DataFrame(columns=METRICAS[nombre]["columnas"])
+    resultado = intercalar_por_pais(resultado)
+    if plantilla is not None:
+        resultado = resultado.astype(plantilla.dtypes.to_dict())
+    return resultado
+
+
+def guardar_estado(directorio: str, nombre: str, estado: Dict[str, EstadoPais], segmentos: List[str],
+                   nuevas: Optional[pd.DataFrame] = None) -> Tuple[List[str], int]:
+    """
+    Escribir las filas nuevas como un segmento más y después el estado que lo incluye
+    Devuelve los segmentos vigentes y los bytes escritos. Los segmentos que
+    el estado ya no nombra (reemplazados o de una escritura interrumpida) se borran
+    """
+    ruta_estado, carpeta = _rutas(directorio, nombre)
+    os.makedirs(carpeta, exist_ok=True)
+    segmentos = list(segmentos)
+    escritos = 0
+    if nuevas is not None and len(nuevas) > 0:
+        numero = max((int(s.split("_")[1].split(".")[0]) for s in os.listdir(carpeta) if s.startswith("segmento_")),
+                     default=0) + 1
+        segmento = f"segmento_{numero:06d}.parquet"
+        # país como texto: cada segmento tendría su propio diccionario de categorías
+        nuevas.assign(pais=nuevas['pais'].astype(str)).to_parquet(os.path.join(carpeta, segmento + ".tmp"),
+                                                                   index=False)
+        os.replace(os.path.join(carpeta, segmento + ".tmp"), os.path.join(carpeta, segmento))
+        escritos += os.path.getsize(os.path.join(carpeta, segmento))
+        segmentos.append(segmento)
+
+    contenido = json.dumps({"formato": FORMATO_ESTADO, "segmentos": segmentos,
+                            "paises": {pais: e.a_dict() for pais, e in estado.items()}})
+    with open(ruta_estado + ".tmp", "w") as f:
+        f.write(contenido)
+    os.replace(ruta_estado + ".tmp", ruta_estado)
+    escritos += len(contenido)
+
+    for sobrante in set(os.listdir(carpeta)) - set(segmentos):
+        os.remove(os.path.join(carpeta, sobrante))
+    return segmentos, escritos
+
+
+def construir_estado(datos: pd.DataFrame) -> Dict[str, EstadoPais]:
+    """Estado a partir de la serie completa: solo se leen los últimos 14 días de cada país"""
+    df = datos.sort_values(['location', 'date'])
+    fechas = df.groupby('location', observed=True)['date']
+    primeras = fechas.min()
+    registros = df.groupby('location', observed=True).size()
+    cola = df[df['date'] > fechas.transform('max') - pd.Timedelta(days=TAMANO_BUFFER)]
+    huellas_cola = huellas_registros(cola)
+    estado = {}
+    for pais, grupo in cola.groupby('location', observed=True):
+        ultima = grupo['date'].iloc[-1]
+        largo = min(TAMANO_BUFFER, (ultima - primeras[pais]).days + 1)
+        casos, huellas = [math.nan] * largo, [0] * largo
+        for fecha, valor, huella in zip(grupo['date'], grupo['new_cases'], huellas_cola[grupo.index].tolist()):
+            casos[largo - 1 - (ultima - fecha).days] = float(valor)
+            huellas[largo - 1 - (ultima - fecha).days] = huella
+        estado[str(pais)] = EstadoPais(ultima_fecha=ultima.isoformat(), casos=casos, huellas=huellas,
+                                       registros=int(registros[pais]))
+    return estado
+
+
+def verificar_estado(estado: Dict[str, EstadoPais], datos: pd.DataFrame) -> Tuple[bool, int]:
+    """
+    El estado sirve si la historia no cambió: mismos países y, de cada país,
+    el mismo número de registros hasta su última fecha procesada y la misma
+    huella en los días de su cola. Solo se calcula el hash de las filas de
+    la cola (a lo sumo 14 por país), no el de toda la historia
+
+    Devuelve (válido, filas cuyo hash se calculó)
+    """
+    paises = datos['location']
+    if set(estado) != {str(pais) for pais in paises.unique()}:
+        return False, 0
+    fechas = datos['date'].to_numpy()
+    ultimas = ultimas_fechas(datos, estado)
+    hasta = fechas <= ultimas
+    inicios = _por_fila(paises, {p: e.inicio_cola().to_datetime64() for p, e in estado.items()}, 'datetime64[ns]')
+    cola = datos[hasta & (fechas >= inicios)]
+    registros = pd.Series(hasta).groupby(paises.to_numpy()).sum()
+    huellas = huellas_registros(cola).groupby(cola['location'].astype(str).to_numpy()).sum()
+    valido = all(
+        int(registros.get(pais, 0)) == e.registros and int(huellas.get(pais, 0)) % MODULO_HUELLA == e.huella_cola
+        for pais, e in estado.items()
+    )
+    return valido, len(cola)
+
+
+# =============================================================================
+# ACTUALIZACIÓN INCREMENTAL
+# =============================================================================
+
+def _filas_incidencia(estado: EstadoPais, fila) -> Optional[Dict[str, Any]]:
+    return {'fecha': fila.date, 'pais': fila.location, 'incidencia_7d': estado.incidencia(fila.population)}
+
+
+def _filas_factor(estado: EstadoPais, fila) -> Optional[Dict[str, Any]]:
+    actual, previa = estado.semanas()
+    if actual is None or previa is None:
+        return None
+    # Igual que la división vectorizada: x/0 = inf y 0/0 = NaN (que _formatear_factor descarta)
+    if previa == 0:
+        factor = math.nan if actual == 0 else math.copysign(math.inf, actual)
+    else:
+        factor = actual / previa
+    return {'semana_fin': fila.date, 'pais': fila.location, 'casos_semana': actual, 'factor_crec_7d': factor}
+
+
+def _formatear_factor(filas: pd.DataFrame) -> pd.DataFrame:
+    """Mismo formato que calcular_factor_crec_7d (descarta 0/0, trunca casos y redondea)"""
+    filas = filas.dropna(subset=['factor_crec_7d'])
+    return pd.DataFrame({
+        'semana_fin': filas['semana_fin'],
+        'pais': filas['pais'].astype(str),
+        'casos_semana': filas['casos_semana'].astype('int64'),
+        'factor_crec_7d': filas['factor_crec_7d'].round(3)
+    })
+
+
+METRICAS = {
+    "incidencia_7d": {"fila": _filas_incidencia, "formato": None,
+                      "columnas": ['fecha', 'pais', 'incidencia_7d']},
+    "factor_crec_7d": {"fila": _filas_factor, "formato": _formatear_factor,
+                       "columnas": ['semana_fin', 'pais', 'casos_semana', 'factor_crec_7d']},
+}
+
+
+def actualizar_metrica(nombre: str, datos: pd.DataFrame, directorio: str,
+                       calcular_completo: Callable[[pd.DataFrame], pd.DataFrame],
+                       verificar: bool = False) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Actualizar una métrica procesando solo las filas posteriores al estado guardado
+
+    - Sin estado, con países nuevos o con la historia modificada: recálculo completo
+    - verificar=True: compara contra el recálculo completo y se queda con este si difieren
+    Devuelve las filas que escribió esta actualización (solo las nuevas en
+    modo incremental, todo el resultado si se recalculó) y un resumen de lo
+    que se hizo (filas nuevas, filas cuyo hash se verificó, filas y bytes
+    escritos). La vista completa se lee con leer_resultado
+    """
+    spec = METRICAS[nombre]
+    estado, segmentos = cargar_estado(directorio, nombre)
+    valido, verificadas = verificar_estado(estado, datos) if estado is not None else (False, 0)
+
+    if not valido:
+        resultado = calcular_completo(datos)
+        _, escritos = guardar_estado(directorio, nombre, construir_estado(datos), [], resultado)
+        return resultado, {"modo": "completo", "filas_nuevas": len(datos), "filas_verificadas": verificadas,
+                           "filas_escritas": len(resultado), "bytes_escritos": escritos}
+
+    # Solo filas posteriores a la última fecha procesada de cada país
+    nuevas = datos[datos['date'].to_numpy() > ultimas_fechas(datos, estado)].sort_values(['location', 'date'])
+
+    filas = []
+    for fila, huella in zip(nuevas.itertuples(index=False), huellas_registros(nuevas).tolist()):
+        estado_pais = estado[str(fila.location)]
+        estado_pais.agregar(fila.date.isoformat(), float(fila.new_cases), huella)
+        nueva = spec["fila"](estado_pais, fila)
+        if nueva is not None:
+            filas.append(nueva)
+
+    agregado = pd.DataFrame(filas, columns=spec["columnas"])
+    if spec["formato"] is not None and len(agregado) > 0:
+        agregado = spec["formato"](agregado)
+    agregado = _igualar_tipos(agregado.reset_index(drop=True), datos, calcular_completo)
+
+    resumen = {"modo": "incremental", "filas_nuevas": len(nuevas), "filas_verificadas": verificadas}
+    if len(segmentos) + 1 >= MAX_SEGMENTOS:
+        # Compactar: todo el resultado en un solo segmento (costo amortizado entre MAX_SEGMENTOS actualizaciones)
+        agregado = pd.concat([leer_segmentos(directorio, nombre, segmentos), agregado.astype({'pais': str})],
+                             ignore_index=True)
+        segmentos = []
+    segmentos, resumen["bytes_escritos"] = guardar_estado(directorio, nombre, estado, segmentos, agregado)
+    resumen["filas_escritas"] = len(agregado)
+
+    if verificar:
+        completo = calcular_completo(datos)
+        try:
+            pd.testing.assert_frame_equal(leer_resultado(directorio, nombre, completo), completo,
+                                          check_categorical=False, rtol=1e-9)
+            resumen["verificado"] = True
+        except AssertionError as e:
+            log.warning(f"El resultado incremental difiere del recálculo completo, se usa el completo: {e}")
+            _, resumen["bytes_escritos"] = guardar_estado(directorio, nombre, construir_estado(datos), [], completo)
+            agregado, resumen["filas_escritas"] = completo, len(completo)
+            resumen["verificado"] = False
+    return agregado, resumen
+
+
+def _igualar_tipos(resultado: pd.DataFrame, datos: pd.DataFrame,
+                   calcular_completo: Callable[[pd.DataFrame], pd.DataFrame]) -> pd.DataFrame:
+    """Mantener los dtypes de la salida completa (los de una salida completa sin filas)"""
+    return resultado.astype(calcular_completo(datos.iloc[:0]).dtypes.to_dict())
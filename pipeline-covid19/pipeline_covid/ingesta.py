@@ -0,0 +1,161 @@
+"""
+Ingesta de varios snapshots del CSV de OWID
+Lee una carpeta o un patrón glob de snapshots .csv / .csv.gz:
+- Cada archivo con el lector CSV multihilo de Arrow (sin pasar por pandas)
+- Varios archivos a la vez en un pool de hilos acotado (la descompresión gzip
+  de un archivo es secuencial; con varios archivos se reparte entre núcleos)
+- Los snapshots se unen y, para cada (país, fecha), gana la fila del snapshot
+  más reciente
+
+Orden de los snapshots: por la fecha del nombre (owid-covid-data-2021-05-01.csv,
+covid_20210501.csv.gz) si todos la tienen; si no, por fecha de modificación
+"""
+
+import csv
+import glob
+import gzip
+import io
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from pipeline_covid.cache_parquet import COLUMNAS_TEXTO
+
+log = logging.getLogger(__name__)
+
+EXTENSIONES_SNAPSHOT = (".csv", ".csv.gz")
+
+# Archivos leídos a la vez; cada uno usa además los hilos de Arrow
+HILOS_POR_DEFECTO = 4
+
+# Bloque del lector de Arrow: unidad de trabajo de sus hilos
+TAMANO_BLOQUE = 16 * 1024 * 1024
+
+FECHA_EN_NOMBRE = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})")
+
+COLUMNA_FILA = "__fila"
+
+
+# =============================================================================
+# LOCALIZACIÓN Y ORDEN DE LOS SNAPSHOTS
+# =============================================================================
+
+def _es_snapshot(ruta: str) -> bool:
+    return os.path.isfile(ruta) and ruta.lower().endswith(EXTENSIONES_SNAPSHOT)
+
+
+def _fecha_en_nombre(ruta: str) -> Optional[str]:
+    coincidencia = FECHA_EN_NOMBRE.search(os.path.basename(ruta))
+    return "".join(coincidencia.groups()) if coincidencia else None
+
+
+def ordenar_snapshots(rutas: List[str]) -> List[str]:
+    """Del más antiguo al más reciente (fecha del nombre o, si falta en alguno, mtime)"""
+    fechas = [_fecha_en_nombre(ruta) for ruta in rutas]
+    if all(fechas):
+        return [ruta for _, ruta in sorted(zip(fechas, rutas))]
+    return sorted(rutas, key=lambda ruta: (os.stat(ruta).st_mtime_ns, ruta))
+
+
+def listar_snapshots(origen: str) -> List[str]:
+    """
+    Snapshots de `origen`, ordenados del más antiguo al más reciente
+    origen: carpeta (sus .csv / .csv.gz), patrón glob o un solo archivo
+    """
+    if os.path.isdir(origen):
+        candidatos = [os.path.join(origen, nombre) for nombre in os.listdir(origen)]
+    else:
+        candidatos = glob.glob(origen)
+    rutas = [ruta for ruta in candidatos if _es_snapshot(ruta)]
+    if not rutas:
+        raise FileNotFoundError(f"No se encontraron snapshots {EXTENSIONES_SNAPSHOT} en: {origen}")
+    return ordenar_snapshots(rutas)
+
+
+def encabezado_csv(ruta: str) -> List[str]:
+    """Nombres de columna (primera línea) sin leer el resto del archivo"""
+    abrir = gzip.open if ruta.lower().endswith(".gz") else open
+    with abrir(ruta, "rb") as f:
+        primera = f.readline().decode("utf-8-sig")
+    return next(csv.reader(io.StringIO(primera)), [])
+
+
+def columnas_snapshots(rutas: List[str]) -> List[str]:
+    """Unión de las columnas de todos los snapshots, en el orden en que aparecen"""
+    return list(dict.fromkeys(col for ruta in rutas for col in encabezado_csv(ruta)))
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+def leer_snapshot(ruta: str, tipos: Dict[str, pa.DataType], col_pais: Optional[str] = None,
+                  paises: Optional[List[str]] = None) -> pa.Table:
+    """
+    Un snapshot con el lector multihilo de Arrow, con las columnas de `tipos`
+    (las que falten en el archivo quedan nulas) y filtrado por país
+    """
+    tabla = pacsv.read_csv(
+        ruta,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=TAMANO_BLOQUE),
+        convert_options=pacsv.ConvertOptions(
+            column_types=tipos,
+            include_columns=list(tipos),
+            include_missing_columns=True,
+            strings_can_be_null=True,
+        ),
+    )
+    if col_pais is not None and paises is not None:
+        tabla = tabla.filter(pc.is_in(tabla[col_pais], value_set=pa.array(paises, pa.string())))
+    return tabla
+
+
+def ultima_version(tabla: pa.Table, claves: List[str]) -> pa.Table:
+    """
+    Una fila por valor de `claves`: la última en el orden de la tabla (el
+    snapshot más reciente), ordenado por las claves
+    """
+    filas = tabla.append_column(COLUMNA_FILA, pa.array(np.arange(tabla.num_rows, dtype=np.int64)))
+    ganadoras = filas.group_by(claves, use_threads=False).aggregate([(COLUMNA_FILA, "max")])
+    indices = np.sort(ganadoras[COLUMNA_FILA + "_max"].to_numpy())
+    return tabla.take(pa.array(indices)).sort_by([(clave, "ascending") for clave in claves])
+
+
+def leer_snapshots(rutas: List[str], col_pais: str, col_fecha: str, columnas: Optional[List[str]] = None,
+                   paises: Optional[List[str]] = None, hilos: int = HILOS_POR_DEFECTO) -> pa.Table:
+    """
+    Unir snapshots ordenados del más antiguo al más reciente
+
+    - columnas: columnas a leer (None = la unión de todas); las que no existan
+      en ningún archivo se ignoran
+    - paises: filtro por país aplicado a cada archivo antes de unir (None = todos)
+    - hilos: archivos leídos a la vez
+
+    RETORNA: tabla Arrow con una fila por (país, fecha), la del snapshot más
+    reciente, ordenada por país y fecha
+    """
+    if hilos < 1:
+        raise ValueError(f"❌ hilos debe ser >= 1: {hilos}")
+    disponibles = columnas_snapshots(rutas)
+    if col_pais not in disponibles or col_fecha not in disponibles:
+        raise ValueError(f"❌ Los snapshots no tienen las columnas clave '{col_pais}' y '{col_fecha}'")
+    columnas = disponibles if columnas is None else [col for col in columnas if col in disponibles]
+    # Tipos explícitos e iguales en todos los archivos: las tablas se unen sin conversiones
+    tipos = {col: (pa.string() if col in COLUMNAS_TEXTO else pa.float64()) for col in columnas}
+
+    with ThreadPoolExecutor(max_workers=min(hilos, len(rutas))) as pool:
+        # map conserva el orden de los snapshots: la última fila de cada clave es la más reciente
+        tablas = list(pool.map(lambda ruta: leer_snapshot(ruta, tipos, col_pais, paises), rutas))
+
+    unidas = pa.concat_tables(tablas)
+    resultado = ultima_version(unidas, [col_pais, col_fecha])
+    log.info(f"Snapshots: {len(rutas)} archivos, {unidas.num_rows:,} filas leídas, "
+             f"{unidas.num_rows - resultado.num_rows:,} reemplazadas por versiones más recientes")
+    return resultado
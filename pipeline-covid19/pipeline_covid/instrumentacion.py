@@ -0,0 +1,285 @@
+"""
+Instrumentación de assets y checks, y logging del pipeline
+@instrumentar mide cada paso (tiempo, CPU, memoria, filas y bytes de
+entrada/salida) y lo adjunta como metadata de la materialización o del
+resultado del check, para seguir el coste de cada asset entre ejecuciones.
+
+Variables de entorno:
+- PIPELINE_COVID_LOG: nivel de logging (DEBUG, INFO por defecto, WARNING...) u OFF
+- PIPELINE_COVID_PERFIL: directorio donde volcar un perfil por paso
+- PIPELINE_COVID_PERFILADOR: "cprofile" (por defecto, .prof) o "pyinstrument" (.html, si está instalado)
+- PIPELINE_COVID_TRACEMALLOC=1: añade el pico de memoria asignada por el paso
+  con tracemalloc (exacto, más lento); el pico de RSS del paso se informa siempre
+
+configurar_logging() no se llama al importar: lo hacen definitions.py y los
+puntos de entrada (consultas.py)
+"""
+
+import cProfile
+import functools
+import inspect
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+VARIABLE_LOG = "PIPELINE_COVID_LOG"
+VARIABLE_PERFIL = "PIPELINE_COVID_PERFIL"
+VARIABLE_PERFILADOR = "PIPELINE_COVID_PERFILADOR"
+VARIABLE_TRACEMALLOC = "PIPELINE_COVID_TRACEMALLOC"
+
+NOMBRE_LOGGER = "pipeline_covid"
+FORMATO_LOG = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+log = logging.getLogger(__name__)
+
+
+# =============================================================================
+# LOGGING
+# =============================================================================
+
+def configurar_logging(nivel: Optional[str] = None) -> logging.Logger:
+    """
+    Logger raíz del paquete con salida por stderr (idempotente)
+    nivel: nombre del nivel u "OFF"; por defecto, PIPELINE_COVID_LOG o INFO
+    """
+    raiz = logging.getLogger(NOMBRE_LOGGER)
+    nivel = (nivel or os.environ.get(VARIABLE_LOG) or "INFO").upper()
+    raiz.setLevel(logging.CRITICAL + 1 if nivel == "OFF" else nivel)
+    if not any(getattr(h, "_pipeline_covid", False) for h in raiz.handlers):
+        manejador = logging.StreamHandler()
+        manejador.setFormatter(logging.Formatter(FORMATO_LOG))
+        manejador._pipeline_covid = True
+        raiz.addHandler(manejador)
+    return raiz
+
+
+# =============================================================================
+# MEDICIONES
+# =============================================================================
+
+def tamano(valor: Any) -> Tuple[Optional[int], Optional[int]]:
+    """(filas, bytes) de un DataFrame o una tabla Arrow; (None, None) para otros valores"""
+    # Sin importar pandas ni pyarrow: si el valor es de uno de sus tipos, el módulo ya está cargado
+    pd, pa = sys.modules.get("pandas"), sys.modules.get("pyarrow")
+    if pd is not None and isinstance(valor, pd.DataFrame):
+        return len(valor), int(valor.memory_usage(index=True, deep=True).sum())
+    if pa is not None and isinstance(valor, pa.Table):
+        return valor.num_rows, valor.nbytes
+    return None, None
+
+
+def _sumar_tamanos(valores) -> Dict[str, int]:
+    filas = bytes_ = 0
+    medidos = False
+    for valor in valores:
+        n, b = tamano(valor)
+        if n is not None:
+            filas, bytes_, medidos = filas + n, bytes_ + b, True
+    return {"filas": filas, "bytes": bytes_} if medidos else {}
+
+
+def _rss_actual_mb() -> Optional[float]:
+    """RSS actual del proceso (Linux); None si /proc no está disponible"""
+    # ru_maxrss no sirve: es el pico de toda la vida del proceso, no el del paso
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return paginas * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+
+
+def _pico_rss_mb() -> Optional[float]:
+    """Pico de RSS del proceso desde el último reinicio (VmHWM, Linux); None si no está disponible"""
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        return None
+    return None
+
+
+def _reiniciar_pico_rss() -> bool:
+    """Lleva el pico de RSS del proceso al RSS actual (Linux >= 4.0); False si no se puede"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+# Picos de los pasos medidos que siguen abiertos: un paso anidado reinicia el
+# pico del proceso, así que antes entrega a los de afuera el pico hasta ese momento
+_picos_abiertos: List[Dict[str, float]] = []
+
+
+def _propagar_pico(pico: Optional[float]) -> None:
+    if pico is not None:
+        for abierto in _picos_abiertos:
+            abierto["pico"] = max(abierto["pico"], pico)
+
+
+@contextmanager
+def _perfil(nombre: str, medicion: Dict[str, Any]) -> Iterator[None]:
+    """Vuelca un perfil del bloque si PIPELINE_COVID_PERFIL apunta a un directorio"""
+    directorio = os.environ.get(VARIABLE_PERFIL)
+    if not directorio:
+        yield
+        return
+    os.makedirs(directorio, exist_ok=True)
+    base = os.path.join(directorio, f"{nombre}_{time.strftime('%Y%m%d_%H%M%S')}")
+
+    if os.environ.get(VARIABLE_PERFILADOR, "cprofile").lower() == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            log.warning("pyinstrument no está instalado, se usa cProfile")
+        else:
+            perfilador = Profiler()
+            perfilador.start()
+            try:
+                yield
+            finally:
+                perfilador.stop()
+                with open(base + ".html", "w") as f:
+                    f.write(perfilador.output_html())
+                medicion["perfil"] = base + ".html"
+            return
+
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    try:
+        yield
+    finally:
+        perfilador.disable()
+        perfilador.dump_stats(base + ".prof")
+        medicion["perfil"] = base + ".prof"
+
+
+@contextmanager
+def _medicion(nombre: str, entradas: Tuple = ()) -> Iterator[Tuple[Dict[str, Any], Callable[[], None]]]:
+    """
+    Mide el bloque; entrega el dict de la medición y una función que lo
+    completa con lo medido hasta ese momento (se llama sola al salir)
+    """
+    medicion: Dict[str, Any] = {}
+    usar_tracemalloc = os.environ.get(VARIABLE_TRACEMALLOC) == "1"
+    iniciado_aqui = False
+    if usar_tracemalloc:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            iniciado_aqui = True
+        tracemalloc.reset_peak()
+
+    _propagar_pico(_pico_rss_mb())
+    pico: Optional[Dict[str, float]] = None
+    if _reiniciar_pico_rss():
+        pico = {"pico": 0.0}
+        _picos_abiertos.append(pico)
+    rss_inicio = _rss_actual_mb()
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+
+    def actualizar() -> None:
+        medicion["tiempo_s"] = round(time.perf_counter() - inicio, 4)
+        medicion["cpu_s"] = round(time.process_time() - inicio_cpu, 4)
+        rss = _rss_actual_mb()
+        if rss_inicio is not None and rss is not None:
+            medicion["memoria_incremento_mb"] = round(rss - rss_inicio, 1)
+        pico_rss = _pico_rss_mb()
+        if pico is not None and pico_rss is not None:
+            medicion["memoria_pico_mb"] = round(max(pico["pico"], pico_rss), 1)
+        if usar_tracemalloc:
+            medicion["memoria_pico_asignada_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+        for clave, valor in _sumar_tamanos(entradas).items():
+            medicion[f"{clave}_entrada"] = valor
+
+    try:
+        with _perfil(nombre, medicion):
+            yield medicion, actualizar
+    finally:
+        actualizar()
+        if pico is not None:
+            _picos_abiertos.remove(pico)
+            _propagar_pico(medicion.get("memoria_pico_mb"))
+        if usar_tracemalloc and iniciado_aqui:
+            tracemalloc.stop()
+        salida = medicion.pop("salida", None)
+        for clave, valor in _sumar_tamanos([salida]).items():
+            medicion[f"{clave}_salida"] = valor
+
+
+@contextmanager
+def medir(nombre: str, entradas: Tuple = ()) -> Iterator[Dict[str, Any]]:
+    """
+    Mide el bloque; al salir, el dict devuelto tiene tiempo_s, cpu_s,
+    memoria_incremento_mb (RSS al salir menos RSS al entrar; negativo si el
+    bloque libera memoria), memoria_pico_mb (pico de RSS del proceso durante
+    el bloque, Linux), memoria_pico_asignada_mb con tracemalloc, filas/bytes
+    de entrada y, si se fija medicion["salida"], filas/bytes de salida
+    """
+    with _medicion(nombre, entradas) as (medicion, _):
+        yield medicion
+
+
+# =============================================================================
+# DECORADOR PARA ASSETS Y CHECKS
+# =============================================================================
+
+def _con_metadata(resultado: Any, medicion: Dict[str, Any]) -> Any:
+    """Adjunta la medición: al resultado devuelto (check, MaterializeResult) o a la salida del asset en ejecución"""
+    from dagster import AssetCheckResult, AssetExecutionContext, MaterializeResult, Output
+
+    if isinstance(resultado, (AssetCheckResult, MaterializeResult)):
+        return type(resultado)(**{**resultado._asdict(), "metadata": {**(resultado.metadata or {}), **medicion}})
+    if isinstance(resultado, Output):
+        # Una salida de un asset múltiple: la medición del paso y el tamaño de esa salida
+        salida = {f"{clave}_salida": valor for clave, valor in _sumar_tamanos([resultado.value]).items()}
+        return resultado.with_metadata({**resultado.metadata, **medicion, **salida})
+    try:
+        contexto = AssetExecutionContext.get()
+    except Exception:
+        # Invocación directa (tests, scripts): no hay materialización a la que adjuntar
+        return resultado
+    contexto.add_output_metadata(medicion)
+    return resultado
+
+
+def _registrar(nombre: str, medicion: Dict[str, Any]) -> None:
+    log.info("paso=%s %s", nombre, " ".join(f"{clave}={valor}" for clave, valor in medicion.items()))
+
+
+def instrumentar(funcion: Callable) -> Callable:
+    """
+    Decorador para el cuerpo de un asset o check (debajo de @asset / @asset_check)
+
+    Conserva la firma, así que Dagster sigue viendo las mismas entradas, recursos
+    y config. Los checks que hacen yield entregan cada resultado en cuanto sale,
+    con la medición hasta ese momento; la del paso completo se registra al agotarse
+    """
+    nombre = funcion.__name__
+
+    if inspect.isgeneratorfunction(funcion):
+        @functools.wraps(funcion)
+        def envoltura_generador(*args, **kwargs):
+            with _medicion(nombre, args + tuple(kwargs.values())) as (medicion, actualizar):
+                for resultado in funcion(*args, **kwargs):
+                    actualizar()
+                    yield _con_metadata(resultado, dict(medicion))
+            _registrar(nombre, medicion)
+        return envoltura_generador
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        with medir(nombre, args + tuple(kwargs.values())) as medicion:
+            resultado = funcion(*args, **kwargs)
+            medicion["salida"] = resultado
+        _registrar(nombre, medicion)
+        return _con_metadata(resultado, medicion)
+    return envoltura
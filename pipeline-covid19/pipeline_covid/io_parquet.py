@@ -0,0 +1,186 @@
+"""
+IO manager columnar para los assets del pipeline
+Guarda los DataFrames como Arrow IPC (o Parquet) en lugar de pickle y los
+carga con memory-map, leyendo solo las columnas que pide cada asset
+"""
+
+from __future__ import annotations
+
+import os
+import pickle
+import sys
+from typing import TYPE_CHECKING, Any, List, Optional
+
+from dagster import ConfigurableIOManagerFactory, InputContext, OutputContext, UPathIOManager
+
+# pandas, pyarrow y upath se importan al guardar o cargar, no al cargar las definiciones
+if TYPE_CHECKING:
+    import pandas as pd
+    from upath import UPath
+
+FORMATOS_DISPONIBLES = ("arrow", "parquet")
+
+# Firmas al inicio de cada tipo de archivo
+MAGIA_ARROW = b"ARROW1"
+MAGIA_PARQUET = b"PAR1"
+
+
+def columnas_solicitadas(context: InputContext) -> Optional[List[str]]:
+    """Columnas pedidas por el asset consumidor: AssetIn(metadata={"columnas": [...]})"""
+    metadata = context.definition_metadata or {}
+    columnas = metadata.get("columnas")
+    return list(columnas) if columnas is not None else None
+
+
+def _proyectar(disponibles: List[str], columnas: Optional[List[str]]) -> Optional[List[str]]:
+    """Columnas pedidas que existen, en el orden del archivo (admite alternativas location/country)"""
+    if columnas is None:
+        return None
+    pedidas = set(columnas)
+    return [col for col in disponibles if col in pedidas]
+
+
+def columnas_de(datos: Any) -> List[str]:
+    """Nombres de columna de un DataFrame o de una tabla/dataset Arrow sin leer datos"""
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(datos, pd.DataFrame):
+        return list(datos.columns)
+    return list(datos.schema.names)
+
+
+def leer_columna(datos: Any, nombre: str) -> pd.Series:
+    """Una sola columna como Series; en tablas Arrow con memory-map solo se tocan sus páginas"""
+    import pandas as pd
+    import pyarrow.dataset as ds
+
+    if isinstance(datos, pd.DataFrame):
+        return datos[nombre]
+    if isinstance(datos, ds.Dataset):
+        datos = datos.to_table(columns=[nombre])
+    return datos.column(nombre).to_pandas().rename(nombre)
+
+
+class ArrowIOManager(UPathIOManager):
+    """
+    - DataFrames: Arrow IPC sin compresión (carga zero-copy con memory-map) o Parquet
+    - Otros objetos (p. ej. la ruta del reporte): pickle, como el IO manager por defecto
+    - Salidas particionadas como {partición: DataFrame}: un archivo por partición
+    - perezoso=True: load_input devuelve la tabla Arrow (o el dataset Parquet) sin
+      convertir a pandas, para consumidores que solo miran algunas columnas
+    """
+    extension: str = ""
+
+    def __init__(self, base_path: UPath, formato: str = "arrow", perezoso: bool = False):
+        if formato not in FORMATOS_DISPONIBLES:
+            raise ValueError(f"❌ Formato no soportado: {formato}. Opciones: {FORMATOS_DISPONIBLES}")
+        self.formato = formato
+        self.perezoso = perezoso
+        super().__init__(base_path=base_path)
+
+    def handle_output(self, context: OutputContext, obj: Any) -> None:
+        """
+        Una salida particionada puede llegar como {clave de partición: valor}
+        (obligatorio si la ejecución cubre un rango con BackfillPolicy.single_run):
+        cada valor se guarda en el archivo de su partición
+        """
+        if not context.has_asset_partitions:
+            return super().handle_output(context, obj)
+        claves = set(context.asset_partition_keys)
+        if not (isinstance(obj, dict) and set(obj) == claves):
+            if len(claves) > 1:
+                raise ValueError(f"❌ Una salida de {len(claves)} particiones debe ser un dict con una "
+                                 "entrada por partición")
+            return super().handle_output(context, obj)
+        rutas = self._get_paths_for_partitions(context)
+        for clave, ruta in rutas.items():
+            self.make_directory(ruta.parent)
+            self._guardar(obj[clave], ruta)
+        context.add_output_metadata({"particiones": len(rutas), "formato": self.formato})
+
+    def dump_to_path(self, context: OutputContext, obj: Any, path: UPath) -> None:
+        import pandas as pd
+
+        self._guardar(obj, path)
+        if isinstance(obj, pd.DataFrame):
+            context.add_output_metadata({"filas": len(obj), "columnas": len(obj.columns), "formato": self.formato})
+
+    def _guardar(self, obj: Any, path: UPath) -> None:
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        ruta = str(path)
+        ruta_tmp = ruta + ".tmp"
+        if isinstance(obj, pd.DataFrame):
+            tabla = pa.Table.from_pandas(obj)
+            if self.formato == "arrow":
+                with pa.OSFile(ruta_tmp, "wb") as destino:
+                    with pa.ipc.new_file(destino, tabla.schema) as escritor:
+                        escritor.write_table(tabla)
+            else:
+                pq.write_table(tabla, ruta_tmp)
+        else:
+            with open(ruta_tmp, "wb") as destino:
+                pickle.dump(obj, destino, pickle.HIGHEST_PROTOCOL)
+        # Reemplazo atómico: los lectores con memory-map siguen viendo el archivo anterior
+        os.replace(ruta_tmp, ruta)
+
+    def load_from_path(self, context: InputContext, path: UPath) -> Any:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        ruta = str(path)
+        with open(ruta, "rb") as origen:
+            cabecera = origen.read(len(MAGIA_ARROW))
+
+        columnas = columnas_solicitadas(context)
+        if cabecera.startswith(MAGIA_ARROW):
+            with pa.memory_map(ruta, "r") as origen:
+                tabla = pa.ipc.open_file(origen).read_all()
+            if self.perezoso:
+                return tabla
+            seleccion = _proyectar(tabla.schema.names, columnas)
+            if seleccion is not None:
+                tabla = tabla.select(seleccion)
+            return tabla.to_pandas(split_blocks=True)
+
+        if cabecera.startswith(MAGIA_PARQUET):
+            if self.perezoso:
+                return ds.dataset(ruta, format="parquet")
+            esquema = pq.read_schema(ruta)
+            return pq.read_table(ruta, columns=_proyectar(esquema.names, columnas), memory_map=True).to_pandas()
+
+        with open(ruta, "rb") as origen:
+            return pickle.load(origen)
+
+
+class ArrowIOManagerFactory(ConfigurableIOManagerFactory):
+    """
+    IO manager columnar configurable
+
+    - directorio_base: carpeta de almacenamiento (por defecto, la del DAGSTER_HOME)
+    - formato: "arrow" (IPC, zero-copy) o "parquet" (comprimido)
+    """
+    directorio_base: Optional[str] = None
+    formato: str = "arrow"
+
+    def crear(self, context, perezoso: bool = False) -> ArrowIOManager:
+        from upath import UPath
+
+        base = self.directorio_base or context.instance.storage_directory()
+        return ArrowIOManager(base_path=UPath(base), formato=self.formato, perezoso=perezoso)
+
+    def create_io_manager(self, context) -> ArrowIOManager:
+        return self.crear(context)
+
+
+class LectorArrowFactory(ArrowIOManagerFactory):
+    """
+    Input manager que entrega tablas Arrow con memory-map en lugar de DataFrames
+    Debe apuntar al mismo directorio_base que el IO manager columnar; se usa con
+    AssetIn(input_manager_key=...) junto con columnas_de() y leer_columna()
+    """
+
+    def create_io_manager(self, context) -> ArrowIOManager:
+        return self.crear(context, perezoso=True)
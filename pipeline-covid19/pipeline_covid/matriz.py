@@ -0,0 +1,227 @@
+"""
+Matriz ancha fecha x país para las métricas
+new_cases y la población en matrices float64 densas (un día por fila, un
+país por columna). Cada métrica es una sola expresión sobre la matriz
+completa (sumas acumuladas y desplazamientos por filas), sin grupos ni
+bucles por país; el resultado vuelve a formato largo solo para las filas
+observadas
+
+Las fórmulas del registro de métricas (metricas.py) se evalúan juntas sobre
+una sola matriz: todas las ventanas salen de las mismas sumas acumuladas
+"""
+
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from pipeline_covid.ventanas import inicios_grupos, razon
+
+VENTANA_DIAS = 7
+
+
+def _rellenar_por_columnas(matriz: np.ndarray) -> np.ndarray:
+    """
+    Cada NaN con el último valor anterior de su columna y, antes del primero,
+    con el primero (ffill y luego bfill por columna, sin bucles); índices
+    int32 y relleno final en el sitio para acotar el pico de memoria
+    """
+    if matriz.size == 0:
+        return matriz
+    validos = ~np.isnan(matriz)
+    anterior = np.where(validos, np.arange(matriz.shape[0], dtype=np.int32)[:, None], np.int32(0))
+    np.maximum.accumulate(anterior, axis=0, out=anterior)
+    rellena = np.take_along_axis(matriz, anterior, axis=0)
+    del anterior
+    primero = matriz[np.argmax(validos, axis=0), np.arange(matriz.shape[1])]
+    np.copyto(rellena, np.broadcast_to(primero, rellena.shape), where=np.isnan(rellena))
+    return rellena
+
+
+class MatrizCasos:
+    """
+    Casos diarios en formato ancho, construidos desde datos ordenados por (país, fecha)
+
+    - casos: float64 [días, países], NaN en los días sin registro; float64 y no
+      float32 porque las filas agregadas o de reporte semanal (World, continentes)
+      superan 2**24 casos y float32 ya no las representa exactamente; cuesta el
+      doble de memoria que float32 (3.4 MB en lugar de 1.7 MB con 425.000 filas)
+    - poblacion: float64 [días, países], población vigente cada día: el último
+      valor registrado hasta ese día (antes del primero, el primero), así una
+      revisión del censo no se aplica retroactivamente a toda la serie; solo
+      se construye si alguna métrica la usa
+    - filas / columnas: celda de cada fila de los datos de origen, para volver a formato largo
+    """
+
+    def __init__(self, datos: pd.DataFrame):
+        n = len(datos)
+        inicios = inicios_grupos(datos['location'])
+        pais = np.repeat(np.arange(len(inicios)), np.diff(np.append(inicios, n)))
+
+        dias = datos['date'].to_numpy().astype('datetime64[D]')
+        self.primer_dia = dias.min() if n else np.datetime64('1970-01-01', 'D')
+        dia = (dias - self.primer_dia).astype(np.int64)
+        n_dias = int(dia.max()) + 1 if n else 0
+
+        if ((pais[1:] == pais[:-1]) & (dia[1:] <= dia[:-1])).any():
+            raise ValueError("❌ Matriz: fechas repetidas o desordenadas dentro de un país")
+
+        self.paises = datos['location'].iloc[inicios]
+        self.filas, self.columnas = dia, pais
+        self.casos = np.full((n_dias, len(inicios)), np.nan, dtype=np.float64)
+        self.casos[dia, pais] = datos['new_cases'].to_numpy(dtype='float64', na_value=np.nan)
+        self._poblacion_registros = datos['population'].to_numpy(dtype='float64', na_value=np.nan)
+        self._poblacion = None
+        self._acumulados = None
+
+    @property
+    def poblacion(self) -> np.ndarray:
+        """Matriz de población [días, países]; se construye la primera vez que una métrica la usa"""
+        if self._poblacion is None:
+            poblacion = np.full(self.casos.shape, np.nan, dtype=np.float64)
+            poblacion[self.filas, self.columnas] = self._poblacion_registros
+            self._poblacion = _rellenar_por_columnas(poblacion)
+        return self._poblacion
+
+    def en_largo(self, matriz: np.ndarray) -> np.ndarray:
+        """Valores de una matriz [días, países] en las celdas de las filas de origen"""
+        return matriz[self.filas, self.columnas]
+
+    def acumulados(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Casos y días con registro acumulados hasta cada día [días + 1, países]
+        (fila 0 = antes del primer día); se calculan una vez y los comparten
+        todas las ventanas
+        """
+        if self._acumulados is None:
+            validos = ~np.isnan(self.casos)
+            acumulado = np.zeros((self.casos.shape[0] + 1, self.casos.shape[1]))
+            np.cumsum(np.where(validos, self.casos, 0), axis=0, out=acumulado[1:])
+            conteo_acumulado = np.zeros(acumulado.shape, dtype=np.int64)
+            np.cumsum(validos, axis=0, out=conteo_acumulado[1:])
+            self._acumulados = acumulado, conteo_acumulado
+        return self._acumulados
+
+    def sumas_moviles(self, ventana: int = VENTANA_DIAS) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Suma y número de días con registro en los últimos `ventana` días:
+        diferencia de sumas acumuladas (float64, exacta para recuentos enteros)
+        """
+        acumulado, conteo_acumulado = self.acumulados()
+        desde = np.maximum(np.arange(1, acumulado.shape[0]) - ventana, 0)
+        return acumulado[1:] - acumulado[desde], conteo_acumulado[1:] - conteo_acumulado[desde]
+
+    def incidencia(self, ventana: int = VENTANA_DIAS) -> np.ndarray:
+        """Promedio de los casos registrados en `ventana` días por 100k habitantes [días, países]"""
+        # La población se rellena antes de las sumas móviles y la división es en
+        # el sitio: sus temporales no coinciden con los de las ventanas en el pico de memoria
+        poblacion = self.poblacion
+        suma, conteo = self.sumas_moviles(ventana)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            promedio = np.where(conteo > 0, suma / conteo, np.nan)
+        promedio /= poblacion
+        promedio *= 100000
+        return promedio
+
+    def incidencia_7d(self) -> np.ndarray:
+        """Incidencia con la ventana de 7 días"""
+        return self.incidencia(VENTANA_DIAS)
+
+    def semanas(self, ventana: int = VENTANA_DIAS) -> Tuple[np.ndarray, np.ndarray]:
+        """Casos del periodo (`ventana` días completos) y del periodo previo [días, países]"""
+        suma, conteo = self.sumas_moviles(ventana)
+        actual = np.where(conteo == ventana, suma, np.nan)
+        previa = np.full(actual.shape, np.nan)
+        previa[ventana:] = actual[:-ventana]
+        return actual, previa
+
+    def tiempo_duplicacion(self, ventana: int = VENTANA_DIAS) -> np.ndarray:
+        """
+        Días para duplicar los casos acumulados al ritmo de los últimos `ventana`
+        días: ventana * ln 2 / ln(total / total `ventana` días antes) [días, países]
+        NaN si no hubo casos antes o el total no creció
+        """
+        acumulado, _ = self.acumulados()
+        total = acumulado[1:]
+        previo = np.full(total.shape, np.nan)
+        previo[ventana:] = total[:-ventana]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dias = ventana * np.log(2) / np.log(total / previo)
+        return np.where((previo > 0) & (total > previo), dias, np.nan)
+
+
+# =============================================================================
+# FÓRMULAS DEL REGISTRO DE MÉTRICAS
+# =============================================================================
+# Cada fórmula recibe la matriz, los datos de origen (ordenados por país y
+# fecha), el nombre de la métrica y los parámetros de su especificación, y
+# devuelve la tabla en formato largo
+
+def _incidencia(matriz: MatrizCasos, datos: pd.DataFrame, nombre: str, ventana: int) -> pd.DataFrame:
+    """fecha, pais, <nombre>: una fila por registro"""
+    return pd.DataFrame({
+        'fecha': datos['date'],
+        'pais': datos['location'],
+        nombre: matriz.en_largo(matriz.incidencia(ventana)),
+    }).reset_index(drop=True)
+
+
+def _crecimiento(matriz: MatrizCasos, datos: pd.DataFrame, nombre: str, ventana: int) -> pd.DataFrame:
+    """semana_fin, pais, casos_semana, <nombre>: solo periodos completos con factor definido"""
+    actual, previa = matriz.semanas(ventana)
+    casos_periodo = matriz.en_largo(actual)
+    factor = razon(casos_periodo, matriz.en_largo(previa))
+    completos = ~np.isnan(factor)
+    return pd.DataFrame({
+        'semana_fin': datos['date'][completos],
+        'pais': datos['location'][completos],
+        'casos_semana': casos_periodo[completos].astype('int64'),
+        nombre: np.round(factor[completos], 3),
+    }).reset_index(drop=True)
+
+
+def _por_habitantes(matriz: MatrizCasos, datos: pd.DataFrame, nombre: str, columna: str,
+                    escala: float) -> pd.DataFrame:
+    """fecha, pais, <nombre> = columna / población * escala: solo registros con valor"""
+    valores = datos[columna].to_numpy(dtype='float64', na_value=np.nan) / matriz.en_largo(matriz.poblacion) * escala
+    observados = ~np.isnan(valores)
+    return pd.DataFrame({
+        'fecha': datos['date'][observados],
+        'pais': datos['location'][observados],
+        nombre: valores[observados],
+    }).reset_index(drop=True)
+
+
+def _duplicacion(matriz: MatrizCasos, datos: pd.DataFrame, nombre: str, ventana: int) -> pd.DataFrame:
+    """fecha, pais, <nombre> en días: solo registros con los casos en aumento"""
+    dias = matriz.en_largo(matriz.tiempo_duplicacion(ventana))
+    definidos = ~np.isnan(dias)
+    return pd.DataFrame({
+        'fecha': datos['date'][definidos],
+        'pais': datos['location'][definidos],
+        nombre: np.round(dias[definidos], 2),
+    }).reset_index(drop=True)
+
+
+# Claves de la especificación que no son parámetros de la fórmula
+CLAVES_DESCRIPTIVAS = ("formula", "descripcion")
+
+FORMULAS: Dict[str, Callable[..., pd.DataFrame]] = {
+    "incidencia": _incidencia,
+    "crecimiento": _crecimiento,
+    "por_habitantes": _por_habitantes,
+    "duplicacion": _duplicacion,
+}
+
+
+def evaluar_metricas(datos: pd.DataFrame, especificaciones: Dict[str, Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
+    """
+    Todas las métricas de `especificaciones` sobre una sola MatrizCasos
+    datos: ordenados por (país, fecha), como pide MatrizCasos
+    """
+    matriz = MatrizCasos(datos)
+    resultados = {}
+    for nombre, especificacion in especificaciones.items():
+        parametros = {clave: valor for clave, valor in especificacion.items() if clave not in CLAVES_DESCRIPTIVAS}
+        resultados[nombre] = FORMULAS[especificacion["formula"]](matriz, datos, nombre, **parametros)
+    return resultados
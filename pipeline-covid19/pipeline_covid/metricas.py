@@ -0,0 +1,71 @@
+"""
+Registro declarativo de las métricas del pipeline
+Cada métrica es una especificación: la fórmula de matriz.py y los parámetros
+de su ventana. calcular_metricas ordena los datos una vez, construye una sola
+matriz fecha x país y evalúa todas las métricas pedidas sobre las mismas sumas
+acumuladas: agregar una métrica al registro no agrega otra ordenación ni otra
+pasada sobre datos_procesados
+
+Sin dependencias pesadas al importar: assets.py lee el registro al cargar las
+definiciones para declarar un asset por métrica
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# nombre -> especificación (formula + parámetros; ver FORMULAS en matriz.py)
+# - incidencia: promedio de casos registrados en `ventana` días por 100k habitantes
+# - crecimiento: casos de `ventana` días completos / los del periodo previo
+# - por_habitantes: `columna` / población * `escala`
+# - duplicacion: días para duplicar los casos acumulados al ritmo de los últimos `ventana` días
+REGISTRO_METRICAS: Dict[str, Dict[str, Any]] = {
+    "incidencia_7d": {
+        "formula": "incidencia", "ventana": 7,
+        "descripcion": "Incidencia acumulada a 7 días por 100 mil habitantes",
+    },
+    "factor_crec_7d": {
+        "formula": "crecimiento", "ventana": 7,
+        "descripcion": "Factor de crecimiento semanal (casos de la semana / semana previa)",
+    },
+    "vacunacion_100": {
+        "formula": "por_habitantes", "columna": "people_vaccinated", "escala": 100,
+        "descripcion": "Personas vacunadas por cada 100 habitantes",
+    },
+    "incidencia_14d": {
+        "formula": "incidencia", "ventana": 14,
+        "descripcion": "Incidencia acumulada a 14 días por 100 mil habitantes",
+    },
+    "tiempo_duplicacion": {
+        "formula": "duplicacion", "ventana": 7,
+        "descripcion": "Días para duplicar los casos acumulados al ritmo de los últimos 7 días",
+    },
+}
+
+# Columnas de datos_procesados que necesita el registro completo
+COLUMNAS_REGISTRO = ['location', 'date', 'new_cases', 'people_vaccinated', 'population']
+
+PREFIJO_ASSET = "metrica_"
+
+
+def nombre_asset(nombre: str) -> str:
+    """Asset de una métrica del registro: metrica_<nombre>"""
+    return PREFIJO_ASSET + nombre
+
+
+def calcular_metricas(datos: "pd.DataFrame", nombres: Optional[Iterable[str]] = None) -> Dict[str, "pd.DataFrame"]:
+    """
+    Métricas del registro en una sola ordenación y una sola pasada
+
+    nombres: métricas a calcular (None = todo el registro)
+    RETORNA: {nombre: DataFrame en formato largo}
+    """
+    from pipeline_covid.assets import ordenar_por_pais_fecha
+    from pipeline_covid.matriz import evaluar_metricas
+
+    nombres = list(REGISTRO_METRICAS) if nombres is None else list(nombres)
+    desconocidas = [nombre for nombre in nombres if nombre not in REGISTRO_METRICAS]
+    if desconocidas:
+        raise ValueError(f"❌ Métricas no registradas: {desconocidas}. Opciones: {list(REGISTRO_METRICAS)}")
+    return evaluar_metricas(ordenar_por_pais_fecha(datos), {nombre: REGISTRO_METRICAS[nombre] for nombre in nombres})
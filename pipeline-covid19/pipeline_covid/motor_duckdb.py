@@ -0,0 +1,163 @@
+"""
+Motor DuckDB para el procesamiento y las métricas
+Empuja filtros, deduplicación, conversión de tipos y ventanas a SQL.
+El resultado es idéntico (bit a bit) al camino pandas de assets.py
+"""
+
+import logging
+import os
+import re
+from typing import List, Optional
+
+import duckdb
+import pandas as pd
+from pipeline_covid.cache_parquet import asegurar_cache
+from pipeline_covid.recursos import MotorCalculo
+
+log = logging.getLogger(__name__)
+
+# Tamaños que acepta memory_limit: "4GB", "512 MiB", "1.5GB"...
+PATRON_MEMORIA = re.compile(r"\d+(\.\d+)?\s*([KMGT]i?B|B)", re.IGNORECASE)
+
+
+def _literal_sql(texto: str) -> str:
+    """Cadena SQL entre comillas simples (las comillas internas se duplican)"""
+    return "'" + texto.replace("'", "''") + "'"
+
+
+def conectar(motor: MotorCalculo) -> duckdb.DuckDBPyConnection:
+    """Conexión en memoria con hilos/memoria/temporal configurables (permite out-of-core)"""
+    if motor.limite_memoria is not None and not PATRON_MEMORIA.fullmatch(motor.limite_memoria.strip()):
+        raise ValueError(f"❌ limite_memoria no válido: {motor.limite_memoria!r} (ejemplos: '4GB', '512MiB')")
+    con = duckdb.connect()
+    if motor.hilos is not None:
+        con.execute(f"SET threads = {int(motor.hilos)}")
+    if motor.limite_memoria is not None:
+        con.execute(f"SET memory_limit = {_literal_sql(motor.limite_memoria.strip())}")
+    if motor.directorio_temporal is not None:
+        con.execute(f"SET temp_directory = {_literal_sql(motor.directorio_temporal)}")
+    return con
+
+
+def registrar_fuente(con: duckdb.DuckDBPyConnection, ruta_csv: str, usar_cache: bool = True) -> List[str]:
+    """
+    Registrar la vista 'fuente' sobre el dataset Parquet en caché o, si no
+    está disponible, directamente sobre el CSV. Devuelve las columnas.
+
+    Además de las columnas del archivo, la vista lleva la posición de origen
+    de cada fila (__archivo, __fila): los escaneos paralelos de DuckDB no
+    garantizan el orden, y la deduplicación necesita el orden del archivo
+    """
+    if usar_cache:
+        try:
+            manifiesto = asegurar_cache(ruta_csv)
+            patron = _literal_sql(os.path.join(manifiesto["dataset"], "**", "*.parquet"))
+            # Un país por partición: dentro de (país, fecha) basta el orden de su archivo
+            con.execute(f"""
+                CREATE OR REPLACE TEMP VIEW fuente AS
+                SELECT * EXCLUDE (filename, file_row_number), filename AS __archivo, file_row_number AS __fila
+                FROM read_parquet({patron}, hive_partitioning = true,
+                                  hive_types = {{{_literal_sql(manifiesto["col_pais"])}: VARCHAR}},
+                                  filename = true, file_row_number = true)
+            """)
+            return manifiesto["columnas"]
+        except FileNotFoundError:
+            raise
+        except Exception as e:
+            log.warning(f"Caché Parquet no disponible para DuckDB ({e}), consultando el CSV")
+
+    # read_csv no expone el número de fila: la tabla conserva el orden del
+    # archivo (preserve_insertion_order) y su rowid es la fila de origen
+    con.execute("SET preserve_insertion_order = true")
+    con.execute(f"""
+        CREATE OR REPLACE TEMP TABLE fuente_csv AS
+        SELECT * FROM read_csv({_literal_sql(ruta_csv)}, header = true, all_varchar = true)
+    """)
+    columnas = [fila[0] for fila in con.execute("DESCRIBE fuente_csv").fetchall()]
+    con.execute("CREATE OR REPLACE TEMP VIEW fuente AS SELECT *, '' AS __archivo, rowid AS __fila FROM fuente_csv")
+    return columnas
+
+
+def procesar_duckdb(con: duckdb.DuckDBPyConnection, col_pais: str, paises: Optional[List[str]],
+                    tipo_casos: str = "FLOAT") -> pd.DataFrame:
+    """
+    Equivalente SQL de datos_procesados sobre la vista 'fuente':
+    filtro de países (None = todos), duplicados (location, date), conversión de tipos y nulos
+    """
+    condicion = f'"{col_pais}" IN (SELECT unnest($paises))' if paises is not None else f'"{col_pais}" IS NOT NULL'
+    df = con.execute(f"""
+        WITH filtrado AS (
+            SELECT "{col_pais}" AS location, CAST(date AS VARCHAR) AS date,
+                   new_cases, people_vaccinated, population, __archivo, __fila
+            FROM fuente
+            WHERE {condicion}
+        ),
+        sin_duplicados AS (
+            -- Como pandas: se queda la primera aparición en el archivo
+            SELECT * FROM filtrado
+            QUALIFY row_number() OVER (PARTITION BY location, date ORDER BY __archivo, __fila) = 1
+        )
+        SELECT location, date,
+               TRY_CAST(new_cases AS {tipo_casos}) AS new_cases,
+               TRY_CAST(people_vaccinated AS DOUBLE) AS people_vaccinated,
+               TRY_CAST(population AS DOUBLE) AS population
+        FROM sin_duplicados
+        WHERE TRY_CAST(new_cases AS {tipo_casos}) IS NOT NULL
+          AND TRY_CAST(population AS DOUBLE) IS NOT NULL
+        ORDER BY location, date
+    """, {"paises": list(paises)} if paises is not None else None).df()
+
+    # Mismas conversiones finales que el camino pandas
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df['location'] = df['location'].astype('category')
+    return df
+
+
+def incidencia_duckdb(con: duckdb.DuckDBPyConnection, datos: pd.DataFrame) -> pd.DataFrame:
+    """Incidencia 7d: SUM/COUNT sobre los últimos 7 días (RANGE) por país, por 100k habitantes"""
+    con.register("datos", datos)
+    resultado = con.execute("""
+        SELECT date AS fecha, location AS pais,
+               SUM(new_cases) OVER w / COUNT(new_cases) OVER w / population * 100000 AS incidencia_7d
+        FROM datos
+        WINDOW w AS (PARTITION BY location ORDER BY date
+                     RANGE BETWEEN INTERVAL 6 DAYS PRECEDING AND CURRENT ROW)
+        ORDER BY location, date
+    """).df()
+    con.unregister("datos")
+    return _igualar_tipos(resultado, datos, {'fecha': 'date', 'pais': 'location'})
+
+
+def factor_crec_duckdb(con: duckdb.DuckDBPyConnection, datos: pd.DataFrame) -> pd.DataFrame:
+    """Factor de crecimiento: sumas de 7 días completos (RANGE) en SQL; división y redondeo vectorizados"""
+    con.register("datos", datos)
+    # La semana previa es la ventana [t-13, t-7] días: completa solo si tiene sus 7 días
+    ventanas = con.execute("""
+        SELECT date AS semana_fin, location AS pais,
+               CASE WHEN COUNT(new_cases) OVER w = 7 THEN SUM(new_cases) OVER w END AS casos_semana_actual,
+               CASE WHEN COUNT(new_cases) OVER p = 7 THEN SUM(new_cases) OVER p END AS casos_semana_prev
+        FROM datos
+        WINDOW w AS (PARTITION BY location ORDER BY date
+                     RANGE BETWEEN INTERVAL 6 DAYS PRECEDING AND CURRENT ROW),
+               p AS (PARTITION BY location ORDER BY date
+                     RANGE BETWEEN INTERVAL 13 DAYS PRECEDING AND INTERVAL 7 DAYS PRECEDING)
+        ORDER BY location, date
+    """).df()
+    con.unregister("datos")
+
+    ventanas['factor_crec_7d'] = ventanas['casos_semana_actual'] / ventanas['casos_semana_prev']
+    ventanas = ventanas.dropna(subset=['casos_semana_actual', 'casos_semana_prev', 'factor_crec_7d'])
+    resultado = pd.DataFrame({
+        'semana_fin': ventanas['semana_fin'],
+        'pais': ventanas['pais'],
+        'casos_semana': ventanas['casos_semana_actual'].astype('int64'),
+        'factor_crec_7d': ventanas['factor_crec_7d'].round(3),
+    }).reset_index(drop=True)
+    return _igualar_tipos(resultado, datos, {'semana_fin': 'date', 'pais': 'location'})
+
+
+def _igualar_tipos(resultado: pd.DataFrame, datos: pd.DataFrame, origen: dict) -> pd.DataFrame:
+    """Devolver las columnas con el mismo dtype que tienen en datos_procesados"""
+    for destino, columna in origen.items():
+        resultado[destino] = resultado[destino].astype(datos[columna].dtype)
+    return resultado
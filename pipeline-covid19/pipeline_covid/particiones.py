@@ -0,0 +1,167 @@
+"""
+Assets particionados por día para materialización incremental
+Cada partición guarda la métrica de todos los países en ese día y se calcula
+solo con la ventana afectada (días del rango + días previos necesarios para la
+ventana móvil), no con la serie completa
+
+Las ejecuciones las lanza un sensor cuando se materializa datos_procesados:
+una sola ejecución por actualización recalcula el rango de los últimos
+DIAS_ACTUALIZACION días (BackfillPolicy.single_run), sin importar cuántos
+países haya
+"""
+
+import logging
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Tuple
+
+from dagster import (
+    asset,
+    asset_sensor,
+    AssetExecutionContext,
+    AssetIn,
+    AssetKey,
+    BackfillPolicy,
+    DailyPartitionsDefinition,
+    EventLogEntry,
+    PartitionKeyRange,
+    RunRequest,
+    SensorEvaluationContext,
+    SkipReason,
+)
+
+from pipeline_covid.assets import calcular_incidencia_7d, calcular_factor_crec_7d, COLUMNAS_METRICAS
+from pipeline_covid.tipos import DataFrame
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+log = logging.getLogger(__name__)
+
+# =============================================================================
+# DEFINICIONES DE PARTICIONES
+# =============================================================================
+
+# OWID empieza el 2020-01-01; la última partición es el día anterior.
+# Una partición por día con todos los países de datos_procesados (recurso paises)
+INICIO_PARTICIONES = "2020-01-01"
+PARTICIONES_DIARIAS = DailyPartitionsDefinition(start_date=INICIO_PARTICIONES)
+
+# Días previos necesarios para reproducir la ventana completa (ventanas de calendario):
+# - incidencia_7d: ventana de 7 días -> 6 días previos
+# - factor_crec_7d: suma de 7 días + desplazamiento de 7 días -> 13 días previos
+LOOKBACK_INCIDENCIA = 6
+LOOKBACK_FACTOR = 13
+
+# Días que se recalculan en cada actualización: los de la ventana más larga,
+# así un día revisado o que llegó tarde vuelve a calcularse
+DIAS_ACTUALIZACION = LOOKBACK_FACTOR + 1
+
+JOB_METRICAS_DIARIAS = "metricas_diarias"
+
+# Etiquetas con las que Dagster ejecuta un rango de particiones en una sola
+# ejecución (las mismas que usa un backfill con BackfillPolicy.single_run)
+ETIQUETA_RANGO_INICIO = "dagster/asset_partition_range_start"
+ETIQUETA_RANGO_FIN = "dagster/asset_partition_range_end"
+
+
+def ventana_con_lookback(datos: "pd.DataFrame", inicio: "pd.Timestamp", fin: "pd.Timestamp",
+                         lookback: int) -> "pd.DataFrame":
+    """Registros de todos los países entre inicio y fin, más los de los 'lookback' días anteriores a inicio"""
+    import pandas as pd
+
+    fechas = datos['date']
+    return datos[(fechas >= inicio - pd.Timedelta(days=lookback)) & (fechas <= fin)]
+
+
+def calcular_metrica_particion(datos: "pd.DataFrame", inicio: "pd.Timestamp", fin: "pd.Timestamp",
+                               calcular: "Callable[[pd.DataFrame], pd.DataFrame]", col_fecha: str,
+                               lookback: int) -> "Tuple[pd.DataFrame, int]":
+    """
+    Calcular una métrica solo para los días [inicio, fin] de todos los países
+    Devuelve el resultado y el número de registros leídos (incluido el lookback)
+    """
+    ventana = ventana_con_lookback(datos, inicio, fin, lookback)
+    resultado = calcular(ventana)
+    resultado = resultado[resultado[col_fecha] >= inicio].reset_index(drop=True)
+    return resultado, len(ventana)
+
+
+def por_particion(resultado: "pd.DataFrame", col_fecha: str, claves) -> "Dict[str, pd.DataFrame]":
+    """Resultado de un rango repartido en una tabla por día (vacía si el día no tiene filas)"""
+    dias = resultado[col_fecha].dt.strftime('%Y-%m-%d')
+    return {clave: resultado[dias == clave].reset_index(drop=True) for clave in claves}
+
+
+def rango_a_actualizar(fecha_max: str, dias: int = DIAS_ACTUALIZACION) -> Optional[PartitionKeyRange]:
+    """Rango de los últimos `dias` días hasta fecha_max, dentro de PARTICIONES_DIARIAS (None si no hay días)"""
+    import pandas as pd
+
+    fin = min(pd.Timestamp(fecha_max), pd.Timestamp(PARTICIONES_DIARIAS.get_last_partition_key()))
+    inicio = max(fin - pd.Timedelta(days=dias - 1), pd.Timestamp(INICIO_PARTICIONES))
+    if fin < inicio:
+        return None
+    return PartitionKeyRange(str(inicio.date()), str(fin.date()))
+
+
+def _metrica_diaria(context: AssetExecutionContext, datos: "pd.DataFrame",
+                    calcular: "Callable[[pd.DataFrame], pd.DataFrame]", col_fecha: str,
+                    lookback: int) -> "Dict[str, pd.DataFrame]":
+    """Todas las particiones de la ejecución en un solo cálculo: {día: tabla de ese día}"""
+    import pandas as pd
+
+    claves = context.partition_keys
+    inicio, fin = pd.Timestamp(claves[0]), pd.Timestamp(claves[-1])
+    resultado, leidos = calcular_metrica_particion(datos, inicio, fin, calcular, col_fecha, lookback)
+    log.info(f"{claves[0]} a {claves[-1]}: {len(resultado)} registros (ventana de {leidos})")
+    context.add_output_metadata({"dias": len(claves), "registros": len(resultado), "registros_leidos": leidos})
+    return por_particion(resultado, col_fecha, claves)
+
+# =============================================================================
+# MÉTRICAS PARTICIONADAS (PAÍS x DÍA)
+# =============================================================================
+
+@asset(partitions_def=PARTICIONES_DIARIAS, backfill_policy=BackfillPolicy.single_run(),
+       ins={"datos_procesados": AssetIn(metadata={"columnas": COLUMNAS_METRICAS})})
+def incidencia_7d_diaria(context: AssetExecutionContext, datos_procesados: DataFrame) -> dict:
+    """
+     PASO 4A (incremental): incidencia 7d de todos los países, un día por partición
+
+    Una ejecución calcula su rango de días de una vez y lee solo esos días y
+    los 6 previos
+    """
+    return _metrica_diaria(context, datos_procesados, calcular_incidencia_7d, 'fecha', LOOKBACK_INCIDENCIA)
+
+
+@asset(partitions_def=PARTICIONES_DIARIAS, backfill_policy=BackfillPolicy.single_run(),
+       ins={"datos_procesados": AssetIn(metadata={"columnas": COLUMNAS_METRICAS})})
+def factor_crec_7d_diario(context: AssetExecutionContext, datos_procesados: DataFrame) -> dict:
+    """
+     PASO 4B (incremental): factor de crecimiento de todos los países, un día por partición
+
+    Una ejecución calcula su rango de días de una vez y lee solo esos días y
+    los 13 previos
+    """
+    return _metrica_diaria(context, datos_procesados, calcular_factor_crec_7d, 'semana_fin', LOOKBACK_FACTOR)
+
+
+# =============================================================================
+# SENSOR: ACTUALIZAR LAS PARTICIONES AL MATERIALIZAR datos_procesados
+# =============================================================================
+
+@asset_sensor(asset_key=AssetKey("datos_procesados"), job_name=JOB_METRICAS_DIARIAS)
+def sensor_metricas_diarias(context: SensorEvaluationContext, asset_event: EventLogEntry):
+    """
+    Una sola ejecución con el rango de los últimos DIAS_ACTUALIZACION días de la
+    materialización nueva de datos_procesados (última fecha en su metadata)
+    """
+    metadata = asset_event.asset_materialization.metadata
+    if "fecha_max" not in metadata:
+        return SkipReason("La materialización de datos_procesados no trae fecha_max")
+
+    rango = rango_a_actualizar(metadata["fecha_max"].value)
+    if rango is None:
+        return SkipReason(f"Sin particiones diarias hasta {metadata['fecha_max'].value}")
+    log.info(f"Particiones a actualizar: {rango.start} a {rango.end}")
+    return RunRequest(
+        run_key=asset_event.run_id,
+        tags={ETIQUETA_RANGO_INICIO: rango.start, ETIQUETA_RANGO_FIN: rango.end},
+    )
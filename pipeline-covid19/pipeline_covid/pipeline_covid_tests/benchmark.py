@@ -0,0 +1,207 @@
+"""
+Suite de benchmarks del pipeline con datos sintéticos
+Ejecuta pipeline_completo (en proceso, con sus chequeos) sobre un CSV generado
+con generar_owid en cada escala y guarda por paso:
+
+- paso_s: duración del paso en Dagster (incluye cargar y guardar con el IO manager)
+- tiempo_s / cpu_s / memoria_incremento_mb / memoria_pico_mb: medidos por
+  @instrumentar en el cuerpo del asset (memoria_pico_asignada_mb también, con
+  PIPELINE_COVID_TRACEMALLOC=1)
+
+Cada escala se repite y se guarda el mínimo. La primera repetición crea la caché
+Parquet, así que leer_datos queda medido con la caché ya creada
+
+Uso (desde pipeline-covid19/pipeline_covid):
+    PYTHONPATH=..:. python -m pipeline_covid_tests.benchmark --escalas pequena mediana --comparar
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from pipeline_covid_tests.datos_sinteticos import generar_owid
+
+# (países, días, columnas extra). "grande" tiene el tamaño del CSV completo de OWID
+ESCALAS = {
+    "pequena": (10, 365, 10),
+    "mediana": (100, 1000, 30),
+    "grande": (250, 1700, 60),
+}
+
+PASOS = [
+    "leer_datos", "chequeos_entrada", "datos_procesados", "metricas",
+    "check_valores_incidencia", "check_factor_crecimiento", "reporte_excel_covid", "indice_metricas",
+]
+MEDIDAS_CUERPO = ("tiempo_s", "cpu_s", "memoria_incremento_mb", "memoria_pico_mb", "memoria_pico_asignada_mb")
+
+RUTA_BASE = os.path.join(os.path.dirname(__file__), "benchmarks", "base.json")
+
+# Una regresión debe superar las dos tolerancias (evita falsos positivos en pasos de milisegundos)
+TOLERANCIA_RELATIVA = 0.25
+TOLERANCIA_ABSOLUTA_S = 0.05
+
+
+@contextmanager
+def _directorio_de_trabajo(ruta: str) -> Iterator[None]:
+    anterior = os.getcwd()
+    os.chdir(ruta)
+    try:
+        yield
+    finally:
+        os.chdir(anterior)
+
+
+def _ejecutar_pipeline() -> Dict[str, Dict[str, float]]:
+    """Una ejecución de pipeline_completo en el directorio actual: {paso: medidas}"""
+    from dagster import DagsterEventType, DagsterInstance
+    from pipeline_covid.definitions import defs
+
+    job = defs.resolve_job_def("pipeline_completo")
+    with DagsterInstance.ephemeral() as instancia:
+        resultado = job.execute_in_process(
+            run_config={"resources": {"paises": {"config": {"paises": ["todos"]}}}}, instance=instancia
+        )
+        if not resultado.success:
+            raise RuntimeError("❌ Benchmark: pipeline_completo falló")
+        medidas = {
+            paso.step_key: {"paso_s": round(paso.end_time - paso.start_time, 4)}
+            for paso in instancia.get_run_step_stats(resultado.run_id)
+        }
+
+    for evento in resultado.all_events:
+        if evento.event_type == DagsterEventType.ASSET_MATERIALIZATION:
+            metadata = evento.event_specific_data.materialization.metadata
+        elif evento.event_type == DagsterEventType.ASSET_CHECK_EVALUATION:
+            metadata = evento.event_specific_data.metadata
+        else:
+            continue
+        for medida in MEDIDAS_CUERPO:
+            if medida in metadata:
+                medidas[evento.step_key][medida] = metadata[medida].value
+    return medidas
+
+
+def medir_escala(n_paises: int, n_dias: int, columnas_extra: int = 0, repeticiones: int = 3,
+                 semilla: int = 0) -> Dict[str, Any]:
+    """Mínimo de cada medida por paso en `repeticiones` ejecuciones sobre un directorio temporal"""
+    from pipeline_covid.instrumentacion import NOMBRE_LOGGER
+
+    datos = generar_owid(n_paises=n_paises, n_dias=n_dias, semilla=semilla, columnas_extra=columnas_extra)
+    directorio = tempfile.mkdtemp(prefix="covid_bench_")
+    logger = logging.getLogger(NOMBRE_LOGGER)
+    nivel_anterior = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        ruta_csv = os.path.join(directorio, "pipeline_covid", "data", "covid.csv")
+        os.makedirs(os.path.dirname(ruta_csv))
+        datos.to_csv(ruta_csv, index=False)
+        megabytes_csv = round(os.path.getsize(ruta_csv) / 1024 ** 2, 1)
+
+        ejecuciones = []
+        with _directorio_de_trabajo(directorio):
+            for _ in range(repeticiones):
+                # Sin el reporte previo: si no, la huella de contenido lo reutiliza
+                shutil.rmtree(os.path.join("pipeline_covid", "output"), ignore_errors=True)
+                ejecuciones.append(_ejecutar_pipeline())
+    finally:
+        logger.setLevel(nivel_anterior)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+    pasos = {
+        paso: {medida: min(e[paso][medida] for e in ejecuciones) for medida in ejecuciones[0][paso]}
+        for paso in PASOS
+    }
+    return {
+        "paises": n_paises, "dias": n_dias, "columnas": len(datos.columns), "filas": len(datos),
+        "megabytes_csv": megabytes_csv,
+        "repeticiones": repeticiones, "pasos": pasos,
+    }
+
+
+def entorno() -> Dict[str, Any]:
+    """Versiones y máquina: las comparaciones solo tienen sentido en el mismo entorno"""
+    import dagster
+    return {
+        "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+        "pyarrow": pa.__version__, "dagster": dagster.__version__,
+        "plataforma": platform.platform(), "nucleos": os.cpu_count(),
+    }
+
+
+def ejecutar_suite(escalas: List[str], repeticiones: int = 3) -> Dict[str, Any]:
+    resultados = {"entorno": entorno(), "escalas": {}}
+    for nombre in escalas:
+        n_paises, n_dias, extra = ESCALAS[nombre]
+        resultados["escalas"][nombre] = medir_escala(n_paises, n_dias, extra, repeticiones)
+    return resultados
+
+
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], tolerancia: float = TOLERANCIA_RELATIVA,
+             minimo_s: float = TOLERANCIA_ABSOLUTA_S) -> pd.DataFrame:
+    """
+    Tabla escala × paso con paso_s de la base y de la ejecución actual
+    regresion = más de `tolerancia` y más de `minimo_s` segundos por encima de la base
+    """
+    filas = []
+    for escala, medida in actual["escalas"].items():
+        pasos_base = base.get("escalas", {}).get(escala, {}).get("pasos", {})
+        for paso, valores in medida["pasos"].items():
+            if paso not in pasos_base:
+                continue
+            antes, ahora = pasos_base[paso]["paso_s"], valores["paso_s"]
+            filas.append({
+                "escala": escala, "paso": paso, "base_s": antes, "actual_s": ahora,
+                "cambio": round(ahora / antes - 1, 3) if antes else np.nan,
+                "regresion": ahora > antes * (1 + tolerancia) and ahora - antes > minimo_s,
+            })
+    return pd.DataFrame(filas, columns=["escala", "paso", "base_s", "actual_s", "cambio", "regresion"])
+
+
+def main(argumentos: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de pipeline_completo con datos sintéticos")
+    parser.add_argument("--escalas", nargs="+", choices=list(ESCALAS), default=["pequena", "mediana"])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--guardar", nargs="?", const=RUTA_BASE,
+                        help="JSON donde guardar los resultados (sin ruta: la línea base del repo)")
+    parser.add_argument("--comparar", nargs="?", const=RUTA_BASE,
+                        help="JSON de línea base (sin ruta: la del repo); sale con código 1 si hay regresiones")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA_RELATIVA)
+    opciones = parser.parse_args(argumentos)
+
+    resultados = ejecutar_suite(opciones.escalas, opciones.repeticiones)
+    for nombre, medida in resultados["escalas"].items():
+        print(f"\n{nombre}: {medida['filas']:,} filas × {medida['columnas']} columnas ({medida['megabytes_csv']} MB)")
+        print(pd.DataFrame(medida["pasos"]).T.to_string())
+
+    if opciones.guardar:
+        os.makedirs(os.path.dirname(os.path.abspath(opciones.guardar)), exist_ok=True)
+        with open(opciones.guardar, "w") as f:
+            json.dump(resultados, f, indent=2)
+        print(f"\nResultados guardados en {opciones.guardar}")
+
+    if opciones.comparar:
+        with open(opciones.comparar) as f:
+            base = json.load(f)
+        if base.get("entorno") != resultados["entorno"]:
+            print("\nAviso: la línea base se midió en otro entorno")
+        tabla = comparar(resultados, base, opciones.tolerancia)
+        print("\n" + tabla.to_string(index=False))
+        if tabla["regresion"].any():
+            print(f"\n{int(tabla['regresion'].sum())} pasos más lentos que la línea base")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Generador determinista de datos con la forma del CSV de OWID"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def generar_owid(n_paises: int = 2, n_dias: int = 120, semilla: int = 0,
+                 fraccion_nulos: float = 0.05, columnas_extra: int = 0) -> pd.DataFrame:
+    """
+    DataFrame tipo OWID: Ecuador, Peru y países 'Pais_NNN' con casos Poisson
+    columnas_extra: columnas numéricas 'extra_NNN' que el pipeline no usa, para
+    acercar el ancho al CSV real (~67 columnas)
+    """
+    rng = np.random.default_rng(semilla)
+    paises = (['Ecuador', 'Peru'] + [f'Pais_{i:03d}' for i in range(max(n_paises - 2, 0))])[:n_paises]
+    fechas = pd.date_range('2020-03-01', periods=n_dias, freq='D').strftime('%Y-%m-%d')
+
+    bloques = []
+    for pais in paises:
+        casos = rng.poisson(rng.integers(50, 5000), n_dias).astype(float)
+        casos[rng.random(n_dias) < fraccion_nulos] = np.nan
+        vacunados = np.where(np.arange(n_dias) > n_dias // 2, np.arange(n_dias) * 1000.0, np.nan)
+        bloques.append(pd.DataFrame({
+            'iso_code': pais[:3].upper(),
+            'continent': 'South America',
+            'location': pais,
+            'date': fechas,
+            'total_cases': np.nancumsum(casos),
+            'new_cases': casos,
+            'people_vaccinated': vacunados,
+            'population': float(rng.integers(1_000_000, 60_000_000)),
+            **{f'extra_{j:03d}': rng.random(n_dias).round(3) for j in range(columnas_extra)},
+        }))
+    return pd.concat(bloques, ignore_index=True)
+
+
+def generar_compacto(n_paises: int, n_dias: int, semilla: int = 0) -> pd.DataFrame:
+    """
+    Salida de leer_datos (modo optimizado) sin pasar por CSV: país category,
+    fecha datetime y casos float32. Pensado para millones de filas
+    """
+    rng = np.random.default_rng(semilla)
+    paises = [f'Pais_{i:04d}' for i in range(n_paises)]
+    fechas = pd.date_range('1995-01-01', periods=n_dias, freq='D').values.astype('datetime64[us]')
+    n_filas = n_paises * n_dias
+    return pd.DataFrame({
+        'location': pd.Categorical.from_codes(np.repeat(np.arange(n_paises), n_dias), categories=paises),
+        'date': np.tile(fechas, n_paises),
+        'new_cases': rng.poisson(100, n_filas).astype(np.float32),
+        'people_vaccinated': np.full(n_filas, np.nan),
+        'population': np.repeat(rng.integers(1_000_000, 60_000_000, n_paises).astype(float), n_dias),
+    })
+
+
+def compactar_metricas(crudo: pd.DataFrame) -> pd.DataFrame:
+    """Columnas de las métricas sin nulos y con tipos compactos, como las deja datos_procesados"""
+    from pipeline_covid.assets import compactar_tipos, resolver_columnas
+
+    df = crudo[['location', 'date', 'new_cases', 'population']].dropna()
+    return compactar_tipos(df, resolver_columnas(df.columns)).reset_index(drop=True)
+
+
+def escribir_csv_pipeline(directorio, crudo: pd.DataFrame) -> None:
+    """CSV en <directorio>/pipeline_covid/data/covid.csv, la ruta de RUTAS_POSIBLES relativa a <directorio>"""
+    carpeta = os.path.join(directorio, "pipeline_covid", "data")
+    os.makedirs(carpeta, exist_ok=True)
+    crudo.to_csv(os.path.join(carpeta, "covid.csv"), index=False)
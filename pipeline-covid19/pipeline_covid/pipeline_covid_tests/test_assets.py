@@ -1 +1,144 @@
+import numpy as np
+import pandas as pd
+import pytest
 
+from pipeline_covid.assets import leer_csv_optimizado, resolver_columnas, COLUMNAS_REQUERIDAS
+from pipeline_covid.validacion_entrada import (
+    calcular_estadisticas_entrada,
+    evaluar_columnas_esenciales,
+    evaluar_paises_objetivo,
+)
+
+
+def _escribir_csv(ruta, col_pais='location'):
+    df = pd.DataFrame({
+        'iso_code': ['ECU', 'ECU', 'PER', 'COL', 'PER'],
+        col_pais: ['Ecuador', 'Ecuador', 'Peru', 'Colombia', 'Peru'],
+        'date': ['2021-01-01', '2021-01-02', '2021-01-01', '2021-01-01', '2021-01-02'],
+        'total_cases': [10.0, 12.0, 5.0, 7.0, 9.0],
+        'new_cases': [1.0, 2.0, None, 4.0, 5.0],
+        'people_vaccinated': [None, 100.0, None, None, 50.0],
+        'population': [17_643_060.0] * 2 + [33_359_415.0, 51_874_024.0, 33_359_415.0],
+    })
+    df.to_csv(ruta, index=False)
+    return df
+
+
+def test_resolver_columnas_acepta_country():
+    mapa = resolver_columnas(['country', 'date', 'new_cases'])
+    assert mapa['pais'] == 'country'
+    assert mapa['fecha'] == 'date'
+    assert mapa['vacunas'] is None
+
+
+def test_leer_csv_optimizado_filtra_y_compacta(tmp_path):
+    ruta = tmp_path / "covid.csv"
+    _escribir_csv(ruta)
+
+    df = leer_csv_optimizado(str(ruta), ['Ecuador', 'Peru'], tamano_bloque=2)
+
+    assert list(df.columns) == ['location', 'date', 'new_cases', 'people_vaccinated', 'population']
+    assert isinstance(df['location'].dtype, pd.CategoricalDtype)
+    assert df['new_cases'].dtype == 'float32'
+    assert pd.api.types.is_datetime64_any_dtype(df['date'])
+    assert sorted(df['location'].unique()) == ['Ecuador', 'Peru']
+    assert len(df) == 4
+    assert df['population'].iloc[0] == 17_643_060.0
+
+
+def test_leer_csv_optimizado_con_columna_country(tmp_path):
+    ruta = tmp_path / "covid.csv"
+    _escribir_csv(ruta, col_pais='country')
+
+    df = leer_csv_optimizado(str(ruta), ['Peru'])
+
+    assert 'country' in df.columns
+    assert len(df) == 2
+
+
+def test_resumen_estadistico_agrupado():
+    from pipeline_covid.assets import generar_resumen_estadistico
+
+    datos = pd.DataFrame({
+        'location': pd.Categorical(['Ecuador', 'Ecuador', 'Peru']),
+        'date': pd.to_datetime(['2021-01-01', '2021-01-02', '2021-01-01']),
+        'new_cases': [10.0, 20.0, 5.0],
+        'population': [100.0, 100.0, 200.0],
+    })
+    incidencia = pd.DataFrame({
+        'fecha': pd.to_datetime(['2021-01-01', '2021-01-02', '2021-01-01']),
+        'pais': ['Ecuador', 'Ecuador', 'Peru'],
+        'incidencia_7d': [1.0, 3.0, 2.0],
+    })
+    factor = pd.DataFrame({'pais': ['Peru'], 'factor_crec_7d': [1.5]})
+
+    resumen = generar_resumen_estadistico(datos, incidencia, factor, ['Ecuador', 'Peru', 'Chile'])
+
+    assert resumen['pais'].tolist() == ['Ecuador', 'Peru', 'Chile']
+    ecuador, peru, chile = (fila for _, fila in resumen.iterrows())
+    assert ecuador['registros_totales'] == 2 and ecuador['fecha_fin'] == '2021-01-02'
+    assert ecuador['casos_promedio_diario'] == 15.0 and ecuador['incidencia_7d_maxima'] == 3.0
+    assert ecuador['incidencia_7d_p50'] == 2.0 and ecuador['incidencia_7d_p95'] == pytest.approx(2.9)
+    assert ecuador['semana_pico'] == '2021-01-02' and peru['semana_pico'] == '2021-01-01'
+    assert ecuador['factor_crec_promedio'] == 0
+    assert peru['factor_crec_promedio'] == 1.5 and peru['poblacion'] == 200.0
+    assert chile['registros_totales'] == 0 and chile['fecha_inicio'] == 'N/A' and chile['semana_pico'] == 'N/A'
+
+
+def test_resumen_semana_pico_con_empates_y_nan():
+    from pipeline_covid.assets import generar_resumen_estadistico
+
+    datos = pd.DataFrame({
+        'location': pd.Categorical(['Ecuador'] * 4),
+        'date': pd.date_range('2021-01-01', periods=4),
+        'new_cases': [1.0, 1.0, 1.0, 1.0],
+        'population': [100.0] * 4,
+    })
+    # NaN no es el máximo; en un empate cuenta la primera semana, como idxmax
+    incidencia = pd.DataFrame({'fecha': datos['date'], 'pais': ['Ecuador'] * 4,
+                               'incidencia_7d': [np.nan, 5.0, 1.0, 5.0]})
+    factor = pd.DataFrame({'pais': pd.Series([], dtype=str), 'factor_crec_7d': pd.Series([], dtype=float)})
+
+    resumen = generar_resumen_estadistico(datos, incidencia, factor)
+
+    assert resumen['semana_pico'].tolist() == ['2021-01-02']
+    assert resumen['incidencia_7d_p50'].tolist() == [5.0] and resumen['incidencia_7d_maxima'].tolist() == [5.0]
+
+
+def test_resumen_estadistico_sin_incidencia():
+    from pipeline_covid.assets import generar_resumen_estadistico
+
+    datos = pd.DataFrame({
+        'location': pd.Categorical(['Ecuador']),
+        'date': pd.to_datetime(['2021-01-01']),
+        'new_cases': [10.0],
+        'population': [100.0],
+    })
+    incidencia = pd.DataFrame({'fecha': pd.to_datetime([]), 'pais': pd.Series([], dtype=str),
+                               'incidencia_7d': pd.Series([], dtype=float)})
+    factor = pd.DataFrame({'pais': pd.Series([], dtype=str), 'factor_crec_7d': pd.Series([], dtype=float)})
+
+    resumen = generar_resumen_estadistico(datos, incidencia, factor, ['Ecuador', 'Peru'])
+
+    assert resumen['pais'].tolist() == ['Ecuador', 'Peru']
+    assert resumen['incidencia_7d_p50'].tolist() == [0, 0] and resumen['semana_pico'].tolist() == ['N/A', 'N/A']
+    assert resumen['registros_totales'].tolist() == [1, 0]
+
+def test_estadisticas_entrada_en_una_pasada():
+    datos = pd.DataFrame({
+        'location': pd.Categorical(['Ecuador', 'Ecuador', 'Peru', 'Chile']),
+        'date': pd.to_datetime(['2021-01-01', '2099-01-01', '2021-01-02', None]),
+        'new_cases': [1.0, 2.0, 3.0, 4.0],
+    })
+
+    estadisticas = calcular_estadisticas_entrada(datos, COLUMNAS_REQUERIDAS, hoy=pd.Timestamp('2024-01-01'))
+
+    assert estadisticas["registros_futuros"] == 1
+    assert estadisticas["fecha_maxima"] == pd.Timestamp('2099-01-01')
+    assert estadisticas["columnas"]['vacunas'] is None
+    assert estadisticas["conteos_pais"].to_dict() == {'Ecuador': 2, 'Peru': 1, 'Chile': 1}
+
+    columnas = evaluar_columnas_esenciales(estadisticas)
+    assert not columnas.passed and columnas.metadata["columnas_faltantes"].value == ['vacunas', 'poblacion']
+    assert evaluar_paises_objetivo(estadisticas, ['Ecuador', 'Peru']).passed
+    assert not evaluar_paises_objetivo(estadisticas, ['Ecuador', 'Bolivia']).passed
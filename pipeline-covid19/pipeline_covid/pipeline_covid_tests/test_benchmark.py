@@ -0,0 +1,57 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline_covid_tests.benchmark import PASOS, RUTA_BASE, comparar, main, medir_escala
+from pipeline_covid_tests.datos_sinteticos import generar_owid
+
+
+def test_generador_determinista_con_columnas_extra():
+    datos = generar_owid(n_paises=4, n_dias=30, semilla=3, columnas_extra=5)
+
+    pd.testing.assert_frame_equal(datos, generar_owid(n_paises=4, n_dias=30, semilla=3, columnas_extra=5))
+    assert len(datos) == 120 and len(datos.columns) == 8 + 5
+    assert [c for c in datos.columns if c.startswith('extra_')] == [f'extra_{j:03d}' for j in range(5)]
+    # Sin columnas extra la serie aleatoria no cambia
+    pd.testing.assert_frame_equal(datos.iloc[:30, :8], generar_owid(n_paises=4, n_dias=30, semilla=3).iloc[:30])
+
+
+def test_medir_escala_cubre_todos_los_pasos():
+    medida = medir_escala(n_paises=3, n_dias=30, columnas_extra=2, repeticiones=1)
+
+    assert medida["filas"] == 90 and medida["columnas"] == 10
+    assert list(medida["pasos"]) == PASOS
+    for paso in PASOS:
+        assert set(medida["pasos"][paso]) == {"paso_s", "tiempo_s", "cpu_s", "memoria_incremento_mb", "memoria_pico_mb"}
+        assert medida["pasos"][paso]["paso_s"] >= medida["pasos"][paso]["tiempo_s"]
+
+
+def test_comparar_detecta_regresiones():
+    def resultados(**tiempos):
+        return {"escalas": {"pequena": {"pasos": {paso: {"paso_s": t} for paso, t in tiempos.items()}}}}
+
+    base = resultados(leer_datos=1.0, datos_procesados=0.01, reporte_excel_covid=1.0)
+    actual = resultados(leer_datos=1.5, datos_procesados=0.03, reporte_excel_covid=1.1, paso_nuevo=5.0)
+
+    tabla = comparar(actual, base).set_index("paso")
+
+    # datos_procesados triplica pero solo suma 20 ms: por debajo de la tolerancia absoluta
+    assert tabla["regresion"].to_dict() == {
+        "leer_datos": True, "datos_procesados": False, "reporte_excel_covid": False
+    }
+    assert tabla.loc["leer_datos", "cambio"] == 0.5
+
+
+def test_linea_base_del_repo():
+    with open(RUTA_BASE) as f:
+        base = json.load(f)
+
+    assert {"pequena", "mediana", "grande"} <= set(base["escalas"])
+    assert all(list(escala["pasos"]) == PASOS for escala in base["escalas"].values())
+
+
+@pytest.mark.skipif(not os.environ.get("COVID_BENCH"), reason="benchmark: exportar COVID_BENCH=1")
+def test_benchmark_contra_linea_base():
+    assert main(["--escalas", "pequena", "mediana", "--comparar"]) == 0
@@ -0,0 +1,45 @@
+import os
+
+import pandas as pd
+
+from pipeline_covid.cache_parquet import asegurar_cache, leer_cache, calcular_sha256
+
+
+def _escribir_csv(ruta, casos_peru=5.0):
+    pd.DataFrame({
+        'iso_code': ['ECU', 'ECU', 'PER', 'COL'],
+        'location': ['Ecuador', 'Ecuador', 'Peru', 'Colombia'],
+        'date': ['2021-01-01', '2021-01-02', '2021-01-01', '2021-01-01'],
+        'new_cases': [1.0, 2.0, casos_peru, 4.0],
+        'population': [17_643_060.0, 17_643_060.0, 33_359_415.0, 51_874_024.0],
+    }).to_csv(ruta, index=False)
+
+
+def test_cache_lee_solo_paises_pedidos(tmp_path):
+    ruta = str(tmp_path / "covid.csv")
+    _escribir_csv(ruta)
+
+    manifiesto = asegurar_cache(ruta)
+    df = leer_cache(manifiesto, ['location', 'date', 'new_cases'], ['Ecuador', 'Peru'])
+
+    assert manifiesto["sha256"] == calcular_sha256(ruta)
+    assert list(df.columns) == ['location', 'date', 'new_cases']
+    assert sorted(df['location'].unique()) == ['Ecuador', 'Peru']
+    assert len(df) == 3
+
+
+def test_cache_se_reutiliza_y_se_invalida(tmp_path):
+    ruta = str(tmp_path / "covid.csv")
+    _escribir_csv(ruta)
+    primero = asegurar_cache(ruta)
+
+    # Mismo contenido con otro mtime: se reutiliza el dataset
+    os.utime(ruta, ns=(0, 0))
+    assert asegurar_cache(ruta)["dataset"] == primero["dataset"]
+
+    # Contenido distinto: se regenera y se borra la versión anterior
+    _escribir_csv(ruta, casos_peru=50.0)
+    segundo = asegurar_cache(ruta)
+    assert segundo["dataset"] != primero["dataset"]
+    assert not os.path.exists(primero["dataset"])
+    assert leer_cache(segundo, ['new_cases'], ['Peru'])['new_cases'].tolist() == [50.0]
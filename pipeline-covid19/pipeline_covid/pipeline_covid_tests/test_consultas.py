@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline_covid.assets import calcular_incidencia_7d, calcular_factor_crec_7d
+from pipeline_covid.consultas import ConsultasMetricas, IndiceMetrica, crear_servidor, escribir_indice
+from pipeline_covid_tests.datos_sinteticos import generar_compacto
+
+
+def _metricas(n_paises=6, n_dias=90, semilla=0):
+    datos = generar_compacto(n_paises=n_paises, n_dias=n_dias, semilla=semilla)
+    rng = np.random.default_rng(semilla)
+    datos = datos[rng.random(len(datos)) > 0.2].reset_index(drop=True)
+    return calcular_incidencia_7d(datos), calcular_factor_crec_7d(datos)
+
+
+@pytest.fixture
+def directorio(tmp_path):
+    incidencia, factor = _metricas()
+    # Desordenado a propósito: el índice ordena por (pais, fecha)
+    escribir_indice(incidencia.sample(frac=1, random_state=0), "fecha", ["incidencia_7d"],
+                    str(tmp_path / "incidencia_7d.arrow"))
+    escribir_indice(factor, "semana_fin", ["casos_semana", "factor_crec_7d"], str(tmp_path / "factor_crec_7d.arrow"))
+    return tmp_path
+
+
+def test_consultas_iguales_a_filtrar_el_dataframe(directorio):
+    incidencia, _ = _metricas()
+    incidencia['pais'] = incidencia['pais'].astype(str)
+    indice = IndiceMetrica(str(directorio / "incidencia_7d.arrow"))
+    rng = np.random.default_rng(1)
+
+    for _, fila in incidencia.sample(50, random_state=2).iterrows():
+        resultado = indice.punto(fila['pais'], fila['fecha'])
+        assert resultado["fecha"] == str(fila['fecha'].date())
+        assert resultado["incidencia_7d"] == pytest.approx(fila['incidencia_7d'], nan_ok=True)
+
+    for pais in indice.paises:
+        desde, hasta = sorted(rng.choice(pd.date_range('1995-01-01', periods=100), 2))
+        esperado = incidencia[(incidencia['pais'] == pais) & incidencia['fecha'].between(desde, hasta)]
+        serie = indice.rango(pais, desde, hasta)
+        assert serie["fecha"] == esperado['fecha'].dt.strftime('%Y-%m-%d').tolist()
+        np.testing.assert_array_equal(np.array(serie["incidencia_7d"], dtype=float), esperado['incidencia_7d'])
+
+    ultimos = incidencia.sort_values('fecha').groupby('pais').tail(1).sort_values('pais')
+    assert [(f["pais"], f["fecha"]) for f in indice.ultimos()] == list(
+        zip(ultimos['pais'], ultimos['fecha'].dt.strftime('%Y-%m-%d'))
+    )
+
+
+def test_consultas_sin_resultado(directorio):
+    indice = IndiceMetrica(str(directorio / "factor_crec_7d.arrow"))
+    pais = indice.paises[0]
+
+    assert indice.punto(pais, "1990-01-01") is None
+    assert indice.rango(pais, "2030-01-01")["fecha"] == []
+    assert indice.rango(pais, "1995-03-01", "1995-02-01")["fecha"] == []
+    assert isinstance(indice.punto(pais, indice.ultimos([pais])[0]["fecha"])["casos_semana"], int)
+    with pytest.raises(KeyError):
+        indice.punto("Atlantida", "1995-02-01")
+    with pytest.raises(ValueError):
+        indice.punto(pais, "ayer")
+
+
+def test_fechas_repetidas(tmp_path):
+    datos = pd.DataFrame({'pais': ['A', 'A'], 'fecha': pd.to_datetime(['2021-01-01'] * 2), 'v': [1.0, 2.0]})
+
+    with pytest.raises(ValueError):
+        escribir_indice(datos, "fecha", ["v"], str(tmp_path / "v.arrow"))
+
+
+def test_servidor_json(directorio):
+    servidor = crear_servidor(str(directorio), puerto=0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_address[1]}/metricas"
+
+    def obtener(ruta):
+        with urlopen(base + ruta) as respuesta:
+            return json.load(respuesta)
+
+    try:
+        catalogo = obtener("")
+        pais = catalogo["incidencia_7d"]["paises"][0]
+        ultimo = obtener(f"/incidencia_7d/ultimos?paises={pais}")[0]
+
+        assert set(catalogo) == {"incidencia_7d", "factor_crec_7d"}
+        assert obtener(f"/incidencia_7d/{pais}?fecha={ultimo['fecha']}") == ultimo
+        assert obtener(f"/incidencia_7d/{pais}?desde={ultimo['fecha']}")["fecha"] == [ultimo["fecha"]]
+        for ruta, estado in [("/incidencia_7d/Atlantida?fecha=1995-01-01", 404), ("/muertes/ultimos", 404),
+                             (f"/incidencia_7d/{pais}?fecha=ayer", 400), (f"/incidencia_7d/{pais}?fecha=1980-01-01", 404)]:
+            with pytest.raises(HTTPError) as error:
+                obtener(ruta)
+            assert error.value.code == estado
+
+        # Un índice reescrito se recarga sin reiniciar el servidor
+        datos = pd.DataFrame({'pais': [pais], 'fecha': pd.to_datetime(['2030-01-01']), 'incidencia_7d': [1.5]})
+        time.sleep(0.01)
+        escribir_indice(datos, "fecha", ["incidencia_7d"], str(directorio / "incidencia_7d.arrow"))
+        assert obtener(f"/incidencia_7d/{pais}?fecha=2030-01-01")["incidencia_7d"] == 1.5
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def test_actualizar_publica_un_dict_nuevo(directorio):
+    # Los hilos del servidor que ya tomaron `indices` no lo ven cambiar a medias
+    consultas = ConsultasMetricas(str(directorio))
+    antes = consultas.indices
+    factor = antes["factor_crec_7d"]
+    datos = pd.DataFrame({'pais': ['A'], 'fecha': pd.to_datetime(['2030-01-01']), 'incidencia_7d': [1.5]})
+    time.sleep(0.01)
+    escribir_indice(datos, "fecha", ["incidencia_7d"], str(directorio / "incidencia_7d.arrow"))
+
+    consultas.actualizar()
+
+    assert consultas.indices is not antes and antes["incidencia_7d"].filas > 1
+    assert consultas["incidencia_7d"].filas == 1
+    assert consultas["factor_crec_7d"] is factor
+
+
+def test_error_inesperado_responde_500_en_json(directorio, monkeypatch):
+    def fallar(*args, **kwargs):
+        raise RuntimeError("fallo interno")
+
+    monkeypatch.setattr(IndiceMetrica, "ultimos", fallar)
+    servidor = crear_servidor(str(directorio), puerto=0)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{servidor.server_address[1]}/metricas"
+    try:
+        with pytest.raises(HTTPError) as error:
+            urlopen(base + "/incidencia_7d/ultimos")
+        assert error.value.code == 500
+        assert json.load(error.value) == {"error": "Error interno del servidor"}
+        # El servidor sigue atendiendo
+        with urlopen(base) as respuesta:
+            assert set(json.load(respuesta)) == {"incidencia_7d", "factor_crec_7d"}
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+@pytest.mark.skipif(not os.environ.get("COVID_BENCH"), reason="benchmark: exportar COVID_BENCH=1")
+def test_benchmark_latencia(tmp_path):
+    incidencia, _ = _metricas(n_paises=250, n_dias=1700)
+    incidencia['pais'] = incidencia['pais'].astype(str)
+    escribir_indice(incidencia, "fecha", ["incidencia_7d"], str(tmp_path / "incidencia_7d.arrow"))
+    indice = ConsultasMetricas(str(tmp_path))["incidencia_7d"]
+    muestra = incidencia.sample(2000, random_state=0)
+    consultas = list(zip(muestra['pais'], muestra['fecha'].dt.strftime('%Y-%m-%d'),
+                         (muestra['fecha'] + pd.Timedelta(days=30)).dt.strftime('%Y-%m-%d')))
+
+    def por_consulta(funcion, n):
+        inicio = time.perf_counter()
+        for argumentos in consultas[:n]:
+            funcion(*argumentos)
+        return (time.perf_counter() - inicio) / n * 1e6
+
+    filtro_pandas = por_consulta(
+        lambda p, f, _: incidencia[(incidencia['pais'] == p) & (incidencia['fecha'] == f)], 50
+    )
+    punto = por_consulta(lambda p, f, _: indice.punto(p, f), 2000)
+    rango = por_consulta(indice.rango, 2000)
+    inicio = time.perf_counter()
+    for _ in range(100):
+        indice.ultimos()
+    ultimos = (time.perf_counter() - inicio) / 100 * 1e6
+    print(f"\n{indice.filas:,} filas | punto {punto:.1f} µs | rango 30 días {rango:.1f} µs | "
+          f"últimos ({len(indice.paises)} países) {ultimos:.0f} µs | filtro pandas {filtro_pandas:.0f} µs")
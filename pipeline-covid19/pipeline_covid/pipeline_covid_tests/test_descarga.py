@@ -0,0 +1,192 @@
+import gzip
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from dagster import materialize
+
+from pipeline_covid.assets import fuente_owid
+from pipeline_covid.descarga import SUFIJO_PARCIAL, descargar_condicional
+from pipeline_covid_tests.datos_sinteticos import generar_owid
+
+
+class ServidorOWID(BaseHTTPRequestHandler):
+    """Imitación del servidor de OWID: ETag, Last-Modified, Range/If-Range y gzip opcional"""
+    contenido = b""
+    version = 1
+    usar_gzip = False
+    cortar_tras = None
+    siempre_416 = False
+    peticiones = []
+
+    def log_message(self, *args):
+        pass
+
+    def _representacion(self):
+        if self.usar_gzip and "gzip" in self.headers.get("Accept-Encoding", ""):
+            return gzip.compress(self.contenido, mtime=0), "gzip", f'"v{self.version}-gzip"'
+        return self.contenido, "identity", f'"v{self.version}"'
+
+    def do_GET(self):
+        cuerpo, codificacion, etag = self._representacion()
+        ultima_modificacion = f"Mon, 0{self.version} Feb 2021 00:00:00 GMT"
+        peticion = {"cabeceras": dict(self.headers), "bytes": 0}
+        self.peticiones.append(peticion)
+
+        if self.headers.get("If-None-Match") == etag:
+            peticion["estado"] = 304
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        rango = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+        if self.siempre_416 or (rango and self.headers.get("If-Range", etag) == etag):
+            inicio = int(rango.group(1)) if rango else 0
+            if self.siempre_416 or inicio >= len(cuerpo):
+                peticion["estado"] = 416
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {inicio}-{len(cuerpo) - 1}/{len(cuerpo)}")
+            cuerpo, peticion["estado"] = cuerpo[inicio:], 206
+        else:
+            self.send_response(200)
+            peticion["estado"] = 200
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", ultima_modificacion)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        if codificacion != "identity":
+            self.send_header("Content-Encoding", codificacion)
+        self.end_headers()
+
+        if self.cortar_tras is not None:
+            # Corte de conexión a mitad de la transferencia (una sola vez)
+            cuerpo, type(self).cortar_tras = cuerpo[:self.cortar_tras], None
+            self.close_connection = True
+        self.wfile.write(cuerpo)
+        peticion["bytes"] = len(cuerpo)
+
+
+@pytest.fixture
+def servidor():
+    manejador = type("Servidor", (ServidorOWID,), {
+        "contenido": generar_owid(n_paises=5, n_dias=200).to_csv(index=False).encode(), "peticiones": [],
+    })
+    http = ThreadingHTTPServer(("127.0.0.1", 0), manejador)
+    hilo = threading.Thread(target=http.serve_forever, daemon=True)
+    hilo.start()
+    manejador.url = f"http://127.0.0.1:{http.server_address[1]}/owid-covid-data.csv"
+    yield manejador
+    http.shutdown()
+    http.server_close()
+
+
+def _leer(ruta):
+    with open(ruta, "rb") as f:
+        return f.read()
+
+
+def test_archivo_sin_cambios_no_se_transfiere(servidor, tmp_path):
+    destino = str(tmp_path / "data" / "covid.csv")
+
+    primera = descargar_condicional(servidor.url, destino)
+    segunda = descargar_condicional(servidor.url, destino)
+
+    assert primera["estado"] == "descargado" and primera["bytes_transferidos"] == len(servidor.contenido)
+    assert _leer(destino) == servidor.contenido
+    assert segunda["estado"] == "sin_cambios" and segunda["bytes_transferidos"] == 0
+    ultima = servidor.peticiones[-1]
+    assert ultima["estado"] == 304 and ultima["cabeceras"]["If-None-Match"] == '"v1"'
+    assert ultima["cabeceras"]["If-Modified-Since"] == "Mon, 01 Feb 2021 00:00:00 GMT"
+
+
+def test_archivo_nuevo_en_el_servidor(servidor, tmp_path):
+    destino = str(tmp_path / "covid.csv")
+    descargar_condicional(servidor.url, destino)
+
+    servidor.contenido, servidor.version = servidor.contenido + b"Ecuador,2021-01-01\n", 2
+    resumen = descargar_condicional(servidor.url, destino)
+
+    assert resumen["estado"] == "descargado" and resumen["etag"] == '"v2"'
+    assert _leer(destino) == servidor.contenido
+
+
+@pytest.mark.parametrize("usar_gzip", [False, True])
+def test_reanuda_una_transferencia_interrumpida(servidor, tmp_path, usar_gzip):
+    servidor.usar_gzip = usar_gzip
+    transferido = len(gzip.compress(servidor.contenido, mtime=0)) if usar_gzip else len(servidor.contenido)
+    servidor.cortar_tras = transferido // 3
+    destino = str(tmp_path / "covid.csv")
+
+    with pytest.raises(Exception):
+        descargar_condicional(servidor.url, destino, tamano_bloque=4096)
+    assert not os.path.exists(destino)
+    assert os.path.getsize(destino + SUFIJO_PARCIAL) == transferido // 3
+
+    resumen = descargar_condicional(servidor.url, destino, tamano_bloque=4096)
+
+    assert resumen["estado"] == "reanudado"
+    assert servidor.peticiones[-1]["cabeceras"]["Range"] == f"bytes={transferido // 3}-"
+    assert resumen["bytes_transferidos"] == transferido - transferido // 3
+    assert _leer(destino) == servidor.contenido
+    assert not os.path.exists(destino + SUFIJO_PARCIAL)
+
+
+def test_parcial_obsoleta_se_descarta(servidor, tmp_path):
+    servidor.cortar_tras = 1000
+    destino = str(tmp_path / "covid.csv")
+    with pytest.raises(Exception):
+        descargar_condicional(servidor.url, destino)
+
+    # El archivo cambió entre el corte y el reintento: If-Range no coincide y llega completo
+    servidor.contenido, servidor.version = servidor.contenido.replace(b"Ecuador", b"Ecuadorr"), 2
+    resumen = descargar_condicional(servidor.url, destino)
+
+    assert servidor.peticiones[-1]["cabeceras"]["If-Range"] == '"v1"' and servidor.peticiones[-1]["estado"] == 200
+    assert resumen["estado"] == "descargado"
+    assert _leer(destino) == servidor.contenido
+
+
+def test_rango_invalido_reintenta_una_sola_vez(servidor, tmp_path):
+    # Un servidor que responde 416 aun sin Range: se descarta la parte (aunque ya
+    # no exista) y se reintenta una vez, sin recursión infinita
+    servidor.cortar_tras = 1000
+    destino = str(tmp_path / "covid.csv")
+    with pytest.raises(Exception):
+        descargar_condicional(servidor.url, destino)
+    os.remove(destino + SUFIJO_PARCIAL)
+    servidor.siempre_416 = True
+    antes = len(servidor.peticiones)
+
+    with pytest.raises(requests.HTTPError, match="416"):
+        descargar_condicional(servidor.url, destino)
+
+    assert [p["estado"] for p in servidor.peticiones[antes:]] == [416, 416]
+    assert "Range" not in servidor.peticiones[-1]["cabeceras"]
+
+
+def test_transferencia_comprimida(servidor, tmp_path):
+    servidor.usar_gzip = True
+    destino = str(tmp_path / "covid.csv")
+
+    resumen = descargar_condicional(servidor.url, destino, tamano_bloque=4096)
+
+    assert resumen["codificacion"] == "gzip"
+    assert resumen["bytes_transferidos"] < len(servidor.contenido) / 2
+    assert _leer(destino) == servidor.contenido
+
+
+def test_asset_fuente_owid(servidor, tmp_path):
+    destino = str(tmp_path / "covid.csv")
+    configuracion = {"ops": {"fuente_owid": {"config": {"url": servidor.url, "ruta": destino}}}}
+
+    resultados = [materialize([fuente_owid], run_config=configuracion) for _ in range(2)]
+
+    metadata = [r.asset_materializations_for_node("fuente_owid")[0].metadata for r in resultados]
+    assert [m["estado"].value for m in metadata] == ["descargado", "sin_cambios"]
+    assert "tiempo_s" in metadata[0]
+    assert resultados[1].asset_materializations_for_node("fuente_owid")[0].tags["dagster/data_version"] == '"v1"'
@@ -0,0 +1,24 @@
+from dagster import DagsterInstance, in_process_executor
+
+from pipeline_covid_tests.datos_sinteticos import escribir_csv_pipeline, generar_owid
+
+
+def obtener_job():
+    from pipeline_covid.definitions import defs
+    return defs.resolve_job_def("pipeline_completo")
+
+
+def test_pipeline_completo_en_proceso(tmp_path, monkeypatch):
+    escribir_csv_pipeline(tmp_path, generar_owid(n_paises=3, n_dias=60))
+    monkeypatch.chdir(tmp_path)
+    job = obtener_job()
+
+    with DagsterInstance.ephemeral() as instancia:
+        resultado = job.execute_in_process(
+            instance=instancia, run_config={"resources": {"paises": {"config": {"paises": ["todos"]}}}},
+        )
+
+    assert job.executor_def is in_process_executor
+    assert resultado.success
+    pasos = {evento.step_key for evento in resultado.all_events if evento.step_key}
+    assert {"metricas", "reporte_excel_covid", "indice_metricas"} <= pasos
@@ -0,0 +1,65 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from pipeline_covid.assets import calcular_con_motor, leer_csv_optimizado, datos_procesados
+from pipeline_covid.recursos import MotorCalculo, PaisesObjetivo
+from pipeline_covid_tests.datos_sinteticos import generar_owid
+
+
+def factor_crec_referencia(datos: pd.DataFrame) -> pd.DataFrame:
+    """Implementación original (bucle por país + iterrows) sobre el calendario diario, usada como referencia"""
+    df = datos.sort_values(['location', 'date'])
+    resultados = []
+    for pais in df['location'].unique():
+        # asfreq('D'): los días sin registro entran como NaN, la ventana es de 7 días
+        pais_data = df[df['location'] == pais].set_index('date').asfreq('D')
+        actual = pais_data['new_cases'].rolling(window=7, min_periods=7).sum()
+        previa = actual.shift(7)
+        factor = actual / previa
+        completos = pd.DataFrame({'a': actual, 'p': previa, 'f': factor}).dropna()
+        for fecha, row in completos.iterrows():
+            resultados.append({
+                'semana_fin': fecha,
+                'pais': pais,
+                'casos_semana': int(row['a']),
+                'factor_crec_7d': round(row['f'], 3)
+            })
+    return pd.DataFrame(resultados)
+
+
+def _datos_procesados(n_paises, n_dias, tmp_path):
+    ruta = tmp_path / f"covid_{n_paises}.csv"
+    generar_owid(n_paises=n_paises, n_dias=n_dias).to_csv(ruta, index=False)
+    crudo = leer_csv_optimizado(str(ruta), None)
+    return datos_procesados(leer_datos=crudo, motor=MotorCalculo(), paises=PaisesObjetivo(paises=["todos"]))
+
+
+def test_factor_vectorizado_igual_a_referencia(tmp_path):
+    datos = _datos_procesados(6, 120, tmp_path)
+
+    esperado = factor_crec_referencia(datos)
+    obtenido = calcular_con_motor(["factor_crec_7d"], datos, MotorCalculo())["factor_crec_7d"]
+
+    assert list(obtenido.columns) == ['semana_fin', 'pais', 'casos_semana', 'factor_crec_7d']
+    assert obtenido['pais'].dtype == datos['location'].dtype
+    pd.testing.assert_frame_equal(obtenido.assign(pais=obtenido['pais'].astype(str)), esperado, check_dtype=False)
+
+
+@pytest.mark.skipif(not os.environ.get("COVID_BENCH"), reason="benchmark: exportar COVID_BENCH=1")
+@pytest.mark.parametrize("n_paises", [2, 50, 250])
+def test_benchmark_factor_crec(n_paises, tmp_path):
+    datos = _datos_procesados(n_paises, 1000, tmp_path)
+
+    inicio = time.perf_counter()
+    factor_crec_referencia(datos)
+    t_referencia = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    calcular_con_motor(["factor_crec_7d"], datos, MotorCalculo())
+    t_vectorizado = time.perf_counter() - inicio
+
+    print(f"\n{n_paises} países: iterrows {t_referencia:.3f}s | vectorizado {t_vectorizado:.3f}s "
+          f"| x{t_referencia / t_vectorizado:.1f}")
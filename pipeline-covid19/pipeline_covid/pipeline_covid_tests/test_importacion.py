@@ -0,0 +1,42 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pipeline_covid
+
+# Lo que cuesta cargar la code location además de importar dagster (ms); antes
+# de importar las librerías pesadas de forma perezosa eran unos 500 ms
+PRESUPUESTO_MS = 250
+
+# No se importan al cargar definitions.py, solo al ejecutar los assets
+MODULOS_PESADOS = ["pandas", "numpy", "pyarrow", "requests", "upath", "openpyxl", "duckdb"]
+
+
+def _importar_definiciones():
+    """Importar definitions.py en un proceso nuevo con -X importtime"""
+    codigo = (
+        "import json, sys; import pipeline_covid.definitions; "
+        f"print(json.dumps([m for m in {MODULOS_PESADOS!r} if m in sys.modules]))"
+    )
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(pipeline_covid.__file__)))
+    entorno = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [raiz, os.environ.get("PYTHONPATH")]))}
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo],
+                             capture_output=True, text=True, env=entorno, check=True)
+
+    # "import time: self [us] | cumulative | modulo": tiempo acumulado de cada módulo
+    acumulado = {}
+    for linea in proceso.stderr.splitlines():
+        coincidencia = re.match(r"import time:\s+\d+ \|\s+(\d+) \|\s*(\S+)$", linea)
+        if coincidencia:
+            acumulado.setdefault(coincidencia.group(2), int(coincidencia.group(1)))
+    return json.loads(proceso.stdout), acumulado
+
+
+def test_definiciones_sin_librerias_pesadas():
+    cargados, acumulado = _importar_definiciones()
+
+    assert cargados == []
+    extra_ms = (acumulado["pipeline_covid.definitions"] - acumulado["dagster"]) / 1000
+    assert extra_ms < PRESUPUESTO_MS, f"definitions.py cuesta {extra_ms:.0f} ms además de dagster"
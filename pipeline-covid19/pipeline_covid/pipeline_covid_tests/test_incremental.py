@@ -0,0 +1,179 @@
+import math
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline_covid import incremental
+from pipeline_covid.assets import calcular_con_motor, calcular_incidencia_7d, calcular_factor_crec_7d
+from pipeline_covid.incremental import actualizar_metrica, leer_resultado, EstadoPais
+from pipeline_covid.recursos import MotorCalculo
+from pipeline_covid_tests.datos_sinteticos import compactar_metricas, generar_owid
+
+
+def test_estado_pais_mantiene_sumas_de_dos_semanas():
+    estado = EstadoPais()
+    for dia in range(20):
+        estado.agregar(f"2021-01-{dia + 1:02d}", float(dia))
+    assert estado.semanas() == (sum(range(13, 20)), sum(range(6, 13)))
+    assert len(estado.casos) == 14
+
+
+def test_estado_pais_cuenta_dias_de_calendario():
+    estado = EstadoPais()
+    for dia in [1, 2, 3, 5, 6, 7, 8]:
+        estado.agregar(f"2021-01-{dia:02d}", 10.0)
+
+    # 7 registros pero 8 días: el 4 falta, la semana no está completa
+    assert math.isnan(estado.casos[3])
+    assert estado.semanas() == (None, None)
+    assert estado.incidencia(100000) == 10.0
+
+
+def test_incremental_igual_a_recalculo_completo(tmp_path):
+    actualizado = compactar_metricas(generar_owid(n_paises=3, n_dias=75))
+    historia = actualizado[actualizado['date'] < actualizado['date'].min() + pd.Timedelta(days=60)]
+    for nombre, calcular in [("incidencia_7d", calcular_incidencia_7d), ("factor_crec_7d", calcular_factor_crec_7d)]:
+        _, resumen = actualizar_metrica(nombre, historia, str(tmp_path), calcular)
+        assert resumen["modo"] == "completo"
+
+        filas, resumen = actualizar_metrica(nombre, actualizado, str(tmp_path), calcular, verificar=True)
+        assert resumen["modo"] == "incremental"
+        assert resumen["filas_nuevas"] == len(actualizado) - len(historia)
+        assert resumen["verificado"]
+        completo = calcular(actualizado)
+        pd.testing.assert_frame_equal(leer_resultado(str(tmp_path), nombre, completo), completo, check_exact=True)
+        # Solo las filas de las fechas nuevas, con los dtypes de la salida completa
+        nuevas = completo[completo.iloc[:, 0] >= historia['date'].max() + pd.Timedelta(days=1)]
+        pd.testing.assert_frame_equal(filas, nuevas.reset_index(drop=True), check_exact=True)
+
+
+def test_historia_modificada_fuerza_recalculo(tmp_path):
+    historia = compactar_metricas(generar_owid(n_paises=3, n_dias=60))
+    actualizar_metrica("incidencia_7d", historia, str(tmp_path), calcular_incidencia_7d)
+
+    revisado = historia.drop(index=5).reset_index(drop=True)
+    resultado, resumen = actualizar_metrica("incidencia_7d", revisado, str(tmp_path), calcular_incidencia_7d)
+
+    assert resumen["modo"] == "completo"
+    pd.testing.assert_frame_equal(resultado, calcular_incidencia_7d(revisado))
+
+
+def _revisar(datos, dia, casos=500):
+    """Copia de los datos con los casos de un día del primer país revisados"""
+    revisado = datos.copy()
+    fila = (revisado['location'] == revisado['location'].iloc[0]) & \
+        (revisado['date'] == revisado['date'].min() + pd.Timedelta(days=dia))
+    revisado.loc[fila, 'new_cases'] += casos
+    return revisado
+
+
+def test_valor_revisado_fuerza_recalculo(tmp_path):
+    # OWID revisa casos ya publicados dentro de la cola: mismo número de registros, otro valor
+    actualizado = compactar_metricas(generar_owid(n_paises=3, n_dias=75))
+    historia = actualizado[actualizado['date'] < actualizado['date'].min() + pd.Timedelta(days=60)]
+    revisado = _revisar(actualizado, dia=55)
+    for nombre, calcular in [("incidencia_7d", calcular_incidencia_7d), ("factor_crec_7d", calcular_factor_crec_7d)]:
+        actualizar_metrica(nombre, historia, str(tmp_path), calcular)
+
+        resultado, resumen = actualizar_metrica(nombre, revisado, str(tmp_path), calcular)
+
+        assert resumen["modo"] == "completo"
+        pd.testing.assert_frame_equal(resultado, calcular(revisado), check_exact=True)
+
+
+def test_valor_revisado_fuera_de_la_cola_lo_corrige_verificar(tmp_path):
+    # Un valor anterior a la cola no se detecta; verificar=True compara y se queda con el completo
+    actualizado = compactar_metricas(generar_owid(n_paises=3, n_dias=75))
+    historia = actualizado[actualizado['date'] < actualizado['date'].min() + pd.Timedelta(days=60)]
+    revisado = _revisar(actualizado, dia=20)
+    actualizar_metrica("incidencia_7d", historia, str(tmp_path), calcular_incidencia_7d)
+
+    resultado, resumen = actualizar_metrica("incidencia_7d", revisado, str(tmp_path), calcular_incidencia_7d,
+                                            verificar=True)
+
+    assert resumen["modo"] == "incremental" and not resumen["verificado"]
+    completo = calcular_incidencia_7d(revisado)
+    pd.testing.assert_frame_equal(resultado, completo, check_exact=True)
+    pd.testing.assert_frame_equal(leer_resultado(str(tmp_path), "incidencia_7d", completo), completo, check_exact=True)
+
+
+def _no_leer(*args, **kwargs):
+    raise AssertionError("una actualización incremental no debe leer los segmentos guardados")
+
+
+@pytest.mark.parametrize("nombre, calcular", [("incidencia_7d", calcular_incidencia_7d),
+                                              ("factor_crec_7d", calcular_factor_crec_7d)])
+def test_trabajo_por_actualizacion_no_crece_con_la_historia(tmp_path, monkeypatch, nombre, calcular):
+    # Un registro nuevo por país sobre 60 o sobre 240 días de historia: solo se
+    # verifica la cola de cada país, solo se escriben las filas nuevas y no se
+    # leen los segmentos anteriores
+    resumenes = []
+    for n_dias in (60, 240):
+        actualizado = compactar_metricas(generar_owid(n_paises=3, n_dias=n_dias))
+        historia = actualizado.drop(actualizado.groupby('location', observed=True).tail(1).index)
+        directorio = str(tmp_path / str(n_dias))
+        actualizar_metrica(nombre, historia, directorio, calcular)
+
+        with monkeypatch.context() as parche:
+            parche.setattr(incremental, "leer_segmentos", _no_leer)
+            filas, resumen = actualizar_metrica(nombre, actualizado, directorio, calcular)
+
+        assert resumen["modo"] == "incremental" and len(filas) <= 3
+        completo = calcular(actualizado)
+        pd.testing.assert_frame_equal(leer_resultado(directorio, nombre, completo), completo, check_exact=True)
+        resumenes.append(resumen)
+
+    corto, largo = resumenes
+    for resumen in resumenes:
+        assert resumen["filas_nuevas"] == 3
+        assert resumen["filas_verificadas"] <= 3 * 14
+        assert resumen["filas_escritas"] <= 3
+    assert largo["bytes_escritos"] < 1.2 * corto["bytes_escritos"]
+
+
+def test_segmentos_se_compactan(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, "MAX_SEGMENTOS", 3)
+    actualizado = compactar_metricas(generar_owid(n_paises=3, n_dias=70))
+    fin = actualizado['date'].min() + pd.Timedelta(days=60)
+    for dia in range(10):
+        datos = actualizado[actualizado['date'] < fin + pd.Timedelta(days=dia)]
+        actualizar_metrica("incidencia_7d", datos, str(tmp_path), calcular_incidencia_7d)
+        completo = calcular_incidencia_7d(datos)
+        pd.testing.assert_frame_equal(leer_resultado(str(tmp_path), "incidencia_7d", completo), completo,
+                                      check_exact=True)
+
+    assert len(os.listdir(tmp_path / "incidencia_7d")) <= 3
+
+
+def test_semana_previa_sin_casos_igual_a_recalculo_completo(tmp_path):
+    actualizado = compactar_metricas(generar_owid(n_paises=3, n_dias=75))
+    ecuador = actualizado['location'] == 'Ecuador'
+    # Dos semanas sin casos (factor 0/0) seguidas de casos (factor x/0 = inf)
+    sin_casos = ecuador & actualizado['date'].between(
+        actualizado['date'].min() + pd.Timedelta(days=50), actualizado['date'].min() + pd.Timedelta(days=63)
+    )
+    actualizado.loc[sin_casos, 'new_cases'] = 0
+    historia = actualizado[actualizado['date'] < actualizado['date'].min() + pd.Timedelta(days=60)]
+    actualizar_metrica("factor_crec_7d", historia, str(tmp_path), calcular_factor_crec_7d)
+
+    filas, resumen = actualizar_metrica("factor_crec_7d", actualizado, str(tmp_path), calcular_factor_crec_7d)
+
+    assert resumen["modo"] == "incremental"
+    assert math.isinf(filas['factor_crec_7d'].max())
+    completo = calcular_factor_crec_7d(actualizado)
+    pd.testing.assert_frame_equal(leer_resultado(str(tmp_path), "factor_crec_7d", completo), completo,
+                                  check_exact=True)
+
+
+def test_motor_incremental_entrega_la_vista_completa(tmp_path):
+    actualizado = compactar_metricas(generar_owid(n_paises=3, n_dias=75))
+    historia = actualizado[actualizado['date'] < actualizado['date'].min() + pd.Timedelta(days=60)]
+    motor = MotorCalculo(motor="incremental", directorio_estado=str(tmp_path))
+    nombres = ["incidencia_7d", "factor_crec_7d"]
+
+    calcular_con_motor(nombres, historia, motor)
+    resultados = calcular_con_motor(nombres, actualizado, motor)
+
+    for nombre, calcular in [("incidencia_7d", calcular_incidencia_7d), ("factor_crec_7d", calcular_factor_crec_7d)]:
+        pd.testing.assert_frame_equal(resultados[nombre], calcular(actualizado), check_exact=True)
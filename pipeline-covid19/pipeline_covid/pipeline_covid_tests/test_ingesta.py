@@ -0,0 +1,116 @@
+import gzip
+import os
+import time
+
+import pandas as pd
+import pytest
+from dagster import materialize
+
+from pipeline_covid.assets import leer_datos
+from pipeline_covid.ingesta import leer_snapshots, listar_snapshots
+from pipeline_covid.recursos import MotorCalculo, PaisesObjetivo
+from pipeline_covid_tests.datos_sinteticos import generar_owid
+
+
+def _snapshot(carpeta, nombre, datos):
+    """Escribir un snapshot como .csv o .csv.gz según el nombre"""
+    ruta = str(carpeta / nombre)
+    if nombre.endswith(".gz"):
+        with gzip.open(ruta, "wt", newline="") as f:
+            datos.to_csv(f, index=False)
+    else:
+        datos.to_csv(ruta, index=False)
+    return ruta
+
+
+def _archivo(n_snapshots, n_paises, n_dias, carpeta):
+    """Snapshots diarios: cada uno agrega un día y corrige los casos del anterior"""
+    completo = generar_owid(n_paises=n_paises, n_dias=n_dias + n_snapshots)
+    rutas = []
+    for i in range(n_snapshots):
+        fechas = sorted(completo['date'].unique())[:n_dias + i]
+        snapshot = completo[completo['date'].isin(fechas)].copy()
+        snapshot['new_cases'] = snapshot['new_cases'] + i
+        extension = ".csv.gz" if i % 2 else ".csv"
+        rutas.append(_snapshot(carpeta, f"owid-covid-data-2021-05-{i + 1:02d}{extension}", snapshot))
+    return rutas
+
+
+def _referencia_pandas(rutas):
+    """Lo que había que hacer antes: read_csv archivo por archivo y quedarse con el último"""
+    unidos = pd.concat([pd.read_csv(ruta) for ruta in rutas], ignore_index=True)
+    return (unidos.drop_duplicates(['location', 'date'], keep='last')
+            .sort_values(['location', 'date']).reset_index(drop=True))
+
+
+def test_listar_por_carpeta_glob_y_fecha_del_nombre(tmp_path):
+    datos = generar_owid(n_paises=1, n_dias=3)
+    _snapshot(tmp_path, "covid_20210510.csv.gz", datos)
+    _snapshot(tmp_path, "owid-covid-data-2021-05-02.csv", datos)
+    (tmp_path / "notas.txt").write_text("no es un snapshot")
+
+    nombres = [os.path.basename(ruta) for ruta in listar_snapshots(str(tmp_path))]
+    assert nombres == ["owid-covid-data-2021-05-02.csv", "covid_20210510.csv.gz"]
+    assert listar_snapshots(str(tmp_path / "*.gz")) == [str(tmp_path / "covid_20210510.csv.gz")]
+    with pytest.raises(FileNotFoundError):
+        listar_snapshots(str(tmp_path / "*.parquet"))
+
+
+def test_gana_el_snapshot_mas_reciente(tmp_path):
+    base = pd.DataFrame({
+        'location': ['Ecuador', 'Ecuador', 'Peru'],
+        'date': ['2021-01-01', '2021-01-02', '2021-01-01'],
+        'new_cases': [1.0, 2.0, 3.0],
+    })
+    corregido = base.iloc[[1, 2]].assign(new_cases=[20.0, 30.0], people_vaccinated=[5.0, None])
+    # El nombre decide el orden aunque el archivo antiguo se haya escrito después
+    _snapshot(tmp_path, "owid-2021-01-03.csv.gz", corregido)
+    _snapshot(tmp_path, "owid-2021-01-02.csv", base)
+
+    tabla = leer_snapshots(listar_snapshots(str(tmp_path)), 'location', 'date', hilos=2).to_pandas()
+
+    assert tabla['new_cases'].tolist() == [1.0, 20.0, 30.0]
+    # Columna que el snapshot antiguo no tenía: nula en sus filas
+    assert tabla['people_vaccinated'].isna().tolist() == [True, False, True]
+    with pytest.raises(ValueError):
+        leer_snapshots(listar_snapshots(str(tmp_path)), 'location', 'date', hilos=0)
+
+
+def test_igual_que_leer_con_pandas_uno_por_uno(tmp_path):
+    rutas = _archivo(n_snapshots=5, n_paises=4, n_dias=30, carpeta=tmp_path)
+
+    tabla = leer_snapshots(listar_snapshots(str(tmp_path)), 'location', 'date').to_pandas()
+
+    pd.testing.assert_frame_equal(tabla, _referencia_pandas(rutas), check_dtype=False)
+
+
+def test_leer_datos_con_snapshots(tmp_path):
+    rutas = _archivo(n_snapshots=3, n_paises=4, n_dias=20, carpeta=tmp_path)
+    referencia = _referencia_pandas(rutas)
+
+    resultado = materialize(
+        [leer_datos], resources={"paises": PaisesObjetivo(paises=["Ecuador", "Peru"]), "motor": MotorCalculo()},
+        run_config={"ops": {"leer_datos": {"config": {"snapshots": str(tmp_path / "owid-*"), "hilos_lectura": 2}}}},
+    )
+
+    df = resultado.output_for_node("leer_datos")
+    esperado = referencia[referencia['location'].isin(["Ecuador", "Peru"])].reset_index(drop=True)
+    assert isinstance(df['location'].dtype, pd.CategoricalDtype)
+    assert df['date'].max() == pd.Timestamp(esperado['date'].max())
+    pd.testing.assert_series_equal(df['new_cases'].astype('float64'), esperado['new_cases'])
+
+
+@pytest.mark.skipif(not os.environ.get("COVID_BENCH"), reason="benchmark: exportar COVID_BENCH=1")
+def test_benchmark_snapshots_vs_pandas(tmp_path):
+    rutas = _archivo(n_snapshots=8, n_paises=200, n_dias=500, carpeta=tmp_path)
+
+    inicio = time.perf_counter()
+    _referencia_pandas(rutas)
+    t_pandas = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    leer_snapshots(listar_snapshots(str(tmp_path)), 'location', 'date')
+    t_arrow = time.perf_counter() - inicio
+
+    print(f"\n{len(rutas)} snapshots, núcleos {os.cpu_count()}: pandas uno por uno {t_pandas:.3f}s | "
+          f"Arrow en paralelo {t_arrow:.3f}s | x{t_pandas / t_arrow:.1f}")
@@ -0,0 +1,174 @@
+import inspect
+import logging
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pyarrow as pa
+from dagster import AssetCheckResult, DagsterInstance, execute_job, reconstructable
+
+from pipeline_covid.instrumentacion import _rss_actual_mb, configurar_logging, instrumentar, medir, tamano
+from pipeline_covid_tests.datos_sinteticos import escribir_csv_pipeline, generar_owid
+
+
+def obtener_job():
+    from pipeline_covid.definitions import defs
+    return defs.resolve_job_def("pipeline_completo")
+
+
+def test_medir_filas_y_bytes():
+    entrada = pd.DataFrame({'a': [1.0, 2.0, 3.0]})
+
+    with medir("paso", (entrada, pa.table({'b': [1, 2]}), "no es tabla")) as medicion:
+        medicion["salida"] = entrada.head(1)
+
+    assert medicion["filas_entrada"] == 5
+    assert medicion["bytes_entrada"] == tamano(entrada)[1] + 16
+    assert medicion["filas_salida"] == 1
+    assert medicion["tiempo_s"] >= 0 and medicion["cpu_s"] >= 0
+    assert "memoria_incremento_mb" in medicion and "memoria_pico_mb" in medicion
+    assert "memoria_pico_asignada_mb" not in medicion
+
+
+def test_bytes_cuentan_el_contenido_de_las_columnas_de_texto():
+    # deep=True: el texto de cada fila, no solo los punteros de la columna object
+    corto = pd.DataFrame({'pais': ['a'] * 1000})
+    largo = pd.DataFrame({'pais': ['a' * 200] * 1000})
+
+    assert tamano(largo)[1] - tamano(corto)[1] >= 199 * 1000
+
+
+def _tocar(megas):
+    bloque = bytearray(megas * 1024 ** 2)
+    bloque[::4096] = b"x" * len(bloque[::4096])
+    return bloque
+
+
+def test_pico_de_memoria_sin_tracemalloc():
+    # Memoria reservada y liberada dentro del paso: el incremento no la ve, el pico sí
+    antes = _rss_actual_mb()
+    with medir("paso") as medicion:
+        bloque = _tocar(60)
+        del bloque
+
+    assert medicion["memoria_incremento_mb"] < 20
+    assert medicion["memoria_pico_mb"] >= antes + 55
+
+
+def test_pico_de_un_paso_anidado_llega_al_de_afuera():
+    with medir("afuera") as afuera:
+        bloque = _tocar(60)
+        del bloque
+        with medir("adentro") as adentro:
+            pass
+
+    assert afuera["memoria_pico_mb"] >= adentro["memoria_pico_mb"] + 40
+
+
+def test_memoria_del_paso_no_del_proceso():
+    # Un pico anterior no se arrastra a los pasos siguientes
+    with medir("grande") as grande:
+        bloque = bytearray(50 * 1024 ** 2)
+        bloque[::4096] = b"x" * len(bloque[::4096])
+    with medir("pequeno") as pequeno:
+        del bloque
+
+    assert grande["memoria_incremento_mb"] >= 40
+    assert pequeno["memoria_incremento_mb"] <= 0
+
+
+def test_tracemalloc_y_perfil(tmp_path, monkeypatch):
+    monkeypatch.setenv("PIPELINE_COVID_TRACEMALLOC", "1")
+    monkeypatch.setenv("PIPELINE_COVID_PERFIL", str(tmp_path))
+
+    with medir("paso") as medicion:
+        bloque = bytearray(20 * 1024 ** 2)
+    del bloque
+
+    assert medicion["memoria_pico_asignada_mb"] >= 20
+    assert os.path.exists(medicion["perfil"]) and medicion["perfil"].endswith(".prof")
+
+
+def test_decorador_conserva_firma_y_resultados(caplog):
+    @instrumentar
+    def asset_directo(datos: pd.DataFrame, factor: int = 2) -> pd.DataFrame:
+        return datos * factor
+
+    @instrumentar
+    def chequeos(datos):
+        yield AssetCheckResult(check_name="uno", passed=True, metadata={"propio": 1})
+        yield AssetCheckResult(check_name="dos", passed=False)
+
+    datos = pd.DataFrame({'a': [1, 2]})
+    with caplog.at_level(logging.INFO, logger="pipeline_covid"):
+        # Invocación directa: sin contexto de Dagster se devuelve el valor tal cual
+        assert asset_directo(datos, factor=3)['a'].tolist() == [3, 6]
+        resultados = list(chequeos(datos))
+
+    assert asset_directo.__name__ == "asset_directo"
+    assert list(inspect.signature(asset_directo).parameters) == ["datos", "factor"]
+    assert [r.check_name for r in resultados] == ["uno", "dos"]
+    assert resultados[0].metadata["propio"].value == 1
+    assert all(r.metadata["filas_entrada"].value == 2 for r in resultados)
+    assert "paso=asset_directo" in caplog.text and "filas_salida=2" in caplog.text
+
+
+def test_checks_que_hacen_yield_entregan_cada_resultado_en_cuanto_sale(caplog):
+    producidos = []
+
+    @instrumentar
+    def chequeos():
+        for nombre in ("uno", "dos"):
+            producidos.append(nombre)
+            yield AssetCheckResult(check_name=nombre, passed=True)
+
+    with caplog.at_level(logging.INFO, logger="pipeline_covid"):
+        generador = chequeos()
+        primero = next(generador)
+        assert producidos == ["uno"] and "paso=chequeos" not in caplog.text
+        resto = list(generador)
+
+    assert primero.check_name == "uno" and "tiempo_s" in primero.metadata
+    assert [r.check_name for r in resto] == ["dos"]
+    assert "paso=chequeos" in caplog.text
+
+
+def test_logging_desactivable():
+    raiz = configurar_logging("OFF")
+    try:
+        assert not raiz.isEnabledFor(logging.CRITICAL)
+        assert len(configurar_logging("DEBUG").handlers) == len(raiz.handlers)
+    finally:
+        configurar_logging("INFO")
+
+
+def test_importar_no_configura_logging():
+    codigo = ("import logging, pipeline_covid.instrumentacion; "
+              "print(len(logging.getLogger('pipeline_covid').handlers))")
+    salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True,
+                            env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+
+    assert salida.stdout.strip() == "0"
+
+
+def test_metadata_en_materializaciones_y_chequeos(tmp_path, monkeypatch):
+    escribir_csv_pipeline(tmp_path, generar_owid(n_paises=3, n_dias=60))
+    monkeypatch.chdir(tmp_path)
+    run_config = {"resources": {"paises": {"config": {"paises": ["todos"]}}}}
+
+    with DagsterInstance.ephemeral() as instancia:
+        resultado = execute_job(reconstructable(obtener_job), instance=instancia, run_config=run_config)
+        materializaciones = {
+            evento.materialization.asset_key.to_user_string(): evento.materialization.metadata
+            for evento in resultado.get_asset_materialization_events()
+        }
+        chequeos = resultado.get_asset_check_evaluations()
+
+    assert resultado.success
+    assert materializaciones["datos_procesados"]["filas_entrada"].value == 180
+    assert materializaciones["metrica_incidencia_7d"]["filas_salida"].value > 0
+    assert all({"tiempo_s", "cpu_s", "memoria_incremento_mb", "memoria_pico_mb"} <= set(metadata)
+               for metadata in materializaciones.values())
+    assert len(chequeos) == 5
+    assert all("tiempo_s" in chequeo.metadata for chequeo in chequeos)
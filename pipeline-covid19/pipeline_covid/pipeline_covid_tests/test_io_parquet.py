@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+from dagster import build_input_context, build_output_context
+from upath import UPath
+
+from pipeline_covid.io_parquet import ArrowIOManager
+from pipeline_covid.assets import compactar_tipos, resolver_columnas
+from pipeline_covid_tests.datos_sinteticos import generar_owid
+
+
+def _guardar_y_cargar(tmp_path, formato, obj, columnas=None):
+    manager = ArrowIOManager(base_path=UPath(tmp_path), formato=formato)
+    manager.handle_output(build_output_context(asset_key="datos_procesados"), obj)
+    metadata = {"columnas": columnas} if columnas is not None else None
+    contexto = build_input_context(asset_key="datos_procesados", definition_metadata=metadata)
+    return manager.load_input(contexto)
+
+
+@pytest.mark.parametrize("formato", ["arrow", "parquet"])
+def test_ida_y_vuelta_conserva_tipos(tmp_path, formato):
+    crudo = generar_owid(n_paises=3, n_dias=40)
+    df = compactar_tipos(crudo, resolver_columnas(crudo.columns))
+
+    cargado = _guardar_y_cargar(tmp_path, formato, df)
+
+    pd.testing.assert_frame_equal(cargado, df)
+
+
+@pytest.mark.parametrize("formato", ["arrow", "parquet"])
+def test_proyeccion_de_columnas(tmp_path, formato):
+    df = generar_owid(n_paises=2, n_dias=20)
+
+    # 'country' no existe en el archivo y se ignora; se respeta el orden del archivo
+    cargado = _guardar_y_cargar(tmp_path, formato, df, ['new_cases', 'country', 'location'])
+
+    assert list(cargado.columns) == ['location', 'new_cases']
+    pd.testing.assert_frame_equal(cargado, df[['location', 'new_cases']])
+
+
+def test_objetos_no_tabulares_se_guardan_con_pickle(tmp_path):
+    assert _guardar_y_cargar(tmp_path, "arrow", "output/reporte.xlsx") == "output/reporte.xlsx"
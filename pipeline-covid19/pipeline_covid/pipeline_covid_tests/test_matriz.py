@@ -0,0 +1,144 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline_covid.assets import (
+    calcular_incidencia_7d, calcular_incidencia_7d_pandas,
+    calcular_factor_crec_7d, calcular_factor_crec_7d_pandas,
+)
+from pipeline_covid.matriz import MatrizCasos
+from pipeline_covid.metricas import calcular_metricas
+from pipeline_covid_tests.datos_sinteticos import generar_compacto
+
+
+def _con_huecos(semilla=0, n_paises=12, n_dias=90):
+    datos = generar_compacto(n_paises=n_paises, n_dias=n_dias, semilla=semilla)
+    rng = np.random.default_rng(semilla)
+    return datos[rng.random(len(datos)) > 0.25].reset_index(drop=True)
+
+
+def test_matriz_fecha_por_pais():
+    datos = pd.DataFrame({
+        'location': ['A', 'A', 'B'],
+        'date': pd.to_datetime(['2021-01-01', '2021-01-03', '2021-01-02']),
+        'new_cases': [1.0, 3.0, 20.0],
+        'population': [100.0, 100.0, 50.0],
+    })
+
+    matriz = MatrizCasos(datos)
+
+    assert matriz.casos.dtype == np.float64 and matriz.casos.shape == (3, 2)
+    np.testing.assert_array_equal(matriz.casos, [[1, np.nan], [np.nan, 20], [3, np.nan]])
+    np.testing.assert_array_equal(matriz.poblacion, [[100, 50], [100, 50], [100, 50]])
+    np.testing.assert_array_equal(matriz.en_largo(matriz.casos), datos['new_cases'])
+
+
+def test_poblacion_vigente_en_cada_fecha():
+    # Revisión del censo a mitad de la serie: no se aplica a las fechas anteriores
+    datos = pd.DataFrame({
+        'location': ['A'] * 4,
+        'date': pd.date_range('2021-01-01', periods=4, freq='3D'),
+        'new_cases': [10.0, 10.0, 10.0, 10.0],
+        'population': [np.nan, 1000.0, np.nan, 2000.0],
+        'people_vaccinated': [1.0, 2.0, 3.0, 4.0],
+    })
+
+    matriz = MatrizCasos(datos)
+
+    np.testing.assert_array_equal(matriz.poblacion[:, 0], [1000] * 9 + [2000])
+    resultados = calcular_metricas(datos, ["incidencia_7d", "vacunacion_100"])
+    np.testing.assert_allclose(resultados["incidencia_7d"]['incidencia_7d'], [1000, 1000, 1000, 500])
+    np.testing.assert_allclose(resultados["vacunacion_100"]['vacunacion_100'], [0.1, 0.2, 0.3, 0.2])
+    # Con la población de cada registro, igual que la referencia pandas
+    validos = datos.dropna(subset=['population']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(calcular_incidencia_7d(validos), calcular_incidencia_7d_pandas(validos))
+
+
+def test_pais_con_el_mismo_dtype_en_todas_las_metricas():
+    datos = _con_huecos(3)
+    datos['people_vaccinated'] = datos['new_cases'].cumsum()
+
+    for nombre, resultado in calcular_metricas(datos).items():
+        assert resultado['pais'].dtype == datos['location'].dtype, nombre
+
+
+
+def test_casos_por_encima_de_2_24_exactos():
+    # Fila semanal de un agregado (World): float32 la redondearía a 2**24
+    casos = float(2**24 + 1)
+    datos = pd.DataFrame({
+        'location': ['World'],
+        'date': pd.to_datetime(['2022-12-25']),
+        'new_cases': [casos],
+        'population': [100000.0],
+    })
+
+    matriz = MatrizCasos(datos)
+
+    assert matriz.casos[0, 0] == casos
+    assert calcular_incidencia_7d(datos)['incidencia_7d'].tolist() == [casos]
+
+def test_fechas_repetidas():
+    datos = pd.DataFrame({
+        'location': ['A', 'A'],
+        'date': pd.to_datetime(['2021-01-01', '2021-01-01']),
+        'new_cases': [1.0, 2.0],
+        'population': [100.0, 100.0],
+    })
+
+    with pytest.raises(ValueError):
+        MatrizCasos(datos)
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_sumas_acumuladas_iguales_a_rolling_de_pandas(semilla):
+    datos = _con_huecos(semilla)
+    matriz = MatrizCasos(datos)
+
+    suma, conteo = matriz.sumas_moviles(7)
+    ventanas = datos.groupby('location', observed=True).rolling('7D', on='date', min_periods=0)['new_cases']
+
+    np.testing.assert_array_equal(matriz.en_largo(suma), ventanas.sum().to_numpy())
+    np.testing.assert_array_equal(matriz.en_largo(conteo), ventanas.count().to_numpy())
+
+
+def test_ventana_de_siete_dias_no_de_siete_filas():
+    # Reporte semanal: una fila cada 7 días
+    datos = pd.DataFrame({
+        'location': ['A'] * 4,
+        'date': pd.date_range('2021-01-03', periods=4, freq='7D'),
+        'new_cases': [70.0, 140.0, 210.0, 280.0],
+        'population': [100000.0] * 4,
+    })
+
+    # Cada ventana de 7 días ve solo su propio reporte
+    assert calcular_incidencia_7d(datos)['incidencia_7d'].tolist() == [70.0, 140.0, 210.0, 280.0]
+    assert calcular_factor_crec_7d(datos).empty
+
+
+def test_metricas_desde_la_matriz_iguales_a_pandas():
+    datos = _con_huecos(7, n_paises=30, n_dias=200)
+
+    pd.testing.assert_frame_equal(calcular_incidencia_7d(datos), calcular_incidencia_7d_pandas(datos), check_exact=True)
+    pd.testing.assert_frame_equal(calcular_factor_crec_7d(datos), calcular_factor_crec_7d_pandas(datos), check_exact=True)
+
+
+@pytest.mark.skipif(not os.environ.get("COVID_BENCH"), reason="benchmark: exportar COVID_BENCH=1")
+def test_benchmark_matriz():
+    datos = generar_compacto(n_paises=250, n_dias=1700)
+    datos['location'] = datos['location'].astype(str)
+
+    matriz = MatrizCasos(datos)
+    print(f"\n{len(datos):,} filas | formato largo {datos.memory_usage(deep=True).sum() / 1e6:.1f} MB | "
+          f"matrices {(matriz.casos.nbytes + matriz.poblacion.nbytes) / 1e6:.1f} MB")
+    for matricial, referencia in ((calcular_incidencia_7d, calcular_incidencia_7d_pandas),
+                                  (calcular_factor_crec_7d, calcular_factor_crec_7d_pandas)):
+        tiempos = []
+        for funcion in (referencia, matricial):
+            inicio = time.perf_counter()
+            funcion(datos)
+            tiempos.append(time.perf_counter() - inicio)
+        print(f"  {matricial.__name__}: pandas {tiempos[0]:.3f}s | matriz {tiempos[1]:.3f}s")
@@ -0,0 +1,60 @@
+import logging
+import tracemalloc
+
+import pytest
+
+from pipeline_covid.assets import datos_procesados, calcular_incidencia_7d
+from pipeline_covid.recursos import MotorCalculo, PaisesObjetivo
+from pipeline_covid_tests.datos_sinteticos import generar_compacto
+
+# 1.000 países x 10.000 días = 10 millones de filas (~300 MB en memoria)
+N_PAISES = 1_000
+N_DIAS = 10_000
+
+
+@pytest.fixture(scope="module")
+def datos_grandes():
+    return generar_compacto(N_PAISES, N_DIAS)
+
+
+def _pico_memoria(funcion) -> int:
+    """Pico de memoria asignada (bytes) durante la llamada, medido con tracemalloc"""
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_datos_procesados_sin_copias_completas(datos_grandes, caplog):
+    tamano_entrada = datos_grandes.memory_usage(deep=True).sum()
+
+    with caplog.at_level(logging.INFO, logger="pipeline_covid"):
+        pico = _pico_memoria(lambda: datos_procesados(
+            leer_datos=datos_grandes, motor=MotorCalculo(), paises=PaisesObjetivo(paises=["todos"])
+        ))
+
+    # Salida (~1x) + máscaras y hash de duplicados, también sin copy-on-write
+    # (pandas 2); antes, con una copia completa por paso, ~4.5x
+    assert pico < 2.5 * tamano_entrada
+    assert f"Datos originales: {len(datos_grandes):,} filas" in caplog.text
+    assert "paso=datos_procesados" in caplog.text and f"filas_entrada={len(datos_grandes)}" in caplog.text
+
+
+def test_datos_procesados_filtrado_solo_toca_los_paises_pedidos(datos_grandes):
+    tamano_entrada = datos_grandes.memory_usage(deep=True).sum()
+    paises = PaisesObjetivo(paises=["Pais_0001", "Pais_0002"])
+
+    pico = _pico_memoria(lambda: datos_procesados(leer_datos=datos_grandes, motor=MotorCalculo(), paises=paises))
+
+    # Máscara del filtro y las filas de dos países de mil
+    assert pico < 0.25 * tamano_entrada
+
+
+def test_incidencia_pico_de_memoria_acotado(datos_grandes):
+    tamano_entrada = datos_grandes.memory_usage(deep=True).sum()
+
+    pico = _pico_memoria(lambda: calcular_incidencia_7d(datos_grandes))
+
+    assert pico < 3 * tamano_entrada
@@ -0,0 +1,113 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from dagster import asset, materialize
+
+from pipeline_covid import matriz
+from pipeline_covid.assets import (
+    calcular_factor_crec_7d_pandas, calcular_incidencia_7d_pandas, datos_procesados, metricas,
+)
+from pipeline_covid.metricas import REGISTRO_METRICAS, calcular_metricas
+from pipeline_covid.recursos import MotorCalculo, PaisesObjetivo
+from pipeline_covid_tests.datos_sinteticos import generar_owid
+
+
+def _procesados(n_paises=6, n_dias=150, semilla=0):
+    crudo = generar_owid(n_paises=n_paises, n_dias=n_dias, semilla=semilla)
+    rng = np.random.default_rng(semilla)
+    crudo = crudo[rng.random(len(crudo)) > 0.2].reset_index(drop=True)
+    return datos_procesados(leer_datos=crudo, motor=MotorCalculo(), paises=PaisesObjetivo(paises=["todos"]))
+
+
+def _por_pais_diario(datos):
+    """Referencia por país sobre el calendario diario (asfreq), sin la matriz"""
+    for pais, grupo in datos.groupby('location', observed=True):
+        yield pais, grupo.set_index('date').asfreq('D')
+
+
+def test_registro_igual_a_referencias():
+    datos = _procesados()
+
+    resultados = calcular_metricas(datos)
+
+    assert list(resultados) == list(REGISTRO_METRICAS)
+    pd.testing.assert_frame_equal(resultados["incidencia_7d"], calcular_incidencia_7d_pandas(datos))
+    pd.testing.assert_frame_equal(resultados["factor_crec_7d"], calcular_factor_crec_7d_pandas(datos))
+
+    incidencia_14d, vacunacion, duplicacion = [], [], []
+    for pais, diario in _por_pais_diario(datos):
+        observados = diario['location'].notna()
+        casos = diario['new_cases']
+        poblacion = diario['population'].dropna().iloc[-1]
+        incidencia = casos.rolling(14, min_periods=1).sum() / casos.rolling(14, min_periods=1).count()
+        incidencia_14d.append(incidencia[observados] / poblacion * 100000)
+        vacunacion.append((diario['people_vaccinated'] / poblacion * 100)[observados].dropna())
+        total = casos.fillna(0).cumsum()
+        previo = total.shift(7)
+        dias = (7 * np.log(2) / np.log(total / previo)).where((previo > 0) & (total > previo))
+        duplicacion.append(dias[observados].dropna().round(2))
+
+    np.testing.assert_allclose(resultados["incidencia_14d"]["incidencia_14d"], pd.concat(incidencia_14d), rtol=1e-12)
+    np.testing.assert_allclose(resultados["vacunacion_100"]["vacunacion_100"], pd.concat(vacunacion), rtol=1e-12)
+    pd.testing.assert_series_equal(
+        resultados["tiempo_duplicacion"]["fecha"], pd.Series(pd.concat(duplicacion).index, name="fecha")
+    )
+    np.testing.assert_allclose(resultados["tiempo_duplicacion"]["tiempo_duplicacion"], pd.concat(duplicacion))
+
+
+def test_una_sola_matriz_para_todo_el_registro(monkeypatch):
+    datos = _procesados(n_paises=3, n_dias=60).sample(frac=1, random_state=0)
+    construidas = []
+
+    class MatrizContada(matriz.MatrizCasos):
+        def __init__(self, datos):
+            construidas.append(len(datos))
+            super().__init__(datos)
+
+    monkeypatch.setattr(matriz, "MatrizCasos", MatrizContada)
+    resultados = calcular_metricas(datos)
+
+    assert construidas == [len(datos)] and len(resultados) == len(REGISTRO_METRICAS)
+    with pytest.raises(ValueError):
+        calcular_metricas(datos, ["muertes_7d"])
+
+
+def test_asset_por_metrica_y_subconjunto():
+    procesados = _procesados(n_paises=3, n_dias=60)
+
+    @asset(name="datos_procesados")
+    def fuente():
+        return procesados
+
+    resultado = materialize(
+        [fuente, metricas], resources={"motor": MotorCalculo()},
+        selection=["datos_procesados", "metrica_vacunacion_100", "metrica_incidencia_14d"],
+    )
+
+    assert resultado.success
+    materializados = {evento.asset_key.path[-1] for evento in resultado.get_asset_materialization_events()}
+    assert materializados == {"datos_procesados", "metrica_vacunacion_100", "metrica_incidencia_14d"}
+    pd.testing.assert_frame_equal(
+        resultado.output_for_node("metricas", "metrica_incidencia_14d"),
+        calcular_metricas(procesados, ["incidencia_14d"])["incidencia_14d"],
+    )
+
+
+@pytest.mark.skipif(not os.environ.get("COVID_BENCH"), reason="benchmark: exportar COVID_BENCH=1")
+def test_benchmark_registro_vs_por_metrica():
+    datos = _procesados(n_paises=250, n_dias=1000)
+
+    inicio = time.perf_counter()
+    for nombre in REGISTRO_METRICAS:
+        calcular_metricas(datos, [nombre])
+    t_por_metrica = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    calcular_metricas(datos)
+    t_registro = time.perf_counter() - inicio
+
+    print(f"\n{len(datos):,} filas, {len(REGISTRO_METRICAS)} métricas: una pasada por métrica "
+          f"{t_por_metrica:.3f}s | registro {t_registro:.3f}s | x{t_por_metrica / t_registro:.1f}")
@@ -0,0 +1,95 @@
+import pandas as pd
+import pytest
+from dagster import materialize
+
+from pipeline_covid import assets
+from pipeline_covid.assets import (
+    datos_procesados,
+    calcular_con_motor,
+    leer_csv_optimizado,
+    leer_datos,
+)
+from pipeline_covid.motor_duckdb import conectar
+from pipeline_covid.recursos import MotorCalculo, PaisesObjetivo
+from pipeline_covid_tests.datos_sinteticos import generar_owid
+
+
+@pytest.fixture
+def csv_owid(tmp_path, monkeypatch):
+    ruta = tmp_path / "covid.csv"
+    generar_owid(n_paises=5, n_dias=90).to_csv(ruta, index=False)
+    monkeypatch.setattr(assets, "RUTAS_POSIBLES", [str(ruta)])
+    return str(ruta)
+
+
+@pytest.mark.parametrize("usar_cache", [True, False])
+def test_duckdb_identico_a_pandas(csv_owid, monkeypatch, usar_cache):
+    if not usar_cache:
+        monkeypatch.setattr("pipeline_covid.motor_duckdb.asegurar_cache", _sin_cache)
+    crudo = leer_csv_optimizado(csv_owid, assets.PAISES_OBJETIVO)
+    pandas_, duckdb_ = MotorCalculo(motor="pandas"), MotorCalculo(motor="duckdb", hilos=2)
+
+    procesados_pd = datos_procesados(leer_datos=crudo, motor=pandas_, paises=PaisesObjetivo())
+    procesados_db = datos_procesados(leer_datos=crudo, motor=duckdb_, paises=PaisesObjetivo())
+    pd.testing.assert_frame_equal(procesados_pd, procesados_db, check_exact=True)
+
+    nombres = ["incidencia_7d", "factor_crec_7d"]
+    referencia = calcular_con_motor(nombres, procesados_pd, pandas_)
+    for nombre, resultado in calcular_con_motor(nombres, procesados_pd, duckdb_).items():
+        pd.testing.assert_frame_equal(referencia[nombre], resultado, check_exact=True)
+
+
+def test_duckdb_todos_los_paises(csv_owid):
+    crudo = leer_csv_optimizado(csv_owid, None)
+    todos = PaisesObjetivo(paises=["todos"])
+
+    procesados_pd = datos_procesados(leer_datos=crudo, motor=MotorCalculo(), paises=todos)
+    procesados_db = datos_procesados(leer_datos=crudo, motor=MotorCalculo(motor="duckdb"), paises=todos)
+
+    assert procesados_pd['location'].nunique() == 5
+    pd.testing.assert_frame_equal(procesados_pd, procesados_db, check_exact=True)
+
+
+@pytest.mark.parametrize("usar_cache", [True, False])
+def test_duckdb_duplicados_conserva_la_primera_fila(tmp_path, monkeypatch, usar_cache):
+    if not usar_cache:
+        monkeypatch.setattr("pipeline_covid.motor_duckdb.asegurar_cache", _sin_cache)
+    crudo = generar_owid(n_paises=5, n_dias=400)
+    # Cada fila repetida al final del archivo con otros casos: debe quedar la primera
+    repetidas = crudo.sample(frac=0.3, random_state=0).assign(new_cases=-1.0)
+    ruta = tmp_path / "covid.csv"
+    pd.concat([crudo, repetidas]).to_csv(ruta, index=False)
+    monkeypatch.setattr(assets, "RUTAS_POSIBLES", [str(ruta)])
+    datos = leer_csv_optimizado(str(ruta), None)
+    todos = PaisesObjetivo(paises=["todos"])
+
+    procesados_pd = datos_procesados(leer_datos=datos, motor=MotorCalculo(), paises=todos)
+    procesados_db = datos_procesados(leer_datos=datos, motor=MotorCalculo(motor="duckdb", hilos=4), paises=todos)
+
+    assert (procesados_db['new_cases'] >= 0).all()
+    pd.testing.assert_frame_equal(procesados_pd, procesados_db, check_exact=True)
+
+
+def test_limite_memoria_validado():
+    conectar(MotorCalculo(motor="duckdb", limite_memoria="512MiB")).close()
+    for valor in ["4GB'; SELECT 1; --", "mucho", "GB"]:
+        with pytest.raises(ValueError):
+            conectar(MotorCalculo(motor="duckdb", limite_memoria=valor))
+
+
+@pytest.mark.parametrize("config", [{"snapshots": "/tmp/snapshots/*.csv"}, {"usar_cache": False}])
+def test_duckdb_rechaza_lecturas_que_no_usaria(config):
+    with pytest.raises(ValueError):
+        materialize(
+            [leer_datos], resources={"paises": PaisesObjetivo(), "motor": MotorCalculo(motor="duckdb")},
+            run_config={"ops": {"leer_datos": {"config": config}}},
+        )
+
+
+def test_motor_desconocido():
+    with pytest.raises(ValueError):
+        MotorCalculo(motor="spark").validar()
+
+
+def _sin_cache(ruta):
+    raise RuntimeError("caché deshabilitado en el test")
@@ -0,0 +1,111 @@
+import pandas as pd
+from dagster import build_asset_context, build_sensor_context, instance_for_test, materialize, PartitionKeyRange
+
+from pipeline_covid.assets import calcular_incidencia_7d, calcular_factor_crec_7d, leer_datos, datos_procesados
+from pipeline_covid.particiones import (
+    calcular_metrica_particion,
+    incidencia_7d_diaria,
+    rango_a_actualizar,
+    sensor_metricas_diarias,
+    DIAS_ACTUALIZACION,
+    ETIQUETA_RANGO_INICIO,
+    ETIQUETA_RANGO_FIN,
+    JOB_METRICAS_DIARIAS,
+    PARTICIONES_DIARIAS,
+    LOOKBACK_INCIDENCIA,
+    LOOKBACK_FACTOR,
+)
+from pipeline_covid.recursos import MotorCalculo, PaisesObjetivo
+from pipeline_covid_tests.datos_sinteticos import compactar_metricas, escribir_csv_pipeline, generar_owid
+
+
+def test_rangos_diarios_reproducen_la_serie_completa():
+    datos = compactar_metricas(generar_owid(n_paises=2, n_dias=60))
+    dias = pd.date_range(datos['date'].min(), datos['date'].max(), freq='D')
+    for calcular, col_fecha, lookback in [
+        (calcular_incidencia_7d, 'fecha', LOOKBACK_INCIDENCIA),
+        (calcular_factor_crec_7d, 'semana_fin', LOOKBACK_FACTOR),
+    ]:
+        completo = calcular(datos)
+        # Rangos de DIAS_ACTUALIZACION días, como los que lanza el sensor
+        por_rango = [
+            calcular_metrica_particion(datos, inicio, min(inicio + pd.Timedelta(days=DIAS_ACTUALIZACION - 1),
+                                                          dias[-1]), calcular, col_fecha, lookback)[0]
+            for inicio in dias[::DIAS_ACTUALIZACION]
+        ]
+        incremental = pd.concat(por_rango).sort_values(['pais', col_fecha], kind='stable').reset_index(drop=True)
+        pd.testing.assert_frame_equal(incremental, completo, check_categorical=False)
+
+
+def test_particion_lee_solo_la_ventana():
+    datos = compactar_metricas(generar_owid(n_paises=2, n_dias=60))
+    dia = datos['date'].iloc[40]
+    contexto = build_asset_context(partition_key=str(dia.date()))
+
+    resultado = incidencia_7d_diaria(contexto, datos)
+
+    # Un día con todos los países
+    assert list(resultado) == [str(dia.date())]
+    assert resultado[str(dia.date())]['fecha'].tolist() == [dia] * datos['location'].nunique()
+    _, leidos = calcular_metrica_particion(datos, dia, dia, calcular_incidencia_7d, 'fecha', LOOKBACK_INCIDENCIA)
+    # Como mucho un registro por país y día de la ventana (faltan los días sin registro)
+    assert leidos <= (LOOKBACK_INCIDENCIA + 1) * datos['location'].nunique()
+
+
+def test_rango_a_actualizar():
+    rango = rango_a_actualizar('2021-03-31')
+
+    assert (rango.start, rango.end) == ('2021-03-18', '2021-03-31')
+    assert len(PARTICIONES_DIARIAS.get_partition_keys_in_range(rango)) == DIAS_ACTUALIZACION
+    # Sin días anteriores al inicio de las particiones
+    assert rango_a_actualizar('2020-01-03') == PartitionKeyRange('2020-01-01', '2020-01-03')
+    assert rango_a_actualizar('2019-12-31') is None
+
+
+def _contexto_sensor(instancia, cursor=None):
+    # Con la referencia de la instancia, como en el daemon: las particiones dinámicas se validan contra ella
+    from pipeline_covid.definitions import defs
+    return build_sensor_context(instance=instancia, instance_ref=instancia.get_ref(), definitions=defs, cursor=cursor)
+
+
+def test_sensor_lanza_una_sola_ejecucion_por_actualizacion(tmp_path, monkeypatch):
+    crudo = generar_owid(n_paises=40, n_dias=60)
+    escribir_csv_pipeline(tmp_path, crudo)
+    monkeypatch.chdir(tmp_path)
+
+    with instance_for_test() as instancia:
+        # Sin materializaciones no hay nada que actualizar
+        assert not sensor_metricas_diarias.evaluate_tick(_contexto_sensor(instancia)).run_requests
+
+        resultado = materialize(
+            [leer_datos, datos_procesados], instance=instancia,
+            resources={"motor": MotorCalculo(), "paises": PaisesObjetivo(paises=["todos"])},
+        )
+        assert resultado.success
+        evaluacion = sensor_metricas_diarias.evaluate_tick(_contexto_sensor(instancia))
+
+        # Una ejecución por actualización, sin importar el número de países ni de días
+        assert len(evaluacion.run_requests) == 1
+        pedido = evaluacion.run_requests[0]
+        rango = rango_a_actualizar(crudo['date'].max())
+        assert (pedido.tags[ETIQUETA_RANGO_INICIO], pedido.tags[ETIQUETA_RANGO_FIN]) == (rango.start, rango.end)
+
+        # La misma materialización no vuelve a lanzar ejecuciones
+        siguiente = _contexto_sensor(instancia, cursor=evaluacion.cursor)
+        assert not sensor_metricas_diarias.evaluate_tick(siguiente).run_requests
+
+        # La ejecución del rango guarda cada día en su partición
+        from pipeline_covid.definitions import defs
+        ejecucion = defs.resolve_job_def(JOB_METRICAS_DIARIAS).execute_in_process(
+            instance=instancia, tags=pedido.tags, resources={"paises": PaisesObjetivo(paises=["todos"])},
+        )
+        assert ejecucion.success
+        materializadas = {
+            evento.partition for evento in ejecucion.get_asset_materialization_events()
+            if evento.asset_key.to_user_string() == "incidencia_7d_diaria"
+        }
+        assert materializadas == set(PARTICIONES_DIARIAS.get_partition_keys_in_range(rango))
+        ultimo = defs.load_asset_value("incidencia_7d_diaria", partition_key=rango.end, instance=instancia)
+        completo = calcular_incidencia_7d(resultado.output_for_node("datos_procesados"))
+        esperado = completo[completo['fecha'] == pd.Timestamp(rango.end)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(ultimo, esperado, check_categorical=False)
@@ -0,0 +1,184 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pipeline_covid import reporte
+from pipeline_covid.reporte import (
+    escribir_reporte, escribir_xlsx, huella_contenido, reporte_existente, aplicar_retencion
+)
+
+
+def _hojas():
+    datos = pd.DataFrame({
+        'location': pd.Categorical(['Ecuador', 'Ecuador', 'Peru']),
+        'date': pd.to_datetime(['2021-01-01', '2021-01-02', '2021-01-01']),
+        'new_cases': np.array([1.0, np.nan, 3.0], dtype='float32'),
+        'population': [17_643_060.0, 17_643_060.0, 33_359_415.0],
+    })
+    resumen = pd.DataFrame({'pais': ['Ecuador', 'Peru'], 'registros_totales': [2, 1]})
+    return {'Datos_Procesados': datos, 'Resumen_Estadistico': resumen}
+
+
+def test_xlsx_en_streaming_se_lee_igual(tmp_path):
+    hojas = _hojas()
+
+    ruta = escribir_reporte(hojas, str(tmp_path / "reporte"), "xlsx")
+    leido = pd.read_excel(ruta, sheet_name=None)
+
+    assert list(leido) == ['Datos_Procesados', 'Resumen_Estadistico']
+    datos = leido['Datos_Procesados']
+    assert datos['location'].tolist() == ['Ecuador', 'Ecuador', 'Peru']
+    assert datos['date'].tolist() == hojas['Datos_Procesados']['date'].tolist()
+    assert np.isnan(datos['new_cases'][1])
+    pd.testing.assert_frame_equal(leido['Resumen_Estadistico'], hojas['Resumen_Estadistico'])
+
+
+def test_xlsx_reparte_tablas_que_no_caben_en_una_hoja(tmp_path):
+    ruta = escribir_xlsx(_hojas(), str(tmp_path / "reporte"), max_filas=2)
+
+    leido = pd.read_excel(ruta, sheet_name=None)
+
+    assert list(leido) == ['Datos_Procesados', 'Datos_Procesados_2', 'Resumen_Estadistico']
+    assert len(leido['Datos_Procesados']) == 2 and len(leido['Datos_Procesados_2']) == 1
+
+
+def test_xlsx_texto_con_caracteres_no_xml(tmp_path):
+    # Controles no admitidos por XML 1.0 (se quitan) junto a los que sí (\t, \n) y a &<>
+    hojas = {'Texto': pd.DataFrame({
+        'nota\x0b': ['a\x00b\x1fc', 'x&y<z>', 'tab\tsalto\n', 'fin\ufffe'],
+        'n': [1, 2, 3, 4],
+    })}
+
+    ruta = escribir_reporte(hojas, str(tmp_path / "reporte"), "xlsx")
+    leido = pd.read_excel(ruta, sheet_name='Texto')
+
+    assert list(leido.columns) == ['nota', 'n']
+    assert leido['nota'].tolist() == ['abc', 'x&y<z>', 'tab\tsalto\n', 'fin']
+
+
+def test_xlsx_columna_de_texto_en_varios_trozos(tmp_path):
+    partes = [pd.DataFrame({'pais': pd.array([p], dtype="str")}) for p in ['Ecuador', 'Peru']]
+    hojas = {'Paises': pd.concat(partes, ignore_index=True)}
+
+    leido = pd.read_excel(escribir_reporte(hojas, str(tmp_path / "reporte"), "xlsx"))
+
+    assert leido['pais'].tolist() == ['Ecuador', 'Peru']
+
+
+@pytest.mark.parametrize("formato,lector", [
+    ("parquet", lambda ruta: pd.read_parquet(ruta)),
+    ("csv.gz", lambda ruta: pd.read_csv(ruta, parse_dates=['date'])),
+])
+def test_formatos_por_hoja(tmp_path, formato, lector):
+    hojas = _hojas()
+
+    ruta = escribir_reporte(hojas, str(tmp_path / "reporte"), formato)
+    datos = lector(os.path.join(ruta, f"Datos_Procesados.{formato}"))
+
+    assert sorted(os.listdir(ruta)) == [f"Datos_Procesados.{formato}", f"Resumen_Estadistico.{formato}"]
+    pd.testing.assert_frame_equal(datos, hojas['Datos_Procesados'], check_dtype=False, check_categorical=False)
+
+
+def test_formato_desconocido(tmp_path):
+    with pytest.raises(ValueError):
+        escribir_reporte(_hojas(), str(tmp_path / "reporte"), "ods")
+
+
+def test_huella_depende_solo_del_contenido():
+    hojas = _hojas()
+    copia = {nombre: df.copy() for nombre, df in hojas.items()}
+
+    assert huella_contenido(hojas, "xlsx") == huella_contenido(copia, "xlsx")
+    assert huella_contenido(hojas, "xlsx") != huella_contenido(hojas, "parquet")
+
+    copia['Datos_Procesados'].loc[0, 'new_cases'] = 99.0
+    assert huella_contenido(hojas, "xlsx") != huella_contenido(copia, "xlsx")
+
+
+def test_version_de_los_escritores_cambia_el_nombre(tmp_path, monkeypatch):
+    hojas = _hojas()
+    ruta_v1 = escribir_reporte(hojas, str(tmp_path / f"reporte_covid_{huella_contenido(hojas, 'xlsx')}"), "xlsx")
+
+    monkeypatch.setattr(reporte, "VERSION_REPORTE", reporte.VERSION_REPORTE + "+1")
+    ruta_base = str(tmp_path / f"reporte_covid_{huella_contenido(hojas, 'xlsx')}")
+
+    assert reporte_existente(ruta_base, "xlsx") is None
+    assert escribir_reporte(hojas, ruta_base, "xlsx") != ruta_v1
+
+
+def test_reporte_existente_no_se_reescribe(tmp_path):
+    ruta_base = str(tmp_path / "reporte_covid_x")
+    assert reporte_existente(ruta_base, "xlsx") is None
+
+    ruta = escribir_reporte(_hojas(), ruta_base, "xlsx")
+    os.utime(ruta, (0, 0))
+
+    assert reporte_existente(ruta_base, "xlsx") == ruta
+    assert os.path.getmtime(ruta) > 0
+    assert os.listdir(tmp_path) == ["reporte_covid_x.xlsx"]
+
+
+def test_retencion_por_cantidad_y_tamano(tmp_path):
+    rutas = []
+    for i in range(4):
+        ruta = tmp_path / f"reporte_covid_todos_{i:016x}.xlsx"
+        ruta.write_bytes(b"x" * 100)
+        os.utime(ruta, (i, i))
+        rutas.append(str(ruta))
+    (tmp_path / "otro.txt").write_text("no es un reporte")
+
+    eliminadas = aplicar_retencion(str(tmp_path), "reporte_covid_", max_reportes=3)
+    assert eliminadas == [rutas[0]]
+
+    # 250 bytes: caben los dos más recientes; el recién generado siempre se conserva
+    aplicar_retencion(str(tmp_path), "reporte_covid_", max_bytes=250, conservar=rutas[1])
+    assert sorted(os.listdir(tmp_path)) == ["otro.txt", os.path.basename(rutas[1]), os.path.basename(rutas[3])]
+
+
+def test_retencion_solo_borra_reportes_con_huella(tmp_path):
+    # Reportes con nombre de fecha (como el versionado en output/), temporales y carpetas con huella
+    ajenos = ["reporte_covid_ecuador_peru_20250831_0652.xlsx", "reporte_covid_mio.xlsx",
+              f"reporte_covid_todos_{0:016x}.tmp.xlsx"]
+    for antiguedad, nombre in enumerate(ajenos):
+        (tmp_path / nombre).write_bytes(b"x")
+        os.utime(tmp_path / nombre, (antiguedad, antiguedad))
+    carpeta = tmp_path / f"reporte_covid_ecuador_{'ab' * 8}"
+    carpeta.mkdir()
+    os.utime(carpeta, (10, 10))
+    nuevo = escribir_reporte(_hojas(), str(tmp_path / f"reporte_covid_ecuador_{'cd' * 8}"), "xlsx")
+
+    eliminadas = aplicar_retencion(str(tmp_path), "reporte_covid_", max_reportes=1, conservar=nuevo)
+
+    assert eliminadas == [str(carpeta)]
+    assert sorted(os.listdir(tmp_path)) == sorted(ajenos + [os.path.basename(nuevo)])
+
+
+def test_xlsx_ida_y_vuelta_con_openpyxl(tmp_path):
+    # Cada tipo de celda del escritor propio, leído con openpyxl (no con pandas)
+    from openpyxl import load_workbook
+
+    largo = "ñandú " * 5000
+    hojas = {'Tipos': pd.DataFrame({
+        'pais': pd.Categorical(['Perú', 'Côte d\'Ivoire', None, 'Perú']),
+        'fecha': pd.to_datetime(['2021-01-01', '2021-06-30', None, '1999-12-31']),
+        'hora': pd.to_datetime(['2021-01-01 08:30:15', '2021-01-02 00:00:00', '2021-01-03 00:00:00',
+                                '2021-01-04 23:59:59']),
+        'casos': [1.5, np.nan, np.inf, -2.25],
+        'enteros': np.array([0, 2**40, -7, 12], dtype='int64'),
+        'activo': [True, False, True, False],
+        'nota': ['日本語 ✓', largo, None, '€ & <b>'],
+    })}
+
+    libro = load_workbook(escribir_xlsx(hojas, str(tmp_path / "reporte")), read_only=True)
+    filas = list(libro['Tipos'].iter_rows(values_only=True))
+    formatos = [celda.number_format for celda in next(libro['Tipos'].iter_rows(min_row=2, max_row=2))]
+
+    assert filas[0] == ('pais', 'fecha', 'hora', 'casos', 'enteros', 'activo', 'nota')
+    assert filas[1] == ('Perú', datetime(2021, 1, 1), datetime(2021, 1, 1, 8, 30, 15), 1.5, 0, True, '日本語 ✓')
+    assert filas[2] == ('Côte d\'Ivoire', datetime(2021, 6, 30), datetime(2021, 1, 2), None, 2**40, False, largo)
+    assert filas[3] == (None, None, datetime(2021, 1, 3), None, -7, True, None)
+    assert filas[4] == ('Perú', datetime(1999, 12, 31), datetime(2021, 1, 4, 23, 59, 59), -2.25, 12, False, '€ & <b>')
+    assert formatos[1:3] == ['yyyy-mm-dd', 'yyyy-mm-dd hh:mm:ss']
@@ -0,0 +1,175 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from hypothesis import given, settings, strategies as st
+
+from pipeline_covid.assets import (
+    calcular_con_motor, calcular_incidencia_7d_pandas, calcular_incidencia_7d_nucleos,
+    calcular_factor_crec_7d_pandas, calcular_factor_crec_7d_nucleos, ordenar_por_pais_fecha,
+)
+from pipeline_covid.recursos import MotorCalculo
+from pipeline_covid.ventanas import (
+    desfase, dias_desde_inicio, inicios_grupos, media_movil, razon, suma_movil, suma_y_conteo,
+)
+from pipeline_covid_tests.datos_sinteticos import generar_compacto
+
+
+def test_inicios_grupos():
+    grupos = pd.Series(pd.Categorical(["A", "A", "B", "C", "C"]))
+
+    np.testing.assert_array_equal(inicios_grupos(grupos), [0, 2, 3])
+    np.testing.assert_array_equal(inicios_grupos(grupos.astype(str)), [0, 2, 3])
+    assert len(inicios_grupos(pd.Series([], dtype=str))) == 0
+
+
+@pytest.mark.parametrize("semilla", range(10))
+def test_razon_igual_a_pandas(semilla):
+    rng = np.random.default_rng(semilla)
+    numerador = pd.Series(rng.integers(0, 3, size=50).astype('float64'))
+    denominador = pd.Series(rng.integers(-1, 3, size=50).astype('float64'))
+    numerador[rng.random(50) < 0.2] = np.nan
+
+    np.testing.assert_array_equal(razon(numerador.to_numpy(), denominador.to_numpy()),
+                                  (numerador / denominador).to_numpy())
+
+
+# Series por grupo: días distintos (con huecos) y recuentos enteros o NaN
+_grupo = st.lists(
+    st.tuples(st.integers(0, 60), st.one_of(st.integers(0, 10**6).map(float), st.just(np.nan))),
+    max_size=30, unique_by=lambda registro: registro[0],
+)
+
+
+def _largo(grupos):
+    """Datos ordenados por (grupo, fecha) como los recibe un núcleo"""
+    filas = [(f"G{g}", dia, valor) for g, registros in enumerate(grupos) for dia, valor in sorted(registros)]
+    datos = pd.DataFrame(filas, columns=['grupo', 'dia', 'valor']).astype({'dia': 'int64', 'valor': 'float64'})
+    datos['fecha'] = pd.Timestamp('2021-01-01') + pd.to_timedelta(datos['dia'], unit='D')
+    return datos
+
+
+def _rolling(datos, ventana, min_periodos):
+    return datos.groupby('grupo').rolling(f'{ventana}D', on='fecha', min_periods=min_periodos)['valor']
+
+
+@settings(max_examples=200, deadline=None)
+@given(grupos=st.lists(_grupo, min_size=1, max_size=4), ventana=st.integers(1, 10), min_periodos=st.integers(1, 10))
+def test_ventanas_iguales_a_pandas_rolling(grupos, ventana, min_periodos):
+    datos = _largo(grupos)
+    inicios, dias, valores = inicios_grupos(datos['grupo']), datos['dia'].to_numpy(), datos['valor'].to_numpy()
+    if datos.empty:
+        assert len(suma_movil(valores, dias, inicios, ventana)) == 0
+        return
+
+    np.testing.assert_array_equal(suma_movil(valores, dias, inicios, ventana, min_periodos),
+                                  _rolling(datos, ventana, min_periodos).sum().to_numpy())
+    np.testing.assert_array_equal(media_movil(valores, dias, inicios, ventana, min_periodos),
+                                  _rolling(datos, ventana, min_periodos).mean().to_numpy())
+    np.testing.assert_array_equal(suma_y_conteo(valores, dias, inicios, ventana)[1],
+                                  _rolling(datos, ventana, 1).count().to_numpy())
+
+
+@settings(max_examples=200, deadline=None)
+@given(grupos=st.lists(_grupo, min_size=1, max_size=4), periodo=st.integers(0, 10))
+def test_desfase_igual_a_reindexar_por_fecha(grupos, periodo):
+    datos = _largo(grupos)
+    if datos.empty:
+        return
+    por_fecha = datos.set_index(['grupo', 'fecha'])['valor']
+    esperado = por_fecha.reindex(pd.MultiIndex.from_arrays([datos['grupo'], datos['fecha'] - pd.Timedelta(days=periodo)]))
+
+    np.testing.assert_array_equal(
+        desfase(datos['valor'].to_numpy(), datos['dia'].to_numpy(), inicios_grupos(datos['grupo']), periodo),
+        esperado.to_numpy(),
+    )
+
+
+def test_ventana_y_desfase_invalidos():
+    dias, inicios = np.arange(3), np.array([0])
+    with pytest.raises(ValueError, match="ventana"):
+        suma_movil(np.ones(3), dias, inicios, 0)
+    with pytest.raises(ValueError, match="hacia atrás"):
+        desfase(np.ones(3), dias, inicios, -1)
+
+
+def test_claves_dispersas_usan_busqueda_binaria():
+    # Dos registros por grupo separados por años: la tabla densa de claves sería enorme
+    dias = np.array([0, 2000, 0, 2000], dtype=np.int64)
+    inicios = np.array([0, 2])
+    np.testing.assert_array_equal(suma_movil(np.array([1., 2., 3., 4.]), dias, inicios, 7), [1., 2., 3., 4.])
+    np.testing.assert_array_equal(dias_desde_inicio(np.array(['2021-01-03', '2021-01-01'], dtype='datetime64[ns]')),
+                                  [2, 0])
+
+
+def _con_huecos(semilla=0, n_paises=12, n_dias=90):
+    datos = generar_compacto(n_paises=n_paises, n_dias=n_dias, semilla=semilla)
+    rng = np.random.default_rng(semilla)
+    datos = datos[rng.random(len(datos)) > 0.25].reset_index(drop=True)
+    datos.loc[rng.random(len(datos)) < 0.05, 'new_cases'] = np.nan
+    return datos
+
+
+@pytest.mark.parametrize("semilla", range(3))
+def test_metricas_con_nucleos_iguales_a_pandas(semilla):
+    datos = _con_huecos(semilla, n_paises=20, n_dias=120)
+
+    pd.testing.assert_frame_equal(calcular_incidencia_7d_nucleos(datos), calcular_incidencia_7d_pandas(datos),
+                                  check_exact=True)
+    pd.testing.assert_frame_equal(calcular_factor_crec_7d_nucleos(datos), calcular_factor_crec_7d_pandas(datos),
+                                  check_exact=True)
+
+
+def test_motor_nucleos():
+    datos = _con_huecos(3)
+    resultados = calcular_con_motor(["incidencia_7d", "factor_crec_7d", "vacunacion_100"], datos,
+                                    MotorCalculo(motor="nucleos"))
+
+    pd.testing.assert_frame_equal(resultados["incidencia_7d"], calcular_incidencia_7d_pandas(datos), check_exact=True)
+    pd.testing.assert_frame_equal(resultados["factor_crec_7d"], calcular_factor_crec_7d_pandas(datos),
+                                  check_exact=True)
+    assert "vacunacion_100" in resultados
+
+
+def _original(datos):
+    """Versión inicial del pipeline: incidencia diaria y media de 7 filas con groupby().rolling()"""
+    df = datos.copy()
+    df['incidencia_diaria'] = df['new_cases'] / df['population'] * 100000
+    df['incidencia_7d'] = df.groupby('location', observed=True)['incidencia_diaria'].rolling(
+        window=7, min_periods=1).mean().reset_index(0, drop=True)
+    return df[['date', 'location', 'incidencia_7d']]
+
+
+def _minimo(funcion, *args, repeticiones=5):
+    funcion(*args)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    return min(tiempos)
+
+
+@pytest.mark.skipif(not os.environ.get("COVID_BENCH"), reason="benchmark: exportar COVID_BENCH=1")
+def test_benchmark_nucleos():
+    # Tamaño OWID (250 ubicaciones x 1.720 días), ya ordenado como sale de datos_procesados
+    datos = ordenar_por_pais_fecha(generar_compacto(n_paises=250, n_dias=1720)).reset_index(drop=True)
+    inicios = inicios_grupos(datos['location'])
+    dias = dias_desde_inicio(datos['date'].to_numpy())
+    casos = datos['new_cases'].to_numpy()
+
+    rolling = _minimo(lambda: datos.groupby('location', observed=True).rolling(
+        '7D', on='date', min_periods=1)['new_cases'].sum())
+    nucleo = _minimo(suma_movil, casos, dias, inicios, 7)
+    print(f"\n{len(datos):,} filas | suma 7D: groupby().rolling() {rolling * 1000:.1f} ms | "
+          f"suma_movil {nucleo * 1000:.1f} ms ({rolling / nucleo:.1f}x)")
+    for nucleos, referencias in ((calcular_incidencia_7d_nucleos, (calcular_incidencia_7d_pandas, _original)),
+                                 (calcular_factor_crec_7d_nucleos, (calcular_factor_crec_7d_pandas,))):
+        t_nucleos = _minimo(nucleos, datos)
+        for referencia in referencias:
+            t_referencia = _minimo(referencia, datos)
+            print(f"  {nucleos.__name__} {t_nucleos * 1000:.1f} ms | {referencia.__name__} "
+                  f"{t_referencia * 1000:.1f} ms ({t_referencia / t_nucleos:.1f}x)")
+    assert nucleo < rolling
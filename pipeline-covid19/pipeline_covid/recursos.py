@@ -0,0 +1,61 @@
+"""
+Recursos de Dagster compartidos por los assets del pipeline
+"""
+
+from typing import List, Optional
+
+from dagster import ConfigurableResource
+
+MOTORES_DISPONIBLES = ("pandas", "duckdb", "incremental", "nucleos")
+
+PAISES_POR_DEFECTO = ['Ecuador', 'Peru']
+
+
+class MotorCalculo(ConfigurableResource):
+    """
+    Motor de ejecución para datos_procesados y las métricas
+
+    - "pandas": implementación de referencia en memoria
+    - "duckdb": consultas SQL multi-hilo que leen directamente el CSV/Parquet
+    - "incremental": métricas actualizadas desde el estado guardado (solo filas nuevas)
+    - "nucleos": ventanas móviles por país con los núcleos NumPy de ventanas.py, sin matriz densa
+    """
+    motor: str = "pandas"
+    # Opciones de DuckDB (None = valores por defecto de DuckDB)
+    hilos: Optional[int] = None
+    limite_memoria: Optional[str] = None
+    directorio_temporal: Optional[str] = None
+    # Opciones del motor incremental
+    directorio_estado: str = "pipeline_covid/data/estado_incremental"
+    verificar_incremental: bool = False
+
+    def validar(self) -> str:
+        if self.motor not in MOTORES_DISPONIBLES:
+            raise ValueError(f"❌ Motor no soportado: {self.motor}. Opciones: {MOTORES_DISPONIBLES}")
+        return self.motor
+
+
+class PaisesObjetivo(ConfigurableResource):
+    """
+    Conjunto de países a analizar
+
+    - Lista de nombres de OWID (por defecto Ecuador y Perú)
+    - ["todos"]: todas las ubicaciones disponibles en el archivo
+    """
+    paises: List[str] = PAISES_POR_DEFECTO
+
+    @property
+    def todos(self) -> bool:
+        return any(pais.strip().lower() in ("todos", "all") for pais in self.paises)
+
+    def filtro(self) -> Optional[List[str]]:
+        """Lista de países para filtrar, o None si se analizan todos"""
+        return None if self.todos else list(self.paises)
+
+    def etiqueta(self) -> str:
+        """Nombre corto del conjunto para nombres de archivo"""
+        if self.todos:
+            return "todos"
+        if len(self.paises) <= 3:
+            return "_".join(pais.lower().replace(" ", "-") for pais in self.paises)
+        return f"{len(self.paises)}_paises"
@@ -0,0 +1,321 @@
+"""
+Escritores del reporte final
+Cada formato recibe las hojas ({nombre: DataFrame}) y una ruta base sin
+extensión, y devuelve la ruta generada
+
+- "xlsx": escritor columnar propio en streaming (XML de SpreadsheetML generado
+  con pyarrow por bloques de filas); memoria constante por bloque
+- "parquet": un archivo por hoja dentro de una carpeta
+- "csv.gz": un CSV comprimido por hoja dentro de una carpeta
+
+El nombre del reporte lleva una huella del contenido: si ya existe un reporte
+con los mismos datos se reutiliza, y la retención limita lo que queda en disco
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import zipfile
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Límite de filas de una hoja de Excel (incluida la cabecera)
+MAX_FILAS_HOJA = 1_048_575
+
+# Filas convertidas a XML de una vez: la memoria depende del bloque, no del total
+TAMANO_BLOQUE_XLSX = 100_000
+
+# Deflate rápido: el XML de las hojas comprime bien incluso con nivel 1
+NIVEL_COMPRESION = 1
+
+# Días entre el origen de Excel (1899-12-30) y el epoch de Unix
+DIAS_ORIGEN_EXCEL = 25569
+MICROSEGUNDOS_DIA = 86_400 * 1_000_000
+
+# Índices de estilo en styles.xml (cellXfs)
+ESTILO_FECHA = 1
+ESTILO_FECHA_HORA = 2
+
+NS_HOJA = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_RELACIONES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PAQUETE = "http://schemas.openxmlformats.org/package/2006/relationships"
+TIPO_HOJA = "application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"
+CABECERA_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+ESTILOS_XML = CABECERA_XML + f"""<styleSheet xmlns="{NS_HOJA}">
+<numFmts count="2"><numFmt numFmtId="164" formatCode="yyyy-mm-dd"/><numFmt numFmtId="165" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>
+<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/><xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/><xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>
+<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>
+</styleSheet>"""
+
+
+# Caracteres que XML 1.0 no admite ni escapados (controles salvo \t \n \r, U+FFFE y U+FFFF):
+# un solo carácter así deja el libro ilegible. Sintaxis RE2 para pyarrow
+CARACTERES_NO_XML = r"[\x00-\x08\x0b\x0c\x0e-\x1f\x{fffe}\x{ffff}]"
+CARACTERES_NO_XML_PY = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _escapar_xml(texto: pa.Array) -> pa.Array:
+    """Escapar &, <, > y quitar los caracteres no permitidos en XML 1.0"""
+    texto = pc.replace_substring_regex(texto, CARACTERES_NO_XML, "")
+    for original, escapado in (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;")):
+        texto = pc.replace_substring(texto, original, escapado)
+    return texto
+
+
+def _celdas(serie: pd.Series) -> pa.Array:
+    """
+    XML de las celdas de una columna, calculado columna a columna con pyarrow
+    (sin objetos Python por celda). Los nulos y NaN quedan como celda vacía <c/>
+    """
+    arreglo = pa.Array.from_pandas(serie)
+    # Las columnas str de pandas respaldadas por Arrow pueden venir en varios trozos
+    if isinstance(arreglo, pa.ChunkedArray):
+        arreglo = arreglo.combine_chunks()
+    if pa.types.is_dictionary(arreglo.type):
+        arreglo = arreglo.dictionary_decode()
+    tipo = arreglo.type
+
+    if pa.types.is_timestamp(tipo) or pa.types.is_date(tipo):
+        micros = pc.cast(pc.cast(arreglo, pa.timestamp("us")), pa.int64())
+        # Formato con hora solo si algún valor no cae a medianoche
+        con_hora = pc.any(pc.not_equal(micros, pc.multiply(pc.divide(micros, MICROSEGUNDOS_DIA), MICROSEGUNDOS_DIA)))
+        dias = pc.add(pc.divide(pc.cast(micros, pa.float64()), MICROSEGUNDOS_DIA), DIAS_ORIGEN_EXCEL)
+        estilo = ESTILO_FECHA_HORA if con_hora.as_py() else ESTILO_FECHA
+        celdas = pc.binary_join_element_wise(f'<c s="{estilo}"><v>', pc.cast(dias, pa.string()), "</v></c>", "")
+        valido = pc.is_valid(arreglo)
+    elif pa.types.is_boolean(tipo):
+        celdas = pc.if_else(arreglo, '<c t="b"><v>1</v></c>', '<c t="b"><v>0</v></c>')
+        valido = pc.is_valid(arreglo)
+    elif pa.types.is_integer(tipo) or pa.types.is_floating(tipo) or pa.types.is_decimal(tipo):
+        celdas = pc.binary_join_element_wise("<c><v>", pc.cast(arreglo, pa.string()), "</v></c>", "")
+        valido = pc.fill_null(pc.is_finite(arreglo), False) if pa.types.is_floating(tipo) else pc.is_valid(arreglo)
+    else:
+        texto = _escapar_xml(pc.cast(arreglo, pa.string()))
+        celdas = pc.binary_join_element_wise('<c t="inlineStr"><is><t xml:space="preserve">', texto, "</t></is></c>", "")
+        valido = pc.is_valid(arreglo)
+
+    return pc.if_else(valido, celdas, "<c/>")
+
+
+def _bytes_filas(df: pd.DataFrame) -> memoryview:
+    """
+    Filas <row> de un bloque; el buffer de valores de un arreglo de strings
+    Arrow ya es la concatenación de todas las filas, se escribe sin copiarlo
+    """
+    filas = pc.binary_join_element_wise("<row>", *(_celdas(df[col]) for col in df.columns), "</row>\n", "")
+    if len(filas) == 0:
+        return memoryview(b"")
+    _, offsets, valores = filas.buffers()
+    tipo_offset = np.int64 if pa.types.is_large_string(filas.type) else np.int32
+    offsets = np.frombuffer(offsets, dtype=tipo_offset)[filas.offset:filas.offset + len(filas) + 1]
+    return memoryview(valores)[offsets[0]:offsets[-1]]
+
+
+def _escribir_hoja(libro: zipfile.ZipFile, numero: int, df: pd.DataFrame) -> None:
+    with libro.open(f"xl/worksheets/sheet{numero}.xml", "w", force_zip64=True) as hoja:
+        hoja.write(f'{CABECERA_XML}<worksheet xmlns="{NS_HOJA}"><sheetData>\n'.encode("utf-8"))
+        cabecera = pd.DataFrame([[str(col) for col in df.columns]], columns=range(len(df.columns)), dtype=object)
+        hoja.write(_bytes_filas(cabecera))
+        for inicio in range(0, len(df), TAMANO_BLOQUE_XLSX):
+            hoja.write(_bytes_filas(df.iloc[inicio:inicio + TAMANO_BLOQUE_XLSX]))
+        hoja.write(b"</sheetData></worksheet>")
+
+
+def _dividir_hojas(hojas: Dict[str, pd.DataFrame], max_filas: int) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """Las tablas que no caben en una hoja se reparten en Hoja, Hoja_2, Hoja_3, ..."""
+    for nombre, df in hojas.items():
+        for parte, inicio in enumerate(range(0, max(len(df), 1), max_filas), start=1):
+            yield (nombre if parte == 1 else f"{nombre}_{parte}"), df.iloc[inicio:inicio + max_filas]
+
+
+def escribir_xlsx(hojas: Dict[str, pd.DataFrame], ruta_base: str, max_filas: int = MAX_FILAS_HOJA) -> str:
+    """
+    Excel columnar en streaming: cada hoja se genera por bloques de filas
+    y se comprime directamente dentro del .xlsx (sin openpyxl ni celdas en memoria)
+    """
+    ruta = ruta_base + ".xlsx"
+    nombres = []
+    with zipfile.ZipFile(ruta, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=NIVEL_COMPRESION) as libro:
+        for numero, (nombre, df) in enumerate(_dividir_hojas(hojas, max_filas), start=1):
+            _escribir_hoja(libro, numero, df)
+            nombres.append(escape(CARACTERES_NO_XML_PY.sub("", nombre), {'"': "&quot;"}))
+
+        tipos = "".join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" ContentType="{TIPO_HOJA}"/>'
+                        for i in range(1, len(nombres) + 1))
+        libro.writestr("[Content_Types].xml", CABECERA_XML + (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            f'{tipos}</Types>'
+        ))
+        libro.writestr("_rels/.rels", CABECERA_XML + (
+            f'<Relationships xmlns="{NS_PAQUETE}"><Relationship Id="rId1" '
+            f'Type="{NS_RELACIONES}/officeDocument" Target="xl/workbook.xml"/></Relationships>'
+        ))
+        libro.writestr("xl/workbook.xml", CABECERA_XML + (
+            f'<workbook xmlns="{NS_HOJA}" xmlns:r="{NS_RELACIONES}"><sheets>'
+            + "".join(f'<sheet name="{nombre}" sheetId="{i}" r:id="rId{i}"/>' for i, nombre in enumerate(nombres, start=1))
+            + '</sheets></workbook>'
+        ))
+        libro.writestr("xl/_rels/workbook.xml.rels", CABECERA_XML + (
+            f'<Relationships xmlns="{NS_PAQUETE}">'
+            + "".join(f'<Relationship Id="rId{i}" Type="{NS_RELACIONES}/worksheet" Target="worksheets/sheet{i}.xml"/>'
+                      for i in range(1, len(nombres) + 1))
+            + f'<Relationship Id="rId{len(nombres) + 1}" Type="{NS_RELACIONES}/styles" Target="styles.xml"/>'
+            + '</Relationships>'
+        ))
+        libro.writestr("xl/styles.xml", ESTILOS_XML)
+    return ruta
+
+
+def escribir_parquet(hojas: Dict[str, pd.DataFrame], ruta_base: str) -> str:
+    """Carpeta con un Parquet por hoja (para consumo programático)"""
+    os.makedirs(ruta_base, exist_ok=True)
+    for nombre, df in hojas.items():
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), os.path.join(ruta_base, f"{nombre}.parquet"))
+    return ruta_base
+
+
+def escribir_csv_gz(hojas: Dict[str, pd.DataFrame], ruta_base: str) -> str:
+    """Carpeta con un CSV comprimido con gzip por hoja"""
+    os.makedirs(ruta_base, exist_ok=True)
+    for nombre, df in hojas.items():
+        df.to_csv(os.path.join(ruta_base, f"{nombre}.csv.gz"), index=False, compression="gzip",
+                  date_format="%Y-%m-%d")
+    return ruta_base
+
+
+ESCRITORES: Dict[str, Callable[[Dict[str, pd.DataFrame], str], str]] = {
+    "xlsx": escribir_xlsx,
+    "parquet": escribir_parquet,
+    "csv.gz": escribir_csv_gz,
+}
+
+FORMATOS_REPORTE: Tuple[str, ...] = tuple(ESCRITORES)
+
+# Extensión de cada formato en el nombre (las carpetas no llevan)
+EXTENSIONES_REPORTE = {"xlsx": ".xlsx", "parquet": "", "csv.gz": ""}
+
+
+def validar_formato(formato: str) -> str:
+    if formato not in ESCRITORES:
+        raise ValueError(f"❌ Formato de reporte no soportado: {formato}. Opciones: {FORMATOS_REPORTE}")
+    return formato
+
+
+def ruta_salida(ruta_base: str, formato: str) -> str:
+    """Ruta final de un reporte: archivo .xlsx o carpeta (parquet / csv.gz)"""
+    return ruta_base + EXTENSIONES_REPORTE[validar_formato(formato)]
+
+
+def escribir_reporte(hojas: Dict[str, pd.DataFrame], ruta_base: str, formato: str) -> str:
+    """
+    Escribir todas las hojas con el formato pedido
+    Se escribe con un nombre temporal y se renombra al final: un reporte
+    interrumpido nunca queda con el nombre definitivo
+    """
+    destino = ruta_salida(ruta_base, formato)
+    temporal = ESCRITORES[formato](hojas, ruta_base + ".tmp")
+    os.replace(temporal, destino)
+    return destino
+
+# =============================================================================
+# SALIDA DIRECCIONADA POR CONTENIDO Y RETENCIÓN
+# =============================================================================
+
+# Caracteres hexadecimales de la huella en el nombre del reporte
+LONGITUD_HUELLA = 16
+
+# Versión de los escritores: subirla cuando cambie lo que se escribe para los
+# mismos datos (formato de celdas, hojas, columnas); entra en la huella, así que
+# los reportes ya generados no se reutilizan
+VERSION_REPORTE = "1"
+
+
+def huella_contenido(tablas: Dict[str, pd.DataFrame], *extras: str, longitud: int = LONGITUD_HUELLA) -> str:
+    """
+    Huella SHA-256 de varias tablas (nombres, columnas, tipos y valores fila a
+    fila con pd.util.hash_pandas_object), de VERSION_REPORTE y de parámetros adicionales
+    """
+    sha = hashlib.sha256()
+    sha.update(f"version={VERSION_REPORTE}\0".encode("utf-8"))
+    for extra in extras:
+        sha.update(f"{extra}\0".encode("utf-8"))
+    for nombre, df in tablas.items():
+        esquema = "|".join(f"{col}:{tipo}" for col, tipo in df.dtypes.items())
+        sha.update(f"{nombre}\0{len(df)}\0{esquema}\0".encode("utf-8"))
+        sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return sha.hexdigest()[:longitud]
+
+
+def reporte_existente(ruta_base: str, formato: str) -> Optional[str]:
+    """Ruta del reporte si ya fue generado; se actualiza su fecha para la retención"""
+    ruta = ruta_salida(ruta_base, formato)
+    if not os.path.exists(ruta):
+        return None
+    os.utime(ruta)
+    return ruta
+
+
+def patron_reporte(prefijo: str) -> "re.Pattern[str]":
+    """Nombres que genera el pipeline: <prefijo><etiqueta>_<huella>[.xlsx]"""
+    extensiones = "|".join(re.escape(ext) for ext in EXTENSIONES_REPORTE.values() if ext)
+    return re.compile(rf"{re.escape(prefijo)}.+_[0-9a-f]{{{LONGITUD_HUELLA}}}(?:{extensiones})?")
+
+
+def aplicar_retencion(directorio: str, prefijo: str, max_reportes: Optional[int] = None,
+                      max_bytes: Optional[int] = None, conservar: Optional[str] = None) -> List[str]:
+    """
+    Borrar los reportes más antiguos (por fecha de modificación) de 'directorio'
+
+    Solo cuenta los nombres con huella (patron_reporte): los reportes con otro
+    nombre, como los generados a mano o con fecha, nunca se borran
+
+    - max_reportes: número máximo de reportes que se conservan
+    - max_bytes: tamaño total máximo en disco
+    - conservar: ruta que nunca se borra (el reporte recién generado)
+    Devuelve las rutas eliminadas
+    """
+    entradas = [os.path.join(directorio, nombre) for nombre in os.listdir(directorio)
+                if patron_reporte(prefijo).fullmatch(nombre)]
+    entradas.sort(key=os.path.getmtime, reverse=True)
+    if conservar is not None and conservar in entradas:
+        entradas.remove(conservar)
+        entradas.insert(0, conservar)
+
+    eliminadas, total = [], 0
+    for posicion, ruta in enumerate(entradas):
+        total += tamano_en_disco(ruta)
+        excede = (max_reportes is not None and posicion >= max_reportes) or \
+                 (max_bytes is not None and total > max_bytes)
+        if excede and ruta != conservar:
+            if os.path.isdir(ruta):
+                shutil.rmtree(ruta)
+            else:
+                os.remove(ruta)
+            eliminadas.append(ruta)
+    return eliminadas
+
+
+def tamano_en_disco(ruta: str) -> int:
+    """Tamaño en bytes de un archivo o de una carpeta de reporte"""
+    if os.path.isdir(ruta):
+        return sum(os.path.getsize(os.path.join(base, f)) for base, _, archivos in os.walk(ruta) for f in archivos)
+    return os.path.getsize(ruta)
+
@@ -0,0 +1,26 @@
+"""
+Tipos de Dagster para las firmas de los assets
+Cargar la code location (definitions.py) no debe importar pandas: las firmas
+usan DataFrame de este módulo y las librerías pesadas se importan dentro de
+cada asset, al ejecutarlo
+"""
+
+import sys
+from typing import Any
+
+from dagster import DagsterType, TypeCheck
+
+
+def _es_dataframe(_, valor: Any) -> TypeCheck:
+    # Si el valor es un DataFrame, pandas ya está importado: no hace falta importarlo aquí
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(valor, pd.DataFrame):
+        return TypeCheck(success=True)
+    return TypeCheck(success=False, description=f"Se esperaba un pandas.DataFrame, llegó {type(valor).__name__}")
+
+
+DataFrame = DagsterType(
+    type_check_fn=_es_dataframe,
+    name="DataFrame",
+    description="pandas.DataFrame (comprobado sin importar pandas al cargar las definiciones)",
+)
@@ -0,0 +1,111 @@
+"""
+Motor de validación de entrada en una sola pasada
+Calcula de una vez todas las estadísticas que necesitan los chequeos de
+leer_datos (esquema, fecha máxima, fechas futuras y registros por país);
+cada chequeo solo evalúa el resultado, sin volver a recorrer los datos
+"""
+
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from dagster import AssetCheckResult
+
+from pipeline_covid.io_parquet import columnas_de, leer_columna
+
+
+def calcular_estadisticas_entrada(datos: Any, columnas_requeridas: Dict[str, List[str]],
+                                  hoy: Optional[pd.Timestamp] = None) -> Dict[str, Any]:
+    """
+    Estadísticas de validación de un DataFrame o tabla Arrow
+
+    - columnas: categoría -> nombre real (o None), solo con el esquema
+    - fecha_maxima / registros_futuros: una conversión y dos reducciones sobre 'date'
+    - conteos_pais: value_counts de la columna país (una pasada)
+    """
+    hoy = hoy if hoy is not None else pd.Timestamp(date.today())
+    disponibles = columnas_de(datos)
+    columnas = {
+        categoria: next((col for col in posibles if col in disponibles), None)
+        for categoria, posibles in columnas_requeridas.items()
+    }
+
+    estadisticas = {"columnas": columnas, "fecha_maxima": pd.NaT, "registros_futuros": 0,
+                    "col_pais": columnas.get('pais'), "conteos_pais": pd.Series(dtype='int64')}
+
+    if columnas.get('fecha') is not None:
+        fechas = pd.to_datetime(leer_columna(datos, columnas['fecha']), errors='coerce')
+        estadisticas["fecha_maxima"] = fechas.max()
+        # NaT > hoy es False: las fechas inválidas no cuentan como futuras
+        estadisticas["registros_futuros"] = int((fechas > hoy).sum())
+
+    if columnas.get('pais') is not None:
+        conteos = leer_columna(datos, columnas['pais']).value_counts()
+        estadisticas["conteos_pais"] = conteos[conteos > 0]
+
+    return estadisticas
+
+# =============================================================================
+# EVALUACIÓN DE CADA CHEQUEO (SOLO LEE LAS ESTADÍSTICAS)
+# =============================================================================
+
+def evaluar_fechas_futuras(estadisticas: Dict[str, Any]) -> AssetCheckResult:
+    """CHEQUEO 1: fechas futuras (solo informativo, siempre pasa)"""
+    fecha_max = estadisticas["fecha_maxima"]
+    fechas_futuras = estadisticas["registros_futuros"]
+    fecha_texto = fecha_max.strftime('%Y-%m-%d') if pd.notnull(fecha_max) else "N/A"
+
+    if fechas_futuras == 0:
+        description = f" Sin fechas futuras. Máxima: {fecha_texto}"
+    else:
+        description = f" {fechas_futuras} fechas futuras detectadas"
+
+    return AssetCheckResult(
+        check_name="check_fechas_futuras",
+        passed=True,
+        description=description,
+        metadata={"fecha_maxima": fecha_texto, "registros_futuros": int(fechas_futuras)}
+    )
+
+
+def evaluar_columnas_esenciales(estadisticas: Dict[str, Any]) -> AssetCheckResult:
+    """CHEQUEO 2: todas las categorías de columnas tienen un nombre real"""
+    columnas = estadisticas["columnas"]
+    encontradas = {cat: nombre for cat, nombre in columnas.items() if nombre is not None}
+    faltantes = [cat for cat, nombre in columnas.items() if nombre is None]
+
+    if not faltantes:
+        description = f" Todas las columnas encontradas: {encontradas}"
+    else:
+        description = f" Faltan columnas: {faltantes}"
+
+    return AssetCheckResult(
+        check_name="check_columnas_esenciales",
+        passed=not faltantes,
+        description=description,
+        metadata={"columnas_encontradas": encontradas, "columnas_faltantes": faltantes}
+    )
+
+
+def evaluar_paises_objetivo(estadisticas: Dict[str, Any], paises_objetivo: Optional[List[str]]) -> AssetCheckResult:
+    """CHEQUEO 3: los países objetivo tienen registros (None = todos los del archivo)"""
+    conteos_todos = estadisticas["conteos_pais"]
+    if paises_objetivo is None:
+        paises_objetivo = sorted(conteos_todos.index.astype(str))
+    paises_encontrados = [p for p in paises_objetivo if p in conteos_todos.index]
+
+    passed = len(paises_encontrados) == len(paises_objetivo) and len(paises_objetivo) > 0
+    conteos = {pais: int(conteos_todos[pais]) for pais in paises_encontrados}
+
+    if passed:
+        description = f" {len(paises_encontrados)} países encontrados: {conteos if len(conteos) <= 10 else len(conteos)}"
+    else:
+        faltantes = [p for p in paises_objetivo if p not in paises_encontrados]
+        description = f"❌ Países faltantes: {faltantes}"
+
+    return AssetCheckResult(
+        check_name="check_paises_objetivo",
+        passed=bool(passed),
+        description=description,
+        metadata={"paises_encontrados": paises_encontrados, "conteo_registros": conteos}
+    )
@@ -0,0 +1,125 @@
+"""
+Núcleos NumPy de ventanas móviles por grupo
+Trabajan sobre arreglos contiguos ordenados por (grupo, fecha) y los
+inicios de cada grupo, sin groupby ni realineación de índices.
+Las ventanas son de calendario (`ventana` días, no filas), con la misma
+semántica que pandas groupby().rolling('7D'): los NaN no cuentan como
+observaciones y una ventana nunca cruza de un grupo a otro.
+No construyen ninguna matriz densa: memoria proporcional a las filas, no a
+días × grupos (ver matriz.py para la alternativa densa)
+"""
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def inicios_grupos(grupos: pd.Series) -> np.ndarray:
+    """Posiciones donde empieza cada grupo (datos ordenados por grupo)"""
+    if len(grupos) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if isinstance(grupos.dtype, pd.CategoricalDtype):
+        codigos = grupos.cat.codes.to_numpy()
+    else:
+        codigos = pd.factorize(grupos)[0]
+    return np.concatenate(([0], np.flatnonzero(codigos[1:] != codigos[:-1]) + 1))
+
+
+def dias_desde_inicio(fechas: np.ndarray) -> np.ndarray:
+    """Fechas como días enteros desde la primera (int64)"""
+    dias = np.asarray(fechas).astype('datetime64[D]').astype(np.int64)
+    return dias - dias.min() if len(dias) else dias
+
+
+def _claves(dias: np.ndarray, inicios: np.ndarray, alcance: int) -> np.ndarray:
+    """
+    Día de cada fila desplazado por su grupo: crecientes en todo el arreglo,
+    >= `alcance` y con más de `alcance` días entre grupos, así una búsqueda
+    `alcance` días atrás nunca cae en el grupo anterior ni antes del cero
+    """
+    n = len(dias)
+    grupo = np.repeat(np.arange(len(inicios), dtype=np.int64), np.diff(np.append(inicios, n)))
+    separacion = (int(dias.max()) + 1 if n else 0) + alcance + 1
+    return grupo * separacion + dias + alcance
+
+
+def _filas_anteriores(claves: np.ndarray, buscadas: np.ndarray) -> np.ndarray:
+    """
+    Número de filas con clave menor que cada buscada (= posición de la primera
+    fila con clave >= buscada). Con claves densas (OWID: casi todos los días de
+    cada país) una tabla de conteos acumulados por clave, lineal; si no,
+    búsqueda binaria
+    """
+    if len(claves) == 0:
+        return np.zeros(len(buscadas), dtype=np.int64)
+    tamano = int(claves[-1]) + 1
+    if tamano > 4 * len(claves):
+        return np.searchsorted(claves, buscadas, side='left')
+    anteriores = np.zeros(tamano + 1, dtype=np.int64)
+    np.cumsum(np.bincount(claves, minlength=tamano), out=anteriores[1:])
+    return anteriores[buscadas]
+
+
+def suma_y_conteo(valores: np.ndarray, dias: np.ndarray, inicios: np.ndarray,
+                  ventana: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Suma y número de valores no nulos de los últimos `ventana` días (incluido
+    el de la fila) de cada grupo: diferencia de sumas acumuladas entre la
+    fila y el primer registro de su ventana, exacta en float64 para
+    recuentos enteros
+    """
+    if ventana < 1:
+        raise ValueError(f"❌ La ventana debe ser >= 1 día: {ventana}")
+    valores = np.asarray(valores, dtype=np.float64)
+    validos = ~np.isnan(valores)
+    completos = validos.all()
+    acumulado = np.zeros(len(valores) + 1)
+    np.cumsum(valores if completos else np.where(validos, valores, 0.0), out=acumulado[1:])
+
+    claves = _claves(dias, inicios, ventana - 1)
+    desde = _filas_anteriores(claves, claves - (ventana - 1))
+    suma = acumulado[1:] - acumulado[desde]
+    if completos:
+        # Sin nulos, los registros de la ventana son las filas entre desde y la fila
+        return suma, np.arange(1, len(valores) + 1) - desde
+    conteo_acumulado = np.zeros(len(valores) + 1, dtype=np.int64)
+    np.cumsum(validos, out=conteo_acumulado[1:])
+    return suma, conteo_acumulado[1:] - conteo_acumulado[desde]
+
+
+def suma_movil(valores: np.ndarray, dias: np.ndarray, inicios: np.ndarray, ventana: int,
+               min_periodos: int = 1) -> np.ndarray:
+    """rolling(f'{ventana}D', min_periods=min_periodos).sum() por grupo"""
+    suma, conteo = suma_y_conteo(valores, dias, inicios, ventana)
+    return np.where(conteo >= min_periodos, suma, np.nan)
+
+
+def media_movil(valores: np.ndarray, dias: np.ndarray, inicios: np.ndarray, ventana: int,
+                min_periodos: int = 1) -> np.ndarray:
+    """Suma / registros de la ventana por grupo (NaN con menos de min_periodos registros o ninguno)"""
+    suma, conteo = suma_y_conteo(valores, dias, inicios, ventana)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(conteo >= max(min_periodos, 1), suma / conteo, np.nan)
+
+
+def desfase(valores: np.ndarray, dias: np.ndarray, inicios: np.ndarray, periodo: int) -> np.ndarray:
+    """
+    Valor del mismo grupo `periodo` días antes (NaN si ese día no tiene registro):
+    un desfase de calendario, no de filas
+    """
+    if periodo < 0:
+        raise ValueError(f"❌ Solo se admiten desfases hacia atrás (periodo >= 0): {periodo}")
+    valores = np.asarray(valores, dtype=np.float64)
+    if len(valores) == 0:
+        return valores.copy()
+    claves = _claves(dias, inicios, periodo)
+    buscadas = claves - periodo
+    posicion = np.minimum(_filas_anteriores(claves, buscadas), len(claves) - 1)
+    return np.where(claves[posicion] == buscadas, valores[posicion], np.nan)
+
+
+def razon(numerador: np.ndarray, denominador: np.ndarray) -> np.ndarray:
+    """Cociente con la semántica de pandas: x/0 = ±inf, 0/0 = NaN, sin avisos"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.asarray(numerador, dtype=np.float64) / np.asarray(denominador, dtype=np.float64)